@@ -1,11 +1,12 @@
 from django.contrib import admin
-from .models import Category, Transaction, Budget, Goal, UserProfile
+from .models import Category, Transaction, LedgerRollup, Budget, Goal, ImportJob, SpendingAnalysis, UserProfile
 
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ['name', 'name_fa', 'icon', 'is_default', 'user']
     list_filter = ['is_default']
+    list_select_related = ['user']
     search_fields = ['name', 'name_fa']
 
 
@@ -13,23 +14,46 @@ class CategoryAdmin(admin.ModelAdmin):
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ['title', 'amount', 'type', 'category', 'date', 'user']
     list_filter = ['type', 'category', 'user']
+    list_select_related = ['category__parent', 'user']
     search_fields = ['title']
     date_hierarchy = 'created_at'
 
 
+@admin.register(LedgerRollup)
+class LedgerRollupAdmin(admin.ModelAdmin):
+    list_display = ['user', 'month', 'category', 'type', 'total', 'count']
+    list_filter = ['type', 'user']
+    list_select_related = ['user', 'category__parent']
+
+
 @admin.register(Budget)
 class BudgetAdmin(admin.ModelAdmin):
     list_display = ['category', 'limit', 'period', 'user']
     list_filter = ['period', 'user']
+    list_select_related = ['category__parent', 'user']
 
 
 @admin.register(Goal)
 class GoalAdmin(admin.ModelAdmin):
     list_display = ['title', 'target_amount', 'current_amount', 'deadline', 'user']
     list_filter = ['user']
+    list_select_related = ['user']
     search_fields = ['title']
 
 
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'user', 'status', 'rows_done', 'rows_created', 'rows_failed', 'created_at']
+    list_filter = ['status']
+    readonly_fields = ['claim']
+
+
+@admin.register(SpendingAnalysis)
+class SpendingAnalysisAdmin(admin.ModelAdmin):
+    list_display = ['user', 'updated_at']
+    readonly_fields = ['fingerprint']
+
+
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'theme']
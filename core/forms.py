@@ -1,8 +1,33 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
-from django.db.models import Q
 from .models import Transaction, Budget, Goal, UserProfile, Category
+from .services import category_tree
+from .services.importer import normalize_date
+
+
+class CategoryChoiceField(forms.ModelChoiceField):
+    """Category select fed by a cached CategoryTree: rendering and validation need no queries"""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('queryset', Category.objects.none())
+        super().__init__(**kwargs)
+        self.tree_categories = {}
+
+    def set_categories(self, tree, categories=None):
+        """Offer categories (all of tree by default), labelled like Category.__str__"""
+        categories = tree.categories if categories is None else categories
+        self.tree_categories = {category.id: category for category in categories}
+        empty = [('', self.empty_label)] if self.empty_label is not None else []
+        self.choices = empty + tree.choices(categories)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self.tree_categories[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise forms.ValidationError(self.error_messages['invalid_choice'], code='invalid_choice')
 
 
 class UserRegisterForm(UserCreationForm):
@@ -25,12 +50,15 @@ class UserRegisterForm(UserCreationForm):
 
 class CategoryForm(forms.ModelForm):
     """Form for creating/editing categories"""
+    parent = CategoryChoiceField(
+        required=False, label='دسته والد', widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+
     class Meta:
         model = Category
         fields = ['name_fa', 'parent', 'icon', 'color']
         widgets = {
             'name_fa': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'نام دسته‌بندی'}),
-            'parent': forms.Select(attrs={'class': 'form-select'}),
             'icon': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'bi-tag'}),
             'color': forms.TextInput(attrs={'class': 'form-control', 'type': 'color'}),
         }
@@ -38,10 +66,8 @@ class CategoryForm(forms.ModelForm):
     def __init__(self, user, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # Only show parent categories (no nesting deeper than 1 level)
-        self.fields['parent'].queryset = Category.objects.filter(
-            Q(user=user) | Q(is_default=True),
-            parent__isnull=True
-        )
+        tree = category_tree.get(user)
+        self.fields['parent'].set_categories(tree, tree.roots)
 
 class TransactionForm(forms.ModelForm):
     class Meta:
@@ -62,6 +88,12 @@ class TransactionForm(forms.ModelForm):
             'date': forms.TextInput(attrs={'class': 'form-control', 'placeholder': '1403/10/01'}),
         }
 
+    def clean_date(self):
+        try:
+            return normalize_date(self.cleaned_data['date'])
+        except ValueError as e:
+            raise forms.ValidationError(str(e))
+
 
 class BudgetForm(forms.ModelForm):
     class Meta:
@@ -94,6 +126,12 @@ class GoalForm(forms.ModelForm):
             'deadline': forms.TextInput(attrs={'class': 'form-control', 'placeholder': '1403/12/29'}),
         }
 
+    def clean_deadline(self):
+        try:
+            return normalize_date(self.cleaned_data['deadline'])
+        except ValueError as e:
+            raise forms.ValidationError(str(e))
+
 
 class ProfileForm(forms.ModelForm):
     first_name = forms.CharField(max_length=100, required=False, label='نام')
@@ -109,3 +147,59 @@ class ProfileForm(forms.ModelForm):
             'avatar': forms.FileInput(attrs={'class': 'form-control'}),
             'theme': forms.Select(attrs={'class': 'form-select'}),
         }
+
+
+class TransactionFilterForm(forms.Form):
+    """Filters and sort order of the transaction list (GET parameters)"""
+    SORT_CHOICES = [
+        ('newest', 'جدیدترین'),
+        ('oldest', 'قدیمی‌ترین'),
+    ]
+
+    type = forms.ChoiceField(
+        choices=[('', 'همه')] + Transaction.TYPE_CHOICES, required=False, label='نوع',
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'}),
+    )
+    category = CategoryChoiceField(
+        required=False, label='دسته‌بندی', empty_label='همه',
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'}),
+    )
+    date_from = forms.CharField(
+        required=False, label='از تاریخ',
+        widget=forms.TextInput(attrs={'class': 'form-control form-control-sm', 'placeholder': '1403/01/01'}),
+    )
+    date_to = forms.CharField(
+        required=False, label='تا تاریخ',
+        widget=forms.TextInput(attrs={'class': 'form-control form-control-sm', 'placeholder': '1403/12/29'}),
+    )
+    min_amount = forms.DecimalField(
+        required=False, min_value=0, decimal_places=0, label='حداقل مبلغ',
+        widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm'}),
+    )
+    max_amount = forms.DecimalField(
+        required=False, min_value=0, decimal_places=0, label='حداکثر مبلغ',
+        widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm'}),
+    )
+    sort = forms.ChoiceField(
+        choices=SORT_CHOICES, required=False, label='ترتیب',
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'}),
+    )
+
+    def __init__(self, user, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['category'].set_categories(category_tree.get(user))
+
+    def _clean_date(self, name):
+        value = self.cleaned_data.get(name)
+        if not value:
+            return ''
+        try:
+            return normalize_date(value)
+        except ValueError as e:
+            raise forms.ValidationError(str(e))
+
+    def clean_date_from(self):
+        return self._clean_date('date_from')
+
+    def clean_date_to(self):
+        return self._clean_date('date_to')
@@ -0,0 +1,62 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from core.management import stub_server
+from core.services import http_client
+
+
+class Command(BaseCommand):
+    help = 'Compare bare requests.post with the pooled AI client against a local stub server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--latency', type=float, default=5, help='Stub response delay in ms')
+
+    def handle(self, *args, **options):
+        server = stub_server.start(latency=options['latency'] / 1000)
+        url = stub_server.completions_url(server)
+        payload = {'messages': [{'role': 'user', 'content': 'سلام'}], 'max_tokens': 16}
+
+        def bare():
+            return requests.post(url, json=payload, timeout=30)
+
+        def pooled():
+            return http_client.post('bench', url, json=payload)
+
+        config = {
+            'POOL_SIZE': options['concurrency'],
+            'BACKENDS': {'bench': {'MAX_CONCURRENCY': options['concurrency']}},
+        }
+        try:
+            with override_settings(AI_HTTP=config):
+                http_client.reset()
+                for name, call in (('bare requests.post', bare), ('pooled session', pooled)):
+                    self.report(name, self.run(call, options['requests'], options['concurrency']))
+        finally:
+            http_client.reset()
+            server.shutdown()
+
+    def run(self, call, total, concurrency):
+        def timed(_):
+            start = time.perf_counter()
+            call().raise_for_status()
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = sorted(pool.map(timed, range(total)))
+        return latencies, time.perf_counter() - start
+
+    def report(self, name, result):
+        latencies, elapsed = result
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        self.stdout.write(
+            f'{name:<20} {len(latencies) / elapsed:8.1f} req/s   '
+            f'p50 {statistics.median(latencies) * 1000:6.2f} ms   p95 {p95 * 1000:6.2f} ms'
+        )
@@ -0,0 +1,111 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q, Sum
+
+from core.models import Budget, Category, Transaction
+from core.services import jalali
+
+
+BEFORE = ('core', '0006_day_ordinals')
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database and print the query plan and timing of each '
+        'hot per-user query, without and with the composite indexes of 0007'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--transactions', type=int, default=10000, help='Transactions per user')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per query for the timing')
+
+    def handle(self, *args, **options):
+        # Never touch the real database: build a test database like the test runner does
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.seed(options['users'], options['transactions'])
+            user = User.objects.order_by('?').first()
+            queries = self.queries(user)
+
+            call_command('migrate', *BEFORE, verbosity=0)
+            self.stdout.write(self.style.MIGRATE_HEADING(f'Without indexes ({BEFORE[1]})'))
+            before = self.measure(queries, options['repeat'])
+
+            call_command('migrate', 'core', verbosity=0)
+            self.stdout.write(self.style.MIGRATE_HEADING('With composite indexes'))
+            after = self.measure(queries, options['repeat'])
+
+            self.stdout.write(self.style.MIGRATE_HEADING('Summary (median ms)'))
+            for name in queries:
+                self.stdout.write(f'{name:<28} {before[name]:9.2f} -> {after[name]:8.2f}')
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, users, per_user):
+        self.stdout.write(f'Seeding {users} users x {per_user} transactions...')
+        categories = [
+            Category.objects.create(name=f'Category {i}', is_default=True)
+            for i in range(12)
+        ]
+        first, last = jalali.year_range(1402)[0], jalali.year_range(1403)[1]
+        for n in range(users):
+            user = User.objects.create_user(f'bench{n}')
+            ordinals = [random.randint(first, last) for _ in range(per_user)]
+            dates = jalali.format_many(ordinals)
+            Transaction.objects.bulk_create(
+                [
+                    Transaction(
+                        user=user,
+                        title=f't{i}',
+                        amount=random.randint(1, 500) * 1000,
+                        type=Transaction.INCOME if i % 10 == 0 else Transaction.EXPENSE,
+                        date=date,
+                        category=random.choice(categories),
+                    )
+                    for i, date in enumerate(dates)
+                ],
+                batch_size=2000,
+            )
+            Budget.objects.bulk_create(
+                Budget(user=user, category=category, limit=5_000_000) for category in categories[:5]
+            )
+
+    def queries(self, user):
+        """The per-user queries behind the hot views, as querysets"""
+        month = jalali.month_range(1403, 6)
+        category = Category.objects.first()
+        transactions = Transaction.objects.filter(user=user)
+        return {
+            'transactions list': transactions[:50],
+            'dashboard recent': transactions.select_related('category').order_by('-created_at', '-id')[:10],
+            'recent expenses': transactions.filter(type=Transaction.EXPENSE)[:10],
+            'month window': transactions.between(*month).order_by('day_ordinal', 'id'),
+            'month expenses': transactions.filter(type=Transaction.EXPENSE).between(*month)
+                                          .order_by().values('type').annotate(total=Sum('amount')),
+            'category spending': transactions.filter(category=category, type=Transaction.EXPENSE)
+                                             .order_by().values('category').annotate(total=Sum('amount')),
+            'budgets': Budget.objects.filter(user=user),
+            'visible categories': Category.objects.filter(Q(is_default=True) | Q(user=user)),
+        }
+
+    def measure(self, queries, repeat):
+        medians = {}
+        for name, queryset in queries.items():
+            plan = queryset.explain()
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(queryset.all())  # fresh clone, no result cache
+                timings.append(time.perf_counter() - start)
+            medians[name] = statistics.median(timings) * 1000
+            self.stdout.write(f'  {name} ({medians[name]:.2f} ms)')
+            for line in plan.splitlines():
+                self.stdout.write(f'      {line}')
+        return medians
@@ -0,0 +1,71 @@
+import asyncio
+import statistics
+import time
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Fire concurrent questions at /advisor/ask/ on a running server and report '
+        'throughput and latency. Run it once against a WSGI server (gunicorn) and once '
+        'against ASGI (uvicorn kifpol.asgi:application) with the same model backend: '
+        "AI_BACKEND = 'stub' to measure the web tier alone (AI_STUB sets latency and "
+        "error rate), or manage.py stub_llama to include the HTTP client; then raise "
+        'AI_HTTP llama MAX_CONCURRENCY to match the slots the stub (or a multi-slot llama.cpp) can serve.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--username', default='admin')
+        parser.add_argument('--password', default='admin123')
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--timeout', type=float, default=120)
+
+    def handle(self, *args, **options):
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        limits = httpx.Limits(max_connections=options['concurrency'])
+        async with httpx.AsyncClient(base_url=options['url'], limits=limits, timeout=options['timeout']) as client:
+            await self.login(client, options['username'], options['password'])
+            csrf = client.cookies.get('csrftoken')
+            gate = asyncio.Semaphore(options['concurrency'])
+
+            async def ask(n):
+                # A distinct question per request so the response cache never answers
+                async with gate:
+                    start = time.perf_counter()
+                    response = await client.post(
+                        '/advisor/ask/', json={'query': f'سوال شماره {n}'}, headers={'X-CSRFToken': csrf},
+                    )
+                    return response.status_code, time.perf_counter() - start
+
+            start = time.perf_counter()
+            results = await asyncio.gather(*(ask(n) for n in range(options['requests'])))
+            elapsed = time.perf_counter() - start
+
+        latencies = sorted(latency for status, latency in results if status == 200)
+        failed = len(results) - len(latencies)
+        if not latencies:
+            raise CommandError(f'All {failed} requests failed')
+        p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+        self.stdout.write(
+            f'{len(latencies)} ok, {failed} failed in {elapsed:.1f} s   '
+            f'{len(latencies) / elapsed:.1f} req/s   '
+            f'p50 {statistics.median(latencies) * 1000:.0f} ms   p95 {p95 * 1000:.0f} ms'
+        )
+
+    async def login(self, client, username, password):
+        await client.get('/login/')
+        response = await client.post('/login/', data={
+            'username': username,
+            'password': password,
+            'csrfmiddlewaretoken': client.cookies.get('csrftoken'),
+        })
+        if response.status_code != 302:
+            raise CommandError('Login failed; check --username/--password')
+        # Django rotates the CSRF token on login
+        await client.get('/advisor/')
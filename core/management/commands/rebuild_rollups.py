@@ -0,0 +1,35 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services import ledger
+
+
+class Command(BaseCommand):
+    help = 'Rebuild ledger rollups from raw transactions and verify them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', metavar='USERNAME',
+                            help='Only process this user (may be repeated)')
+        parser.add_argument('--verify-only', action='store_true',
+                            help='Compare rollups with raw data without rebuilding')
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options['usernames']:
+            user_ids = list(User.objects.filter(username__in=options['usernames']).values_list('id', flat=True))
+            if len(user_ids) != len(set(options['usernames'])):
+                raise CommandError('Unknown username in --user')
+
+        if not options['verify_only']:
+            ledger.rebuild(user_ids)
+            self.stdout.write('Rollups rebuilt.')
+
+        mismatches = ledger.verify(user_ids)
+        for (user_id, month, category_id, tx_type), expected, actual in mismatches:
+            self.stdout.write(
+                f'user={user_id} month={month or "-"} category={category_id} type={tx_type}: '
+                f'expected {expected[0]} ({expected[1]} rows), stored {actual[0]} ({actual[1]} rows)'
+            )
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} rollup bucket(s) out of sync')
+        self.stdout.write(self.style.SUCCESS('Rollups match raw transactions.'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core.models import ImportJob
+from core.services import import_jobs
+
+
+class Command(BaseCommand):
+    help = 'Finish CSV import jobs left unfinished by a crash or restart (runs them in this process)'
+
+    def handle(self, *args, **options):
+        jobs = ImportJob.objects.filter(status__in=[ImportJob.PENDING, ImportJob.RUNNING]).order_by('created_at')
+        for job_id in jobs.values_list('id', flat=True):
+            import_jobs.run(job_id)
+            job = ImportJob.objects.get(pk=job_id)
+            if job.finished:
+                self.stdout.write(f'{job.name}: {job.get_status_display()} ({job.rows_created} created, {job.rows_failed} failed)')
+            else:
+                self.stdout.write(f'{job.name}: still owned by a live worker, skipped')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from core.management import stub_server
+
+
+class Command(BaseCommand):
+    help = 'Serve a stand-in for the llama.cpp server (canned answers after a fixed delay)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8080)
+        parser.add_argument('--latency', type=float, default=2000, help='Delay before each answer in ms')
+
+    def handle(self, *args, **options):
+        server = stub_server.make_server(options['latency'] / 1000, options['host'], options['port'])
+        self.stdout.write(f'Stub model listening on {stub_server.completions_url(server)}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,72 @@
+"""
+Local llama.cpp stand-in for benchmarks and load tests
+Answers OpenAI-compatible chat completions after a fixed delay over
+keep-alive connections, and streams SSE tokens when asked to.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+REPLY_TEXT = 'این یک پاسخ آزمایشی از سرور شبیه‌ساز مدل است.'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    latency = 0.0  # seconds before the answer (or its first token)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        request = json.loads(body or b'{}')
+        time.sleep(self.latency)
+        if request.get('stream'):
+            self.send_stream()
+        else:
+            self.send_json()
+
+    def send_json(self):
+        reply = json.dumps({'choices': [{'message': {'content': REPLY_TEXT}}]}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def send_stream(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for word in REPLY_TEXT.split(' '):
+            event = {'choices': [{'delta': {'content': word + ' '}}]}
+            self.write_chunk(f'data: {json.dumps(event)}\n\n'.encode('utf-8'))
+        self.write_chunk(b'data: [DONE]\n\n')
+        self.write_chunk(b'')
+
+    def write_chunk(self, data):
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+def make_server(latency=0.0, host='127.0.0.1', port=0):
+    handler = type('Handler', (StubHandler,), {'latency': latency})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start(latency=0.0, host='127.0.0.1', port=0):
+    """Serve the stub from a daemon thread and return the server"""
+    server = make_server(latency, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def completions_url(server):
+    host, port = server.server_address[:2]
+    return f'http://{host}:{port}/v1/chat/completions'
@@ -0,0 +1,57 @@
+# Generated by Django 3.2.25 on 2026-10-17 21:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Sum
+from django.db.models.functions import Substr
+
+
+def build_rollups(apps, schema_editor):
+    Transaction = apps.get_model('core', 'Transaction')
+    LedgerRollup = apps.get_model('core', 'LedgerRollup')
+    rows = (
+        Transaction.objects.order_by()
+        .annotate(month=Substr('date', 1, 7))
+        .values('user', 'month', 'category', 'type')
+        .annotate(total=Sum('amount'), n=Count('id'))
+    )
+    LedgerRollup.objects.bulk_create(
+        [
+            LedgerRollup(
+                user_id=row['user'], month=row['month'] or '', category_id=row['category'],
+                type=row['type'], total=row['total'] or 0, count=row['n'],
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0002_auto_20251222_1937'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.CharField(max_length=7, verbose_name='ماه')),
+                ('type', models.CharField(choices=[('INCOME', 'درآمد'), ('EXPENSE', 'هزینه')], max_length=10, verbose_name='نوع')),
+                ('total', models.DecimalField(decimal_places=0, default=0, max_digits=18, verbose_name='جمع مبلغ')),
+                ('count', models.IntegerField(default=0, verbose_name='تعداد')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.category', verbose_name='دسته\u200cبندی')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_rollups', to=settings.AUTH_USER_MODEL, verbose_name='کاربر')),
+            ],
+            options={
+                'verbose_name': 'خلاصه دفتر',
+                'verbose_name_plural': 'خلاصه\u200cهای دفتر',
+                'unique_together': {('user', 'month', 'category', 'type')},
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.25 on 2026-10-17 21:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0003_ledgerrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendingAnalysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=64, verbose_name='اثر انگشت تراکنش\u200cها')),
+                ('text', models.TextField(verbose_name='متن تحلیل')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاریخ بروزرسانی')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='spending_analysis', to=settings.AUTH_USER_MODEL, verbose_name='کاربر')),
+            ],
+            options={
+                'verbose_name': 'تحلیل مخارج',
+                'verbose_name_plural': 'تحلیل\u200cهای مخارج',
+            },
+        ),
+    ]
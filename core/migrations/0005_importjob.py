@@ -0,0 +1,40 @@
+# Generated by Django 3.2.25 on 2026-10-17 22:01
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0004_spendinganalysis'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='imports/%Y/%m/', verbose_name='فایل')),
+                ('name', models.CharField(max_length=255, verbose_name='نام فایل')),
+                ('status', models.CharField(choices=[('PENDING', 'در صف'), ('RUNNING', 'در حال انجام'), ('DONE', 'انجام شد'), ('FAILED', 'ناموفق')], default='PENDING', max_length=10, verbose_name='وضعیت')),
+                ('total_rows', models.PositiveIntegerField(blank=True, null=True, verbose_name='تعداد تقریبی سطرها')),
+                ('rows_done', models.PositiveIntegerField(default=0, verbose_name='سطرهای پردازش\u200cشده')),
+                ('rows_created', models.PositiveIntegerField(default=0, verbose_name='تراکنش\u200cهای واردشده')),
+                ('rows_failed', models.PositiveIntegerField(default=0, verbose_name='سطرهای ناموفق')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='خطاها')),
+                ('message', models.TextField(blank=True, verbose_name='پیام')),
+                ('claim', models.CharField(blank=True, max_length=32, verbose_name='شناسه پردازشگر')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاریخ بروزرسانی')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to=settings.AUTH_USER_MODEL, verbose_name='کاربر')),
+            ],
+            options={
+                'verbose_name': 'ورود CSV',
+                'verbose_name_plural': 'ورودهای CSV',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.2.25 on 2026-10-17 22:04
+
+from django.db import migrations, models
+
+from core.services import jalali
+
+
+BATCH_SIZE = 5000
+
+
+def fill(model, date_field, ordinal_field):
+    """Convert a date column to ordinals in primary-key batches"""
+    last_pk = 0
+    while True:
+        batch = list(model.objects.filter(pk__gt=last_pk).order_by('pk').only('id', date_field)[:BATCH_SIZE])
+        if not batch:
+            return
+        ordinals = jalali.parse_many([getattr(row, date_field) for row in batch]).tolist()
+        for row, ordinal in zip(batch, ordinals):
+            setattr(row, ordinal_field, ordinal if ordinal >= 0 else None)
+        model.objects.bulk_update(batch, [ordinal_field])
+        last_pk = batch[-1].pk
+
+
+def fill_ordinals(apps, schema_editor):
+    fill(apps.get_model('core', 'Transaction'), 'date', 'day_ordinal')
+    fill(apps.get_model('core', 'Goal'), 'deadline', 'deadline_ordinal')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='goal',
+            name='deadline_ordinal',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='شماره روز مهلت'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='day_ordinal',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True, verbose_name='شماره روز'),
+        ),
+        migrations.RunPython(fill_ordinals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2026-10-17 22:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_day_ordinals'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='day_ordinal',
+            field=models.IntegerField(blank=True, editable=False, null=True, verbose_name='شماره روز'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['is_default', 'name'], name='core_category_default_name'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'created_at'], name='core_tx_user_created'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'day_ordinal'], name='core_tx_user_day'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'type', 'day_ordinal'], name='core_tx_user_type_day'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'category', 'type'], name='core_tx_user_category_type'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2026-10-17 23:40
+
+from django.db import migrations
+
+
+# Frozen copy: later changes to the defaults need a migration of their own
+DEFAULT_CATEGORIES = [
+    ('Food', 'خوراکی', 'bi-cup-hot'),
+    ('Transport', 'حمل و نقل', 'bi-car-front'),
+    ('Shopping', 'خرید', 'bi-bag'),
+    ('Housing', 'مسکن', 'bi-house'),
+    ('Salary', 'حقوق', 'bi-briefcase'),
+    ('Health', 'سلامت', 'bi-heart-pulse'),
+    ('Income', 'درآمد', 'bi-wallet2'),
+    ('Other', 'سایر', 'bi-three-dots'),
+]
+
+
+def seed_default_categories(apps, schema_editor):
+    # Databases that ran the old dashboard already have them
+    Category = apps.get_model('core', 'Category')
+    for name, name_fa, icon in DEFAULT_CATEGORIES:
+        Category.objects.get_or_create(
+            name=name,
+            is_default=True,
+            defaults={'name_fa': name_fa, 'icon': icon},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_per_user_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_default_categories, migrations.RunPython.noop),
+    ]
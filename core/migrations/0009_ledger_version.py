@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-17 23:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_default_categories'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='ledger_changed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='آخرین تغییر دفتر'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='ledger_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='نسخه دفتر'),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -17,6 +17,10 @@ class Category(models.Model):
     class Meta:
         verbose_name = 'دسته‌بندی'
         verbose_name_plural = 'دسته‌بندی‌ها'
+        # Default categories are listed for every user and looked up by name
+        indexes = [
+            models.Index(fields=['is_default', 'name'], name='core_category_default_name'),
+        ]
 
     def __str__(self):
         if self.parent:
@@ -24,6 +28,63 @@ class Category(models.Model):
         return self.name_fa or self.name
 
 
+class TransactionQuerySet(models.QuerySet):
+    """QuerySet that keeps ledger rollups and versions in step with bulk writes"""
+
+    # Fields whose change moves money between rollup buckets
+    LEDGER_FIELDS = {'user', 'user_id', 'amount', 'type', 'date', 'category', 'category_id'}
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from .services import jalali, ledger
+
+        objs = list(objs)
+        for obj, ordinal in zip(objs, jalali.parse_many([obj.date for obj in objs]).tolist()):
+            obj.day_ordinal = ordinal if ordinal >= 0 else None
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            ledger.apply_deltas(ledger.deltas_for(objs))
+            ledger.bump_version({obj.user_id for obj in objs})
+        return objs
+
+    def update(self, **kwargs):
+        if isinstance(kwargs.get('date'), str) and 'day_ordinal' not in kwargs:
+            from .services import jalali
+            kwargs['day_ordinal'] = jalali.to_ordinal(kwargs['date'])
+
+        from .services import ledger
+
+        with transaction.atomic(using=self.db):
+            user_ids = set(self.order_by().values_list('user', flat=True).distinct())
+            if 'user' in kwargs or 'user_id' in kwargs:
+                new_user = kwargs.get('user', kwargs.get('user_id'))
+                user_ids.add(getattr(new_user, 'pk', new_user))
+            rows = super().update(**kwargs)
+            if self.LEDGER_FIELDS.intersection(kwargs):
+                ledger.rebuild(user_ids)
+            ledger.bump_version(user_ids)
+        return rows
+
+    update.alters_data = True
+
+    def delete(self):
+        from .services import ledger
+
+        with transaction.atomic(using=self.db):
+            deltas = ledger.grouped_deltas(self, sign=-1)
+            with ledger.suspended():
+                result = super().delete()
+            ledger.apply_deltas(deltas)
+            ledger.bump_version({user_id for user_id, month, category_id, tx_type in deltas})
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def between(self, first, last):
+        """Transactions dated from first to last (day ordinals, inclusive), via the index"""
+        return self.filter(day_ordinal__gte=first, day_ordinal__lte=last)
+
+
 class Transaction(models.Model):
     """تراکنش مالی"""
     INCOME = 'INCOME'
@@ -38,17 +99,55 @@ class Transaction(models.Model):
     amount = models.DecimalField(max_digits=15, decimal_places=0, verbose_name='مبلغ')
     type = models.CharField(max_length=10, choices=TYPE_CHOICES, verbose_name='نوع')
     date = models.CharField(max_length=10, verbose_name='تاریخ')  # Format: 1403/MM/DD
+    # date.toordinal() of the Jalali date, kept in step with `date` on save
+    day_ordinal = models.IntegerField(null=True, blank=True, editable=False, verbose_name='شماره روز')
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, verbose_name='دسته‌بندی')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')
 
+    objects = TransactionQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'تراکنش'
         verbose_name_plural = 'تراکنش‌ها'
         ordering = ['-created_at']
+        # Every read is per user: latest first, by date window, by type, by category
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='core_tx_user_created'),
+            models.Index(fields=['user', 'day_ordinal'], name='core_tx_user_day'),
+            models.Index(fields=['user', 'type', 'day_ordinal'], name='core_tx_user_type_day'),
+            models.Index(fields=['user', 'category', 'type'], name='core_tx_user_category_type'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.amount}"
 
+    def save(self, *args, **kwargs):
+        from .services import jalali
+
+        self.day_ordinal = jalali.to_ordinal(self.date)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'date' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'day_ordinal'}
+        super().save(*args, **kwargs)
+
+
+class LedgerRollup(models.Model):
+    """جمع تراکنش‌های هر کاربر به تفکیک ماه شمسی، دسته‌بندی و نوع"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ledger_rollups', verbose_name='کاربر')
+    month = models.CharField(max_length=7, verbose_name='ماه')  # Format: 1403/MM
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='+', verbose_name='دسته‌بندی')
+    type = models.CharField(max_length=10, choices=Transaction.TYPE_CHOICES, verbose_name='نوع')
+    total = models.DecimalField(max_digits=18, decimal_places=0, default=0, verbose_name='جمع مبلغ')
+    count = models.IntegerField(default=0, verbose_name='تعداد')
+
+    class Meta:
+        verbose_name = 'خلاصه دفتر'
+        verbose_name_plural = 'خلاصه‌های دفتر'
+        unique_together = ['user', 'month', 'category', 'type']
+
+    def __str__(self):
+        return f"{self.user} {self.month} {self.type} - {self.total}"
+
 
 class Budget(models.Model):
     """سقف بودجه برای هر دسته‌بندی"""
@@ -80,6 +179,7 @@ class Goal(models.Model):
     target_amount = models.DecimalField(max_digits=15, decimal_places=0, verbose_name='مبلغ هدف')
     current_amount = models.DecimalField(max_digits=15, decimal_places=0, default=0, verbose_name='مبلغ فعلی')
     deadline = models.CharField(max_length=10, verbose_name='مهلت')  # Format: 1403/MM/DD
+    deadline_ordinal = models.IntegerField(null=True, blank=True, db_index=True, editable=False, verbose_name='شماره روز مهلت')
     icon = models.CharField(max_length=50, default='bi-trophy', verbose_name='آیکون')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')
 
@@ -91,6 +191,15 @@ class Goal(models.Model):
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        from .services import jalali
+
+        self.deadline_ordinal = jalali.to_ordinal(self.deadline)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'deadline' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'deadline_ordinal'}
+        super().save(*args, **kwargs)
+
     @property
     def progress(self):
         if self.target_amount > 0:
@@ -102,6 +211,69 @@ class Goal(models.Model):
         return max(self.target_amount - self.current_amount, 0)
 
 
+class SpendingAnalysis(models.Model):
+    """آخرین تحلیل هوشمند مخارج هر کاربر"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='spending_analysis', verbose_name='کاربر')
+    fingerprint = models.CharField(max_length=64, verbose_name='اثر انگشت تراکنش‌ها')
+    text = models.TextField(verbose_name='متن تحلیل')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='تاریخ بروزرسانی')
+
+    class Meta:
+        verbose_name = 'تحلیل مخارج'
+        verbose_name_plural = 'تحلیل‌های مخارج'
+
+    def __str__(self):
+        return f"{self.user} - {self.updated_at:%Y-%m-%d %H:%M}"
+
+
+class ImportJob(models.Model):
+    """ورود فایل CSV تراکنش‌ها در پس‌زمینه"""
+    PENDING = 'PENDING'
+    RUNNING = 'RUNNING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (PENDING, 'در صف'),
+        (RUNNING, 'در حال انجام'),
+        (DONE, 'انجام شد'),
+        (FAILED, 'ناموفق'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='import_jobs', verbose_name='کاربر')
+    file = models.FileField(upload_to='imports/%Y/%m/', verbose_name='فایل')
+    name = models.CharField(max_length=255, verbose_name='نام فایل')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, verbose_name='وضعیت')
+    total_rows = models.PositiveIntegerField(null=True, blank=True, verbose_name='تعداد تقریبی سطرها')
+    rows_done = models.PositiveIntegerField(default=0, verbose_name='سطرهای پردازش‌شده')
+    rows_created = models.PositiveIntegerField(default=0, verbose_name='تراکنش‌های واردشده')
+    rows_failed = models.PositiveIntegerField(default=0, verbose_name='سطرهای ناموفق')
+    errors = models.JSONField(default=list, blank=True, verbose_name='خطاها')
+    message = models.TextField(blank=True, verbose_name='پیام')
+    claim = models.CharField(max_length=32, blank=True, verbose_name='شناسه پردازشگر')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='تاریخ بروزرسانی')
+
+    class Meta:
+        verbose_name = 'ورود CSV'
+        verbose_name_plural = 'ورودهای CSV'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.name} - {self.get_status_display()}"
+
+    @property
+    def finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+    @property
+    def percent(self):
+        if self.status == self.DONE:
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(99, self.rows_done * 100 // self.total_rows)
+
+
 class UserProfile(models.Model):
     """پروفایل کاربر"""
     THEME_CHOICES = [
@@ -114,6 +286,9 @@ class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, verbose_name='کاربر')
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True, verbose_name='تصویر پروفایل')
     theme = models.CharField(max_length=20, choices=THEME_CHOICES, default='olive', verbose_name='تم')
+    # Bumped on every write to the user's transactions, categories or budgets (ETags)
+    ledger_version = models.PositiveIntegerField(default=0, editable=False, verbose_name='نسخه دفتر')
+    ledger_changed_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='آخرین تغییر دفتر')
 
     class Meta:
         verbose_name = 'پروفایل کاربر'
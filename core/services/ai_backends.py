@@ -0,0 +1,139 @@
+"""
+AI backend registry for KifPool
+Views and services call the functions here, which forward to the backend
+named by settings.AI_BACKEND: the local llama.cpp server, Gemini or the
+in-process stub for load tests. A backend is a module that implements every
+function in INTERFACE with the same signature. Identical calls in flight at
+the same time share one answer (services.single_flight); streams do not.
+While a backend's circuit breaker is open, calls raise Unavailable at once
+and callers answer with services.ai_fallback instead.
+"""
+from importlib import import_module
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from . import circuit_breaker, single_flight
+
+
+BACKENDS = {
+    'llama': 'core.services.llama_service',
+    'gemini': 'core.services.gemini_service',
+    'stub': 'core.services.stub_service',
+}
+
+INTERFACE = (
+    'get_financial_advice', 'aget_financial_advice', 'stream_financial_advice',
+    'analyze_spending', 'aanalyze_spending',
+    'get_goal_advice', 'aget_goal_advice',
+)
+
+_loaded = {}
+
+
+class Unavailable(Exception):
+    """The backend's circuit is open; answer without the model"""
+
+
+class ErrorText(str):
+    """
+    What a backend returns instead of an answer when the call failed: shown
+    to the user like any text, but never stored as the model's output
+    """
+
+
+def name():
+    return getattr(settings, 'AI_BACKEND', 'llama')
+
+
+def load(backend):
+    """The module of a backend, checked against INTERFACE on first use"""
+    if backend not in _loaded:
+        if backend not in BACKENDS:
+            raise ImproperlyConfigured(f"Unknown AI_BACKEND {backend!r}; choose one of {', '.join(BACKENDS)}")
+        module = import_module(BACKENDS[backend])
+        missing = [function for function in INTERFACE if not callable(getattr(module, function, None))]
+        if missing:
+            raise ImproperlyConfigured(f"AI backend {backend!r} does not implement {', '.join(missing)}")
+        _loaded[backend] = module
+    return _loaded[backend]
+
+
+def current():
+    """The configured backend (resolved on every call, so override_settings applies)"""
+    return load(name())
+
+
+def available():
+    """False while the configured backend's circuit is open (does not use up a probe)"""
+    return not circuit_breaker.enabled() or not circuit_breaker.get(name()).is_open()
+
+
+def _check(backend):
+    if circuit_breaker.enabled() and not circuit_breaker.get(backend).allow():
+        raise Unavailable(backend)
+
+
+def _guarded(backend, func):
+    def run(*args):
+        _check(backend)
+        return func(*args)
+    return run
+
+
+def _aguarded(backend, func):
+    async def run(*args):
+        _check(backend)
+        return await func(*args)
+    return run
+
+
+def call(function, *args):
+    """backend.function(*args), coalesced with identical calls in flight"""
+    backend = name()
+    # Checked by the caller that runs it, so coalesced callers share one probe
+    func = _guarded(backend, getattr(load(backend), function))
+    if not single_flight.enabled():
+        return func(*args)
+    group = single_flight.get_group()
+    return group.do(group.make_key(backend, function, *args), func, *args)
+
+
+async def acall(function, *args):
+    """Async twin of call(); keyed like the sync function, so processes of either kind share"""
+    backend = name()
+    func = _aguarded(backend, getattr(load(backend), function))
+    if not single_flight.enabled():
+        return await func(*args)
+    group = single_flight.get_group()
+    return await group.ado(group.make_key(backend, function[1:], *args), func, *args)
+
+
+def get_financial_advice(query, context):
+    return call('get_financial_advice', query, context)
+
+
+async def aget_financial_advice(query, context):
+    return await acall('aget_financial_advice', query, context)
+
+
+def stream_financial_advice(query, context):
+    backend = name()
+    _check(backend)
+    return load(backend).stream_financial_advice(query, context)
+
+
+def analyze_spending(context):
+    return call('analyze_spending', context)
+
+
+async def aanalyze_spending(context):
+    return await acall('aanalyze_spending', context)
+
+
+def get_goal_advice(goal_title, amount_needed, deadline, facts, context):
+    return call('get_goal_advice', goal_title, amount_needed, deadline, facts, context)
+
+
+async def aget_goal_advice(goal_title, amount_needed, deadline, facts, context):
+    return await acall('aget_goal_advice', goal_title, amount_needed, deadline, facts, context)
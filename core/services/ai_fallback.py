@@ -0,0 +1,63 @@
+"""
+Rule-based answers for KifPool's AI features
+Used while the AI backend's circuit is open: a fixed set of rules over the
+user's financial snapshot (services.financial_context) gives an instant,
+deterministic summary and a few tips instead of a model answer.
+"""
+NOTICE = 'مشاور هوشمند موقتا در دسترس نیست؛ این پاسخ از روی اعداد حساب شما تهیه شده است.'
+EMPTY = 'هنوز تراکنشی ثبت نشده است.'
+BIG_SHARE = 40  # percent of the month's spending that makes a category worth a budget
+
+
+def _percent(part, whole):
+    return round(part * 100 / whole) if whole else 0
+
+
+def spending_summary(data):
+    """Two or three sentences on this month's spending"""
+    if not data['count']:
+        return EMPTY
+    month, income, expense = data['trend'][-1]
+    sentences = [f'در ماه {month} {expense:,} تومان هزینه و {income:,} تومان درآمد ثبت شده است.']
+    if data['categories'] and expense:
+        name, total = data['categories'][0]
+        sentences.append(f'بیشترین هزینه در دسته «{name}» بوده است ({_percent(total, expense)}٪).')
+    if len(data['trend']) > 1:
+        previous = data['trend'][-2][2]
+        if previous:
+            change = _percent(expense - previous, previous)
+            if change:
+                direction = 'بیشتر' if change > 0 else 'کمتر'
+                sentences.append(f'هزینه‌ها نسبت به ماه قبل {abs(change)}٪ {direction} شده است.')
+    return ' '.join(sentences)
+
+
+def tips(data):
+    """Short suggestions that follow from the numbers"""
+    _, income, expense = data['trend'][-1]
+    suggestions = []
+    if expense > income:
+        suggestions.append('هزینه‌های این ماه از درآمد آن بیشتر است؛ خریدهای غیرضروری را به ماه بعد موکول کنید.')
+    if data['categories'] and _percent(data['categories'][0][1], expense) >= BIG_SHARE:
+        suggestions.append(f'برای دسته «{data["categories"][0][0]}» بودجه ماهانه تعیین کنید.')
+    if data['merchants']:
+        suggestions.append(f'بیشترین پرداخت‌های اخیر شما به «{data["merchants"][0][0]}» بوده است؛ آن را بازبینی کنید.')
+    suggestions.append('بخشی از درآمد را در ابتدای ماه برای پس‌انداز کنار بگذارید.')
+    return suggestions[:3]
+
+
+def _answer(*parts):
+    return '\n\n'.join(part for part in parts if part)
+
+
+def financial_advice(data):
+    """Stand-in for the advisor's answer"""
+    if not data['count']:
+        return _answer(NOTICE, EMPTY)
+    return _answer(NOTICE, spending_summary(data), '\n'.join(f'• {tip}' for tip in tips(data)))
+
+
+def goal_advice(data, facts):
+    """Stand-in for goal advice: the computed plan and the general tips"""
+    suggestions = tips(data) if data['count'] else []
+    return _answer(NOTICE, facts, '\n'.join(f'• {tip}' for tip in suggestions))
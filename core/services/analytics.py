@@ -0,0 +1,112 @@
+"""
+Analytics chart data for KifPool
+Income and expense per Jalali day, week (Saturday to Friday), month or year,
+grouped in the database: days and weeks from the transactions' day ordinals,
+months and years from the ledger rollups. Python only formats the buckets.
+Days and weeks cover a fixed window ending at the user's latest transaction,
+an index range scan, so their cost does not grow with the user's history.
+"""
+from django.db.models import F, Max, Q, Sum
+from django.db.models.functions import Substr
+
+from ..models import LedgerRollup, Transaction
+from . import jalali, ledger
+
+
+PERIODS = ('daily', 'weekly', 'monthly', 'yearly')
+UNKNOWN = 'Unknown'
+DAYS_SHOWN = 90
+WEEKS_SHOWN = 52
+
+
+def _split(amount_field):
+    """income/expense annotations summing amount_field by transaction type"""
+    return {
+        'income': Sum(amount_field, filter=Q(type=Transaction.INCOME)),
+        'expense': Sum(amount_field, filter=Q(type=Transaction.EXPENSE)),
+    }
+
+
+def window(user, period):
+    """(first, last) day ordinals charted for daily/weekly, or None if the user has no dated transactions"""
+    last = Transaction.objects.filter(user=user).aggregate(last=Max('day_ordinal'))['last']
+    if last is None:
+        return None
+    if period == 'weekly':
+        return jalali.week_start(last) - 7 * (WEEKS_SHOWN - 1), last
+    return last - DAYS_SHOWN + 1, last
+
+
+def _day_rows(user, period):
+    span = window(user, period)
+    if span is None:
+        return []
+    transactions = Transaction.objects.filter(user=user).between(*span).order_by()
+    if period == 'weekly':
+        # Saturday of the week, as jalali.week_start does
+        transactions = transactions.annotate(bucket=F('day_ordinal') - (F('day_ordinal') + 1) % 7)
+    else:
+        transactions = transactions.annotate(bucket=F('day_ordinal'))
+    rows = list(transactions.values('bucket').annotate(**_split('amount')).order_by('bucket'))
+    return [
+        dict(row, period=label)
+        for row, label in zip(rows, jalali.format_many([row['bucket'] for row in rows]))
+    ]
+
+
+def _rollup_rows(user, period):
+    rollups = LedgerRollup.objects.filter(user=user).order_by()
+    if period == 'yearly':
+        rollups = rollups.annotate(bucket=Substr('month', 1, 4))
+    else:
+        rollups = rollups.annotate(bucket=F('month'))
+    rows = rollups.values('bucket').annotate(**_split('total')).order_by('bucket')
+    # Rows without a date sort first as ''; report them last, like the day buckets
+    rows = [dict(row, period=row['bucket'] or UNKNOWN) for row in rows]
+    return [row for row in rows if row['bucket']] + [row for row in rows if not row['bucket']]
+
+
+def period_totals(user, period='monthly'):
+    """
+    [{'period', 'income', 'expense'}] oldest bucket first. Months and years
+    cover the whole history, with 'Unknown' (no valid date) last.
+    """
+    if period in ('daily', 'weekly'):
+        rows = _day_rows(user, period)
+    else:
+        rows = _rollup_rows(user, period)
+    return [
+        {'period': row['period'], 'income': float(row['income'] or 0), 'expense': float(row['expense'] or 0)}
+        for row in rows
+    ]
+
+
+def chart_data(user, period='monthly'):
+    """Everything the analytics page charts: buckets, categories, net worth and totals"""
+    period_data = period_totals(user, period if period in PERIODS else 'monthly')
+
+    category_data = {}
+    for row in ledger.category_totals(user):
+        cat_name = row['category__name_fa'] if row['category'] else 'سایر'
+        category_data[cat_name] = category_data.get(cat_name, 0) + float(row['total'])
+
+    # Net worth carries everything before the charted buckets
+    totals = ledger.totals(user)
+    cumulative = float(totals['income'] - totals['expense']) - sum(d['income'] - d['expense'] for d in period_data)
+    net_worth_data = []
+    for data in period_data:
+        cumulative += data['income'] - data['expense']
+        net_worth_data.append({'period': data['period'], 'value': cumulative})
+
+    total_income = float(totals['income'])
+    total_expense = float(totals['expense'])
+    return {
+        'period_data': period_data,
+        'categories': [{'name': k, 'value': v} for k, v in category_data.items()],
+        'netWorth': net_worth_data,
+        'totals': {
+            'income': total_income,
+            'expense': total_expense,
+            'balance': total_income - total_expense,
+        },
+    }
@@ -0,0 +1,88 @@
+"""
+Async HTTP client for the AI backends (ASGI views)
+Shares the per-backend request slots of http_client, but waits for a free
+slot on the event loop instead of blocking a thread, so one worker can hold
+many pending model calls. Tasks of a loop queue first-come first-served on
+an asyncio.Semaphore of the same size before taking a process-wide slot.
+"""
+import asyncio
+import time
+import weakref
+from contextlib import asynccontextmanager
+
+import httpx
+
+from . import circuit_breaker
+from .http_client import BackendBusy, backend_config, semaphore
+
+
+SLOT_POLL_INTERVAL = 0.02  # seconds between attempts to grab a slot another loop holds
+
+_clients = weakref.WeakKeyDictionary()  # event loop -> AsyncClient
+_queues = weakref.WeakKeyDictionary()   # event loop -> {backend: asyncio.Semaphore}
+
+
+def get_client():
+    """Keep-alive AsyncClient bound to the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        pool_size = backend_config(None)['POOL_SIZE']
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+        _clients[loop] = client
+    return client
+
+
+def queue(backend):
+    """FIFO queue of the running loop in front of the backend's slots"""
+    queues = _queues.setdefault(asyncio.get_running_loop(), {})
+    if backend not in queues:
+        queues[backend] = asyncio.Semaphore(backend_config(backend)['MAX_CONCURRENCY'])
+    return queues[backend]
+
+
+@asynccontextmanager
+async def slot(backend):
+    """Hold one of the backend's request slots without tying up a thread"""
+    config = backend_config(backend)
+    busy = BackendBusy(f'{backend}: all {config["MAX_CONCURRENCY"]} slots busy')
+    deadline = time.monotonic() + config['QUEUE_TIMEOUT']
+    waiting = queue(backend)
+    try:
+        await asyncio.wait_for(waiting.acquire(), config['QUEUE_TIMEOUT'])
+    except asyncio.TimeoutError:
+        raise busy from None
+    try:
+        # Only slots held by other threads or loops are left to poll for
+        slots = semaphore(backend)
+        while not slots.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                raise busy
+            await asyncio.sleep(SLOT_POLL_INTERVAL)
+        try:
+            yield
+        finally:
+            slots.release()
+    finally:
+        waiting.release()
+
+
+def timeout(backend):
+    config = backend_config(backend)
+    return httpx.Timeout(config['READ_TIMEOUT'], connect=config['CONNECT_TIMEOUT'])
+
+
+async def post(backend, url, **kwargs):
+    """POST through the loop's client while holding one of the backend's slots"""
+    kwargs.setdefault('timeout', timeout(backend))
+    started = time.monotonic()
+    try:
+        async with slot(backend):
+            response = await get_client().post(url, **kwargs)
+    except (httpx.HTTPError, BackendBusy):
+        circuit_breaker.record(backend, False, time.monotonic() - started)
+        raise
+    circuit_breaker.record(backend, response.status_code < 500, time.monotonic() - started)
+    return response
@@ -0,0 +1,103 @@
+"""
+In-process background worker for KifPool
+Runs slow jobs (AI calls, imports) off the request thread without a broker
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_lock = threading.Lock()
+_pending = set()  # keys of jobs queued or running
+_tasks = set()  # strong references to running asyncio tasks
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'BACKGROUND_WORKERS', 4),
+                thread_name_prefix='kifpol-worker',
+            )
+        return _executor
+
+
+def _run(key, func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Background job %r failed', key)
+    finally:
+        with _lock:
+            _pending.discard(key)
+        # Worker threads own their DB connections; don't leak them
+        connections.close_all()
+
+
+def is_pending(key):
+    with _lock:
+        return key in _pending
+
+
+def submit(key, func, *args, **kwargs):
+    """
+    Queue func(*args, **kwargs) unless a job with the same key is already
+    queued or running. Returns True if the job was queued.
+    """
+    with _lock:
+        if key in _pending:
+            return False
+        _pending.add(key)
+
+    if getattr(settings, 'BACKGROUND_EAGER', False):
+        # Run inline (tests, management commands); keep the caller's connection
+        try:
+            func(*args, **kwargs)
+        finally:
+            with _lock:
+                _pending.discard(key)
+        return True
+
+    _get_executor().submit(_run, key, func, args, kwargs)
+    return True
+
+
+async def _run_async(key, func, args, kwargs):
+    try:
+        await func(*args, **kwargs)
+    except Exception:
+        logger.exception('Background task %r failed', key)
+    finally:
+        with _lock:
+            _pending.discard(key)
+
+
+async def submit_async(key, func, *args, **kwargs):
+    """
+    Like submit, for coroutine functions: the job runs as a task on the
+    running event loop (ASGI), so waiting on it costs no thread.
+    """
+    with _lock:
+        if key in _pending:
+            return False
+        _pending.add(key)
+
+    if getattr(settings, 'BACKGROUND_EAGER', False):
+        try:
+            await func(*args, **kwargs)
+        finally:
+            with _lock:
+                _pending.discard(key)
+        return True
+
+    task = asyncio.get_running_loop().create_task(_run_async(key, func, args, kwargs))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return True
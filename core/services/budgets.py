@@ -0,0 +1,88 @@
+"""
+Budget evaluation for KifPool
+Usage of each budget within its own period, the current Jalali month or the
+current Saturday-to-Friday week: one query for the budgets and one grouped
+query for the spending of both windows, however many categories there are.
+"""
+import datetime
+
+from django.db.models import Q, Sum
+
+from ..models import Budget, Transaction
+from . import jalali
+
+
+NEAR_PERCENT = 80
+
+
+def period_range(period, ordinal):
+    """First and last day ordinal of the budget period that contains ordinal"""
+    if period == Budget.WEEKLY:
+        return jalali.week_range(ordinal)
+    year, month, _ = jalali.from_ordinal(ordinal)
+    return jalali.month_range(year, month)
+
+
+def period_label(period, ordinal):
+    """Persian label of the current period, e.g. 'مهر 1403' or '1403/07/05 تا 1403/07/11'"""
+    if period == Budget.WEEKLY:
+        first, last = jalali.week_range(ordinal)
+        return f'{jalali.format_ordinal(first)} تا {jalali.format_ordinal(last)}'
+    year, month, _ = jalali.from_ordinal(ordinal)
+    return f'{jalali.MONTH_NAMES[month - 1]} {year}'
+
+
+def spending(user, ordinal):
+    """
+    {category_id: {period: spent}} of the user's expenses in the current month
+    and week, both summed by one grouped query over (user, type, day_ordinal).
+    """
+    ranges = {period: period_range(period, ordinal) for period, _ in Budget.PERIOD_CHOICES}
+    first = min(start for start, _ in ranges.values())
+    last = max(end for _, end in ranges.values())
+    rows = (
+        Transaction.objects.filter(user=user, type=Transaction.EXPENSE)
+        .between(first, last)
+        .order_by()
+        .values('category')
+        .annotate(**{
+            period: Sum('amount', filter=Q(day_ordinal__range=window))
+            for period, window in ranges.items()
+        })
+    )
+    return {
+        row['category']: {period: row[period] or 0 for period in ranges}
+        for row in rows
+    }
+
+
+def evaluate(user, categories, today=None):
+    """
+    One entry per category for the budget page: its budget (or None), the
+    spending in the budget's period, the limit and how much of it is used.
+    """
+    ordinal = (today or datetime.date.today()).toordinal()
+    budgets = {budget.category_id: budget for budget in Budget.objects.filter(user=user)}
+    spent_by_category = spending(user, ordinal)
+    labels = {period: period_label(period, ordinal) for period, _ in Budget.PERIOD_CHOICES}
+
+    budget_data = []
+    for category in categories:
+        budget = budgets.get(category.id)
+        period = budget.period if budget else Budget.MONTHLY
+        spent = spent_by_category.get(category.id, {}).get(period, 0)
+        limit = budget.limit if budget else 0
+        percent = int(spent / limit * 100) if limit > 0 else 0
+
+        budget_data.append({
+            'category': category,
+            'budget': budget,
+            'period': period,
+            'period_label': labels[period],
+            'spent': spent,
+            'limit': limit,
+            'percent': min(percent, 100),
+            'over_budget': percent >= 100,
+            'near_budget': NEAR_PERCENT <= percent < 100,
+        })
+    return budget_data
@@ -0,0 +1,112 @@
+"""
+Per-user category tree for KifPool
+The categories a user can pick (defaults plus their own), with parents linked
+in memory, built in one query and kept in the Django cache. Keys carry a
+version per user and one for the defaults; Category signals bump them, so a
+stale tree is never read again. Processes only see each other's bumps through
+a shared cache backend (file, Memcached, Redis).
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q
+
+from ..models import Category
+
+
+TIMEOUT = 24 * 3600
+DEFAULTS_VERSION_KEY = 'categories:version:defaults'
+
+
+def _cache():
+    return caches[getattr(settings, 'CATEGORY_CACHE_ALIAS', 'default')]
+
+
+def _version_key(user_id):
+    return f'categories:version:{user_id}'
+
+
+class CategoryTree:
+    """Visible categories of one user, in id order, with their parents attached"""
+
+    def __init__(self, user_id, categories):
+        self.user_id = user_id
+        self.categories = categories
+        self.by_id = {category.id: category for category in categories}
+        self.children = {}
+        for category in categories:
+            parent = self.by_id.get(category.parent_id)
+            if parent is not None:
+                category.parent = parent  # __str__ reads it without a query
+                self.children.setdefault(parent.id, []).append(category)
+
+    def __iter__(self):
+        return iter(self.categories)
+
+    def __len__(self):
+        return len(self.categories)
+
+    def get(self, category_id):
+        return self.by_id.get(category_id)
+
+    @property
+    def defaults(self):
+        return [category for category in self.categories if category.is_default]
+
+    @property
+    def owned(self):
+        """The user's own categories"""
+        return [category for category in self.categories if category.user_id == self.user_id]
+
+    @property
+    def roots(self):
+        """Categories that can be a parent (nesting is one level deep)"""
+        return [category for category in self.categories if category.parent_id is None]
+
+    def family_ids(self, category_id):
+        """category_id and the ids of its subcategories"""
+        return [category_id, *(child.id for child in self.children.get(category_id, []))]
+
+    def choices(self, categories=None):
+        """(id, display name) pairs for a select"""
+        return [(category.id, str(category)) for category in (self.categories if categories is None else categories)]
+
+
+def _versions(user_id):
+    cache = _cache()
+    keys = [_version_key(user_id), DEFAULTS_VERSION_KEY]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, None)
+            versions[key] = cache.get(key)
+    return versions[keys[0]], versions[keys[1]]
+
+
+def load(user_id):
+    categories = list(
+        Category.objects.filter(Q(is_default=True) | Q(user_id=user_id)).order_by('id')
+    )
+    return CategoryTree(user_id, categories)
+
+
+def get(user):
+    """The user's CategoryTree, from the cache when it is current"""
+    user_version, defaults_version = _versions(user.id)
+    key = f'categories:tree:{user.id}:{user_version}:{defaults_version}'
+    cache = _cache()
+    tree = cache.get(key)
+    if tree is None:
+        tree = load(user.id)
+        cache.set(key, tree, TIMEOUT)
+    return tree
+
+
+def invalidate(category):
+    """Make the trees that include category stale (its owner's, or everyone's for a default)"""
+    if category.is_default or category.user_id is None:
+        key = DEFAULTS_VERSION_KEY
+    else:
+        key = _version_key(category.user_id)
+    _cache().set(key, uuid.uuid4().hex, None)
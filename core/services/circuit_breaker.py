@@ -0,0 +1,164 @@
+"""
+Circuit breakers for the AI backends
+Each backend keeps the outcome and latency of its recent calls. When too
+many of them fail, or the 95th percentile latency passes SLOW_SECONDS, the
+circuit opens and calls are refused at once instead of waiting out a
+timeout. After OPEN_SECONDS one probe call is let through (half-open): if it
+succeeds the circuit closes, otherwise it opens again. State is per process.
+"""
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    'WINDOW': 20,           # recent calls considered
+    'MIN_CALLS': 5,         # calls needed in the window before it can trip
+    'FAILURE_RATE': 0.5,    # share of failed calls that trips it
+    'SLOW_SECONDS': 30,     # p95 latency that trips it
+    'OPEN_SECONDS': 30,     # time before a probe is let through
+}
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+def config(name):
+    return getattr(settings, 'AI_CIRCUIT', {}).get(name, DEFAULTS[name])
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers, or None if it is empty"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q / 100), len(ordered) - 1)]
+
+
+class CircuitBreaker:
+    """Closed, open or half-open state of one backend"""
+
+    def __init__(self, window=20, min_calls=5, failure_rate=0.5, slow_seconds=30, open_seconds=30):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_seconds = slow_seconds
+        self.open_seconds = open_seconds
+        self._calls = deque(maxlen=window)  # (succeeded, seconds)
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.opened_at = None
+        self.probe_started = None
+        self.trips = 0
+        self.rejected = 0
+
+    def _update(self, now):
+        if self.state == OPEN and now - self.opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+            self.probe_started = None
+
+    def _trip(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        self.trips += 1
+        self._calls.clear()
+
+    def is_open(self):
+        """Whether calls would be refused now (without using up the half-open probe)"""
+        now = time.monotonic()
+        with self._lock:
+            self._update(now)
+            if self.state == HALF_OPEN:
+                return self.probe_started is not None and now - self.probe_started < self.open_seconds
+            return self.state == OPEN
+
+    def allow(self):
+        """May a call go to the backend? In half-open state only one probe at a time may."""
+        now = time.monotonic()
+        with self._lock:
+            self._update(now)
+            if self.state == CLOSED:
+                return True
+            # A probe that never reported back (e.g. answered from cache) expires
+            if self.state == HALF_OPEN and (
+                self.probe_started is None or now - self.probe_started >= self.open_seconds
+            ):
+                self.probe_started = now
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, succeeded, seconds):
+        """Outcome of a call that reached the backend"""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if succeeded and seconds < self.slow_seconds:
+                    self.state = CLOSED
+                    self.probe_started = None
+                else:
+                    self._trip(now)
+                return
+            if self.state == OPEN:
+                return  # finished after the circuit opened
+            self._calls.append((succeeded, seconds))
+            if len(self._calls) < self.min_calls:
+                return
+            failures = sum(1 for ok, _ in self._calls if not ok)
+            if (
+                failures / len(self._calls) >= self.failure_rate
+                or percentile([latency for _, latency in self._calls], 95) >= self.slow_seconds
+            ):
+                self._trip(now)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            self._update(now)
+            latencies = [latency for _, latency in self._calls]
+            failures = sum(1 for ok, _ in self._calls if not ok)
+            return {
+                'state': self.state,
+                'calls': len(self._calls),
+                'failure_rate': failures / len(self._calls) if self._calls else 0.0,
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'trips': self.trips,
+                'rejected': self.rejected,
+            }
+
+
+_breakers = {}
+_lock = threading.Lock()
+
+
+def enabled():
+    return config('ENABLED')
+
+
+def get(backend):
+    """Process-wide breaker of a backend, configured by settings.AI_CIRCUIT"""
+    with _lock:
+        if backend not in _breakers:
+            _breakers[backend] = CircuitBreaker(
+                window=config('WINDOW'),
+                min_calls=config('MIN_CALLS'),
+                failure_rate=config('FAILURE_RATE'),
+                slow_seconds=config('SLOW_SECONDS'),
+                open_seconds=config('OPEN_SECONDS'),
+            )
+        return _breakers[backend]
+
+
+def record(backend, succeeded, seconds):
+    if enabled():
+        get(backend).record(succeeded, seconds)
+
+
+def reset():
+    """Forget every breaker's state (settings changes, tests)"""
+    with _lock:
+        _breakers.clear()
@@ -0,0 +1,59 @@
+"""
+Dashboard data assembly for KifPool
+Everything the dashboard renders, in a fixed number of queries
+"""
+from ..models import Transaction
+from . import ledger
+
+
+RECENT_COUNT = 5
+CHART_POINTS = 10
+
+
+def signed_amount(tx):
+    return tx.amount if tx.type == Transaction.INCOME else -tx.amount
+
+
+def running_balance(latest, balance):
+    """
+    Balance after each of the newest transactions, oldest point first.
+    Walks back from the current balance, so only the charted rows are read.
+    """
+    points = []
+    for tx in latest[:CHART_POINTS]:
+        points.append(float(balance))
+        balance -= signed_amount(tx)
+    return points[::-1]
+
+
+def top_expense_category(user):
+    """Name of the category the user spends most on, or None"""
+    category_totals = {}
+    for row in ledger.category_totals(user):
+        cat_name = row['category__name'] if row['category'] else 'Other'
+        category_totals[cat_name] = category_totals.get(cat_name, 0) + row['total']
+    if not category_totals:
+        return None
+    return max(category_totals, key=category_totals.get)
+
+
+def build_dashboard(user):
+    """Totals, recent transactions, top spending category and chart points"""
+    totals = ledger.totals(user)
+    balance = totals['income'] - totals['expense']
+
+    latest = list(
+        Transaction.objects.filter(user=user)
+        .select_related('category')
+        .order_by('-created_at', '-id')[:max(RECENT_COUNT, CHART_POINTS)]
+    )
+
+    return {
+        'total_income': totals['income'],
+        'total_expense': totals['expense'],
+        'balance': balance,
+        'transaction_count': totals['count'],
+        'recent_transactions': latest[:RECENT_COUNT],
+        'top_category': top_expense_category(user) if totals['expense'] else None,
+        'chart_data': running_balance(latest, balance),
+    }
@@ -0,0 +1,53 @@
+"""
+Default category registry for KifPool
+The default categories are seeded by migration 0008 and change only through
+the admin, so their ids are read once per process and kept in memory.
+Category signals drop the registry when a default category is written;
+queryset update()/bulk_create() bypass them and must call invalidate().
+"""
+import threading
+
+from ..models import Category
+
+
+_lock = threading.Lock()
+_ids = None  # lower-cased name and Persian name -> id
+_generation = 0
+
+
+def _load():
+    ids = {}
+    rows = Category.objects.filter(is_default=True).order_by('id').values_list('id', 'name', 'name_fa')
+    for category_id, name, name_fa in rows:
+        for key in (name.strip().lower(), name_fa.strip().lower()):
+            if key:
+                ids[key] = category_id
+    return ids
+
+
+def ids():
+    """Default category id by lower-cased English name and by Persian name"""
+    global _ids
+    current = _ids
+    if current is not None:
+        return current
+    with _lock:
+        generation = _generation
+    current = _load()
+    with _lock:
+        # Keep it only if no default category changed while it was loading
+        if generation == _generation:
+            _ids = current
+    return current
+
+
+def get_id(name):
+    """Id of the default category called name (either language), or None"""
+    return ids().get((name or '').strip().lower())
+
+
+def invalidate():
+    global _ids, _generation
+    with _lock:
+        _ids = None
+        _generation += 1
@@ -0,0 +1,154 @@
+"""
+Financial context for KifPool's AI prompts
+One compact Persian summary of a user's finances shared by every prompt:
+totals, this month's spending per category, the last few months' trend and
+the top merchants of recent months. The snapshot is built from the ledger
+rollups plus one windowed query, cached under the user's ledger version (so
+any write refreshes it) and trimmed to a token budget, which bounds the
+prompt the model has to prefill.
+"""
+import datetime
+import math
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Sum
+
+from ..models import LedgerRollup, Transaction
+from . import jalali, ledger
+
+
+DEFAULTS = {
+    'ALIAS': 'default',    # Django cache alias for the snapshots
+    'MAX_TOKENS': 250,     # context budget per prompt
+    'TREND_MONTHS': 3,     # months in the trend, the current one included
+    'TOP_MERCHANTS': 5,
+    'MERCHANT_DAYS': 90,   # window the top merchants are taken from
+}
+CHARS_PER_TOKEN = 3  # rough for Persian text under llama.cpp's tokenizers
+TIMEOUT = 24 * 3600
+OTHER = 'سایر'
+
+
+def _setting(name):
+    return getattr(settings, 'AI_CONTEXT', {}).get(name, DEFAULTS[name])
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def month_of(ordinal):
+    year, month, _ = jalali.from_ordinal(ordinal)
+    return f'{year:04d}/{month:02d}'
+
+
+def recent_months(ordinal, count):
+    """The count Jalali months ending with ordinal's, oldest first ('1403/05', ...)"""
+    year, month, _ = jalali.from_ordinal(ordinal)
+    key = year * 12 + month - 1
+    return [f'{k // 12:04d}/{k % 12 + 1:02d}' for k in range(key - count + 1, key + 1)]
+
+
+def snapshot(user, today=None):
+    """Plain dict of the numbers the prompts are given (three queries)"""
+    ordinal = (today or datetime.date.today()).toordinal()
+    months = recent_months(ordinal, _setting('TREND_MONTHS'))
+    totals = ledger.totals(user)
+
+    trend = {month: [0, 0] for month in months}
+    this_month = {}
+    rows = (
+        # An exact match: a range would also take malformed buckets such as '1402/9/'
+        LedgerRollup.objects.filter(user=user, month__in=months)
+        .order_by()
+        .values('month', 'type', 'category__name_fa')
+        .annotate(total=Sum('total'))
+    )
+    for row in rows:
+        trend[row['month']][row['type'] == Transaction.EXPENSE] += row['total']
+        if row['month'] == months[-1] and row['type'] == Transaction.EXPENSE:
+            name = row['category__name_fa'] or OTHER
+            this_month[name] = this_month.get(name, 0) + row['total']
+
+    merchants = (
+        Transaction.objects.filter(user=user, type=Transaction.EXPENSE)
+        .between(ordinal - _setting('MERCHANT_DAYS') + 1, ordinal)
+        .order_by()
+        .values('title')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by('-total', 'title')[:_setting('TOP_MERCHANTS')]
+    )
+
+    return {
+        'count': totals['count'],
+        'income': int(totals['income']),
+        'expense': int(totals['expense']),
+        'month': months[-1],
+        'categories': sorted(((name, int(total)) for name, total in this_month.items()), key=lambda item: -item[1]),
+        'trend': [(month, int(income), int(expense)) for month, (income, expense) in trend.items()],
+        'merchants': [(row['title'], int(row['total']), row['count']) for row in merchants],
+    }
+
+
+def sections(data):
+    """(header, lines) pairs, most important first"""
+    income, expense = data['income'], data['expense']
+    return [
+        (None, [
+            f'تعداد تراکنش‌ها: {data["count"]:,}',
+            f'کل درآمد: {income:,} تومان، کل هزینه: {expense:,} تومان، موجودی: {income - expense:,} تومان',
+        ]),
+        ('درآمد و هزینه ماه‌های اخیر:', [
+            f'{month}: درآمد {month_income:,}، هزینه {month_expense:,}'
+            for month, month_income, month_expense in reversed(data['trend'])
+        ]),
+        (f'هزینه‌های ماه {data["month"]} به تفکیک دسته:', [
+            f'{name}: {total:,}' for name, total in data['categories']
+        ]),
+        ('بیشترین پرداخت‌ها:', [
+            f'{title}: {total:,} ({count} بار)' for title, total, count in data['merchants']
+        ]),
+    ]
+
+
+def render(data, max_tokens=None):
+    """
+    The snapshot as prompt text within max_tokens: sections are filled in
+    order and each is cut at the first line that no longer fits.
+    """
+    budget = (max_tokens or _setting('MAX_TOKENS')) * CHARS_PER_TOKEN
+    lines, used = [], 0
+    for header, items in sections(data):
+        pending = [header] if header else []
+        for item in items:
+            size = sum(len(line) + 1 for line in pending + [item])
+            if used + size > budget:
+                break
+            lines += pending + [item]
+            used += size
+            pending = []
+    return '\n'.join(lines)
+
+
+def _cache():
+    return caches[_setting('ALIAS')]
+
+
+def get_snapshot(user, today=None):
+    """snapshot(), reused until the user's ledger changes (or the day does)"""
+    state = ledger.version(user)
+    if state is None:
+        return snapshot(user, today)
+    ordinal = (today or datetime.date.today()).toordinal()
+    key = f'ai-context:{user.pk}:{state[0]}:{ordinal}'
+    data = _cache().get(key)
+    if data is None:
+        data = snapshot(user, today)
+        _cache().set(key, data, TIMEOUT)
+    return data
+
+
+def for_user(user, max_tokens=None, today=None):
+    """Prompt context of a user, cached and within the token budget"""
+    return render(get_snapshot(user, today), max_tokens)
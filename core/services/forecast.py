@@ -0,0 +1,157 @@
+"""
+Cash-flow forecast for KifPool
+Loads a user's income and expense per Jalali month into NumPy arrays in one
+query over the ledger rollups, and derives rolling averages, a month-of-year
+seasonality profile and a projected balance for the months after the
+current one with whole-array operations. The cost follows the number of
+months of history, not the number of transactions.
+"""
+import datetime
+
+import numpy as np
+from django.db.models import Q, Sum
+
+from ..models import LedgerRollup, Transaction
+from . import jalali
+
+
+HORIZON = 12  # months projected
+BASELINE_MONTHS = 12  # trailing months averaged for the projection
+SEASONAL_MIN_MONTHS = 12  # history needed before the month-of-year profile is trusted
+ROLLING_WINDOWS = (3, 12)
+
+
+def load(user):
+    """
+    (month keys, income, expense) arrays of the user's rollup months, plus the
+    net amount of transactions without a valid date (no month to put it in)
+    """
+    rows = list(
+        LedgerRollup.objects.filter(user=user)
+        .order_by()
+        .values('month')
+        .annotate(
+            income=Sum('total', filter=Q(type=Transaction.INCOME)),
+            expense=Sum('total', filter=Q(type=Transaction.EXPENSE)),
+        )
+        .values_list('month', 'income', 'expense')
+    )
+    ordinals = jalali.parse_many([f'{month}/01' for month, _, _ in rows])
+    amounts = np.array([(income or 0, expense or 0) for _, income, expense in rows], dtype=np.float64).reshape(-1, 2)
+    dated = ordinals >= 0
+    undated = float((amounts[~dated, 0] - amounts[~dated, 1]).sum())
+    return month_keys(ordinals[dated]), amounts[dated, 0], amounts[dated, 1], undated
+
+
+def month_keys(ordinals):
+    """year * 12 + month - 1 for each day ordinal, so consecutive months are consecutive ints"""
+    years, months, _ = jalali.from_ordinals(ordinals)
+    return years * 12 + months - 1
+
+
+def current_month(today=None):
+    """Month key of today's Jalali month"""
+    year, month, _ = jalali.from_ordinal((today or datetime.date.today()).toordinal())
+    return year * 12 + month - 1
+
+
+def month_label(key):
+    return f'{key // 12:04d}/{key % 12 + 1:02d}'
+
+
+def rolling_mean(values, window):
+    """Trailing mean over up to window values (fewer at the start)"""
+    sums = np.concatenate(([0.0], np.cumsum(values)))
+    ends = np.arange(1, len(values) + 1)
+    starts = np.maximum(ends - window, 0)
+    return (sums[ends] - sums[starts]) / (ends - starts)
+
+
+def seasonality(values, first_key):
+    """
+    Month-of-year factors (Farvardin..Esfand): each calendar month's average
+    over the overall monthly average; all ones until there is a year of history.
+    """
+    if len(values) < SEASONAL_MIN_MONTHS or not values.any():
+        return np.ones(12)
+    month_of_year = (first_key + np.arange(len(values))) % 12
+    totals = np.bincount(month_of_year, weights=values, minlength=12)
+    counts = np.bincount(month_of_year, minlength=12)
+    return (totals / counts) / values.mean()
+
+
+def monthly(keys, income, expense, last):
+    """(first month key, income, expense) with one entry per month from the first to last, empty months zero"""
+    first = int(keys.min())
+    index = keys - first
+    length = last - first + 1
+    return (
+        first,
+        np.bincount(index, weights=income, minlength=length),
+        np.bincount(index, weights=expense, minlength=length),
+    )
+
+
+def project(income, expense, first_key, opening, horizon=HORIZON):
+    """
+    Income, expense and balance for the horizon months after the last one:
+    the trailing BASELINE_MONTHS average scaled by each month's seasonal factor.
+    """
+    income_profile = seasonality(income, first_key)
+    expense_profile = seasonality(expense, first_key)
+    baseline_income = income[-BASELINE_MONTHS:].mean()
+    baseline_expense = expense[-BASELINE_MONTHS:].mean()
+
+    next_key = first_key + len(income)
+    keys = np.arange(next_key, next_key + horizon)
+    projected_income = baseline_income * income_profile[keys % 12]
+    projected_expense = baseline_expense * expense_profile[keys % 12]
+    balance = opening + np.cumsum(projected_income - projected_expense)
+    return keys, projected_income, projected_expense, balance
+
+
+def _rounded(values):
+    return np.round(values).tolist()
+
+
+def build(user, horizon=HORIZON, today=None):
+    """
+    JSON-ready history up to the current month, rolling averages, seasonality
+    and the projection from next month on for a user
+    """
+    keys, income, expense, undated = load(user)
+    current = current_month(today)
+    # Future-dated months are not history yet and would shift the projection
+    past = keys <= current
+    if not past.any():
+        return {'history': None, 'seasonality': None, 'projection': None}
+
+    first, income, expense = monthly(keys[past], income[past], expense[past], current)
+    net = income - expense
+    balance = undated + np.cumsum(net)
+
+    keys, projected_income, projected_expense, projected_balance = project(
+        income, expense, first, balance[-1], horizon,
+    )
+
+    return {
+        'history': {
+            'months': [month_label(key) for key in range(first, first + len(net))],
+            'income': _rounded(income),
+            'expense': _rounded(expense),
+            'net': _rounded(net),
+            'balance': _rounded(balance),
+            **{f'net_avg_{window}': _rounded(rolling_mean(net, window)) for window in ROLLING_WINDOWS},
+        },
+        'seasonality': {
+            'months': jalali.MONTH_NAMES,
+            'income': np.round(seasonality(income, first), 3).tolist(),
+            'expense': np.round(seasonality(expense, first), 3).tolist(),
+        },
+        'projection': {
+            'months': [month_label(int(key)) for key in keys],
+            'income': _rounded(projected_income),
+            'expense': _rounded(projected_expense),
+            'balance': _rounded(projected_balance),
+        },
+    }
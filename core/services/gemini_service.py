@@ -3,8 +3,12 @@ Gemini AI Service for KifPool
 """
 import requests
 import json
+from asgiref.sync import sync_to_async
 from django.conf import settings
 
+from . import http_client, llm_cache
+from .ai_backends import ErrorText
+
 
 def call_gemini_api(prompt):
     """Call Gemini API with the given prompt"""
@@ -26,15 +30,22 @@ def call_gemini_api(prompt):
         ]
     }
     
+    # Key on the endpoint without the API key
+    cache = llm_cache.get_cache()
+    cache_key = cache.make_key('gemini', settings.GEMINI_API_URL, data)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
         # print(f"Calling Gemini API: {settings.GEMINI_API_URL}")
-        response = requests.post(url, headers=headers, json=data, timeout=60)
+        response = http_client.post('gemini', url, headers=headers, json=data)
         
         # print(f"Response status: {response.status_code}")
         
         if response.status_code != 200:
             # print(f"Error response: {response.text}")
-            return f"خطا در ارتباط با API (کد {response.status_code})"
+            return ErrorText(f"خطا در ارتباط با API (کد {response.status_code})")
         
         result = response.json()
         
@@ -44,20 +55,24 @@ def call_gemini_api(prompt):
             if 'content' in candidate and 'parts' in candidate['content']:
                 parts = candidate['content']['parts']
                 if len(parts) > 0 and 'text' in parts[0]:
-                    return parts[0]['text']
+                    text = parts[0]['text']
+                    cache.set(cache_key, text)
+                    return text
         
         # print(f"Unexpected response format: {result}")
-        return "متاسفانه نتوانستم پاسخی تولید کنم."
+        return ErrorText("متاسفانه نتوانستم پاسخی تولید کنم.")
         
     except requests.exceptions.Timeout:
         # print("Gemini API Timeout")
-        return "زمان انتظار برای پاسخ به پایان رسید. لطفا مجددا تلاش کنید."
+        return ErrorText("زمان انتظار برای پاسخ به پایان رسید. لطفا مجددا تلاش کنید.")
+    except http_client.BackendBusy:
+        return ErrorText("سرویس هوش مصنوعی مشغول است. لطفا چند لحظه دیگر تلاش کنید.")
     except requests.exceptions.RequestException as e:
         # print(f"Gemini API Error: {e}")
-        return "خطا در ارتباط با هوش مصنوعی. لطفا مجددا تلاش کنید."
+        return ErrorText("خطا در ارتباط با هوش مصنوعی. لطفا مجددا تلاش کنید.")
     except Exception as e:
         # print(f"Unexpected error: {e}")
-        return f"خطای غیرمنتظره: {str(e)}"
+        return ErrorText(f"خطای غیرمنتظره: {str(e)}")
 
 
 import datetime
@@ -80,27 +95,40 @@ def get_financial_advice(query, context):
     return call_gemini_api(prompt)
 
 
-def analyze_spending(transactions_text):
+def stream_financial_advice(query, context):
+    """Gemini answers in one piece; yield it as a single chunk"""
+    yield get_financial_advice(query, context)
+
+
+def analyze_spending(context):
     """Analyze spending patterns"""
     today = datetime.date.today().strftime("%Y/%m/%d")
     prompt = f"""تاریخ امروز: {today} (میلادی)
 
-این تراکنش‌های مالی را تحلیل کن و یک خلاصه ۲-۳ جمله‌ای از الگوی مخارج به فارسی بنویس. لحن رسمی و دلگرم‌کننده باشد:
+این خلاصه مالی را تحلیل کن و یک خلاصه ۲-۳ جمله‌ای از الگوی مخارج به فارسی بنویس. لحن رسمی و دلگرم‌کننده باشد:
 
-{transactions_text}"""
+{context}"""
     
     return call_gemini_api(prompt)
 
 
-def get_goal_advice(goal_title, amount_needed, deadline, spending_context):
-    """Get advice for achieving a financial goal"""
+def get_goal_advice(goal_title, amount_needed, deadline, facts, context):
+    """Get advice for achieving a financial goal (feasibility numbers precomputed by goal_plan)"""
     today = datetime.date.today().strftime("%Y/%m/%d")
     prompt = f"""تاریخ امروز: {today} (میلادی)
-می‌خواهم {amount_needed:,} تومان برای "{goal_title}" تا تاریخ {deadline} (شمسی) پس‌انداز کنم.
+می‌خواهم {amount_needed:,.0f} تومان برای "{goal_title}" تا تاریخ {deadline} (شمسی) پس‌انداز کنم.
 
-وضعیت هزینه‌های اخیر من: {spending_context}
+اطلاعات مالی من:
+{context}
+
+{facts}
 
-لطفا ۳ پیشنهاد کوتاه و عملی به فارسی برای رسیدن به این هدف بر اساس عادات خرج کردن من بده. پاسخ را به صورت لیست بنویس.
-همچنین محاسبه کن چقدر زمان دارم و آیا با روند فعلی رسیدن به هدف ممکن است یا خیر."""
+لطفا ۳ پیشنهاد کوتاه و عملی به فارسی برای رسیدن به این هدف بده. پاسخ را به صورت لیست بنویس."""
     
     return call_gemini_api(prompt)
+
+
+# No async HTTP client for Gemini: the blocking calls run in worker threads
+aget_financial_advice = sync_to_async(get_financial_advice, thread_sensitive=False)
+aanalyze_spending = sync_to_async(analyze_spending, thread_sensitive=False)
+aget_goal_advice = sync_to_async(get_goal_advice, thread_sensitive=False)
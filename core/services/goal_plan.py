@@ -0,0 +1,97 @@
+"""
+Goal feasibility for KifPool
+Plain arithmetic over a user's goals and ledger: the recent net monthly
+savings, what each goal needs per month to meet its Jalali deadline, when it
+would be reached at the current pace and whether that is in time. The AI
+advice gets these numbers instead of working them out itself.
+"""
+import datetime
+import math
+
+import numpy as np
+
+from . import forecast, jalali
+
+
+SAVINGS_MONTHS = 3  # complete months before the current one that set the savings rate
+DAYS_PER_MONTH = 365.2422 / 12
+
+
+def savings_rate(user, today):
+    """Average net income (income - expense) of the SAVINGS_MONTHS months before today's month"""
+    keys, income, expense, _ = forecast.load(user)
+    current = int(forecast.month_keys(np.array([today]))[0])
+    recent = (keys >= current - SAVINGS_MONTHS) & (keys < current)
+    return float((income[recent] - expense[recent]).sum()) / SAVINGS_MONTHS
+
+
+def goal_status(goal, rate, today):
+    """Plan of one goal at a monthly savings rate, as of day ordinal today"""
+    remaining = float(goal.remaining)
+    deadline = goal.deadline_ordinal
+    days_left = deadline - today if deadline is not None else None
+    months_left = days_left / DAYS_PER_MONTH if days_left is not None else None
+
+    if remaining <= 0:
+        required = 0
+    elif months_left is None:
+        required = None
+    else:
+        # Due now (or overdue): the whole remainder this month
+        required = math.ceil(remaining / max(months_left, 1))
+
+    projected = None
+    if remaining <= 0:
+        projected = today
+    elif rate > 0:
+        projected = today + math.ceil(remaining / rate * DAYS_PER_MONTH)
+        if projected > jalali.ORDINAL_MAX:
+            projected = None
+
+    return {
+        'goal': goal,
+        'remaining': remaining,
+        'days_left': days_left,
+        'months_left': round(months_left, 1) if months_left is not None else None,
+        'required_monthly': required,
+        'projected_ordinal': projected,
+        'projected_date': jalali.format_ordinal(projected) if projected is not None else None,
+        'overdue': remaining > 0 and days_left is not None and days_left < 0,
+        'feasible': remaining <= 0 or (
+            projected is not None and deadline is not None and projected <= deadline
+        ),
+    }
+
+
+def plan(user, goals, today=None):
+    """
+    (one status per goal, summary) from a single read of the ledger rollups.
+    The summary compares the savings rate with what all open goals need together.
+    """
+    today = (today or datetime.date.today()).toordinal()
+    rate = savings_rate(user, today)
+    statuses = [goal_status(goal, rate, today) for goal in goals]
+    total_required = sum(
+        status['required_monthly'] for status in statuses
+        if status['required_monthly'] and not status['overdue']
+    )
+    return statuses, {
+        'savings_rate': rate,
+        'total_required': total_required,
+        'feasible': rate >= total_required,
+    }
+
+
+def facts(status, rate):
+    """Short Persian summary of a goal's numbers for the AI prompt"""
+    lines = [f'میانگین پس‌انداز ماهانه اخیر: {rate:,.0f} تومان']
+    if status['months_left'] is not None:
+        lines.append(f'ماه‌های باقی‌مانده تا مهلت: {max(status["months_left"], 0)}')
+    if status['required_monthly'] is not None:
+        lines.append(f'پس‌انداز لازم در هر ماه: {status["required_monthly"]:,} تومان')
+    if status['projected_date']:
+        lines.append(f'تاریخ رسیدن به هدف با روند فعلی: {status["projected_date"]}')
+    else:
+        lines.append('با روند فعلی به هدف نمی‌رسد')
+    lines.append('وضعیت: ' + ('در مسیر رسیدن به هدف' if status['feasible'] else 'عقب‌تر از برنامه'))
+    return '\n'.join(lines)
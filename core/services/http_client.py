@@ -0,0 +1,124 @@
+"""
+Shared HTTP client for the AI backends
+One keep-alive session with a connection pool per process, separate
+connect/read timeouts and a process-wide cap on in-flight requests per
+backend, so the llama.cpp server never sees more requests than it has slots.
+Every call's outcome and latency feed the backend's circuit breaker.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+from . import circuit_breaker
+
+
+class BackendBusy(requests.exceptions.RequestException):
+    """No request slot became free within the queue timeout"""
+
+
+DEFAULTS = {
+    'POOL_SIZE': 16,
+    'CONNECT_TIMEOUT': 3,
+    'READ_TIMEOUT': 60,
+    'QUEUE_TIMEOUT': 30,
+    'MAX_CONCURRENCY': 4,
+}
+
+_session = None
+_slots = {}
+_lock = threading.Lock()
+
+
+def backend_config(backend):
+    """Settings for one backend, falling back to the shared AI_HTTP values"""
+    config = getattr(settings, 'AI_HTTP', {})
+    merged = {key: config.get(key, value) for key, value in DEFAULTS.items()}
+    merged.update(config.get('BACKENDS', {}).get(backend, {}))
+    return merged
+
+
+def get_session():
+    """Process-wide keep-alive session"""
+    global _session
+    with _lock:
+        if _session is None:
+            pool_size = backend_config(None)['POOL_SIZE']
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+
+def semaphore(backend):
+    """Process-wide request slots of a backend"""
+    with _lock:
+        if backend not in _slots:
+            _slots[backend] = threading.BoundedSemaphore(backend_config(backend)['MAX_CONCURRENCY'])
+        return _slots[backend]
+
+
+@contextmanager
+def slot(backend):
+    """Hold one of the backend's request slots, queueing for a bounded time"""
+    config = backend_config(backend)
+    slots = semaphore(backend)
+    if not slots.acquire(timeout=config['QUEUE_TIMEOUT']):
+        raise BackendBusy(f'{backend}: all {config["MAX_CONCURRENCY"]} slots busy')
+    try:
+        yield
+    finally:
+        slots.release()
+
+
+def timeout(backend):
+    config = backend_config(backend)
+    return (config['CONNECT_TIMEOUT'], config['READ_TIMEOUT'])
+
+
+def post(backend, url, **kwargs):
+    """POST through the shared session while holding one of the backend's slots"""
+    kwargs.setdefault('timeout', timeout(backend))
+    started = time.monotonic()
+    try:
+        with slot(backend):
+            response = get_session().post(url, **kwargs)
+    except requests.exceptions.RequestException:
+        circuit_breaker.record(backend, False, time.monotonic() - started)
+        raise
+    circuit_breaker.record(backend, response.status_code < 500, time.monotonic() - started)
+    return response
+
+
+@contextmanager
+def stream(backend, url, **kwargs):
+    """POST with a streamed response body, holding the slot until it is consumed"""
+    kwargs.setdefault('timeout', timeout(backend))
+    started = time.monotonic()
+    with slot(backend):
+        try:
+            response = get_session().post(url, stream=True, **kwargs)
+        except requests.exceptions.RequestException:
+            circuit_breaker.record(backend, False, time.monotonic() - started)
+            raise
+        # Time to the response headers, which llama.cpp sends with the first token
+        circuit_breaker.record(backend, response.status_code < 500, time.monotonic() - started)
+        try:
+            yield response
+        finally:
+            response.close()
+
+
+def reset():
+    """Forget the session and slot counters (settings changes, tests)"""
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _slots.clear()
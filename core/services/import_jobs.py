@@ -0,0 +1,148 @@
+"""
+Background CSV imports for KifPool
+Uploads are stored as ImportJob rows and imported by the background worker in
+batches. Each batch is committed together with the job's progress, so a job
+cut short by a crash or restart resumes after its last committed batch.
+"""
+import logging
+import uuid
+from datetime import timedelta
+
+from django.db import transaction as db_transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import ImportJob, Transaction
+from . import background, importer
+
+logger = logging.getLogger(__name__)
+
+
+STALE_AFTER = timedelta(seconds=60)  # unfinished job with no progress for this long is taken over
+COUNT_CHUNK_SIZE = 1024 * 1024
+
+
+def job_key(job_id):
+    return ('import', job_id)
+
+
+def start(user, upload):
+    """Save the upload as a job and queue it once the row is committed"""
+    job = ImportJob.objects.create(user=user, file=upload, name=upload.name[:255])
+    db_transaction.on_commit(lambda: background.submit(job_key(job.id), run, job.id))
+    return job
+
+
+def count_rows(job):
+    """Data rows in the job's file, estimated from its line breaks"""
+    lines = 0
+    last = b'\n'
+    with job.file.open('rb') as f:
+        for chunk in f.chunks(COUNT_CHUNK_SIZE):
+            lines += chunk.count(b'\n')
+            last = chunk[-1:]
+    if last != b'\n':
+        lines += 1  # final line without a line break
+    return max(lines - 1, 0)  # header
+
+
+def claim(job_id):
+    """
+    Take ownership of an unfinished job that is new or has gone stale.
+    Returns the claimed job, or None if another worker owns it or it is done.
+    """
+    token = uuid.uuid4().hex
+    now = timezone.now()
+    claimed = ImportJob.objects.filter(
+        Q(claim='') | Q(updated_at__lt=now - STALE_AFTER),
+        pk=job_id,
+        status__in=[ImportJob.PENDING, ImportJob.RUNNING],
+    ).update(claim=token, status=ImportJob.RUNNING, updated_at=now)
+    return ImportJob.objects.get(pk=job_id) if claimed else None
+
+
+class LostClaim(Exception):
+    """Another worker took the job over"""
+
+
+def _record(job, batch):
+    """Write one batch and the job's new progress atomically"""
+    errors = list(job.errors)
+    errors.extend(batch.errors[:importer.MAX_REPORTED_ERRORS - len(errors)])
+    with db_transaction.atomic():
+        Transaction.objects.bulk_create(batch.transactions)
+        updated = ImportJob.objects.filter(pk=job.pk, claim=job.claim).update(
+            rows_done=job.rows_done + batch.rows,
+            rows_created=job.rows_created + len(batch.transactions),
+            rows_failed=job.rows_failed + len(batch.errors),
+            errors=errors,
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            raise LostClaim(job.pk)
+    job.rows_done += batch.rows
+    job.rows_created += len(batch.transactions)
+    job.rows_failed += len(batch.errors)
+    job.errors = errors
+
+
+def _finish(job, status, message=''):
+    ImportJob.objects.filter(pk=job.pk, claim=job.claim).update(
+        status=status, message=message, updated_at=timezone.now(),
+    )
+    job.file.delete(save=False)
+
+
+def run(job_id):
+    """Import a job's file from where it left off (background job)"""
+    job = claim(job_id)
+    if job is None:
+        return
+
+    try:
+        if job.total_rows is None:
+            job.total_rows = count_rows(job)
+            ImportJob.objects.filter(pk=job.pk).update(total_rows=job.total_rows)
+
+        with job.file.open('rb') as f:
+            for batch in importer.batches(job.user, f.chunks(), skip=job.rows_done):
+                _record(job, batch)
+    except LostClaim:
+        logger.info('Import job %s was taken over by another worker', job_id)
+        return
+    except importer.ImportFailed as e:
+        _finish(job, ImportJob.FAILED, str(e))
+        return
+    except Exception:
+        # Unexpected (database, storage): leave the job to be resumed later
+        logger.exception('Import job %s interrupted', job_id)
+        return
+
+    _finish(job, ImportJob.DONE)
+
+
+def resume_stale(jobs):
+    """Queue unfinished jobs whose worker has stopped making progress"""
+    cutoff = timezone.now() - STALE_AFTER
+    for job in jobs:
+        if job.finished or job.updated_at >= cutoff or background.is_pending(job_key(job.id)):
+            continue
+        background.submit(job_key(job.id), run, job.id)
+
+
+def status(job):
+    """JSON-ready progress of a job"""
+    return {
+        'id': job.id,
+        'name': job.name,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'finished': job.finished,
+        'percent': job.percent,
+        'total_rows': job.total_rows,
+        'rows_done': job.rows_done,
+        'rows_created': job.rows_created,
+        'rows_failed': job.rows_failed,
+        'errors': job.errors,
+        'message': job.message,
+    }
@@ -0,0 +1,187 @@
+"""
+CSV import for KifPool
+Decodes the upload chunk by chunk, resolves categories from one preloaded
+map and writes transactions with bulk_create in batches, so memory and query
+count stay flat however long the bank export is. Bad rows are reported and
+skipped instead of failing the whole file.
+"""
+import codecs
+import csv
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+
+from ..models import Category, Transaction
+from . import default_categories, jalali
+
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100  # rejected rows kept with their message; the rest are only counted
+FALLBACK_CATEGORY = 'other'
+MAX_AMOUNT_DIGITS = Transaction._meta.get_field('amount').max_digits
+MAX_TITLE_LENGTH = Transaction._meta.get_field('title').max_length
+
+DATE_RE = re.compile(r'^(\d{4})[/-](\d{1,2})[/-](\d{1,2})$')
+
+# Export writes the codes, people write the labels
+TYPES = {code: code for code, label in Transaction.TYPE_CHOICES}
+TYPES.update({label: code for code, label in Transaction.TYPE_CHOICES})
+
+
+class ImportFailed(Exception):
+    """The file as a whole cannot be read (encoding, header, CSV syntax)"""
+
+
+class Batch:
+    """A run of consecutive data rows: transactions to write and (line, message) per rejected row"""
+
+    def __init__(self):
+        self.rows = 0
+        self.transactions = []
+        self.errors = []
+
+
+class ImportReport:
+    """Outcome of one import: rows written, rows rejected and (line, message) per rejection"""
+
+    def __init__(self):
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def add(self, batch):
+        self.created += len(batch.transactions)
+        for line, message in batch.errors:
+            self.reject(line, message)
+
+    def reject(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def __repr__(self):
+        return f'<ImportReport created={self.created} failed={self.failed}>'
+
+
+def iter_lines(chunks, encoding='utf-8-sig'):
+    """Decode byte chunks incrementally into lines, keeping their line endings"""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ''
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split('\n')
+        for line in lines:
+            yield line + '\n'
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def category_map(user):
+    """Category id by lower-cased English name and by Persian name; the user's own categories win"""
+    categories = dict(default_categories.ids())
+    rows = Category.objects.filter(user=user).order_by('id').values_list('id', 'name', 'name_fa')
+    for category_id, name, name_fa in rows:
+        for key in (name.strip().lower(), name_fa.strip().lower()):
+            if key:
+                categories[key] = category_id
+    return categories
+
+
+def normalize_date(value):
+    """'1403/10/01' from '1403/10/1', '1403-10-01', ...; ValueError if it is not a Jalali date"""
+    raw_date = (value or '').strip()
+    match = DATE_RE.match(raw_date)
+    if not match:
+        raise ValueError(f'تاریخ باید به شکل 1403/10/01 باشد: {raw_date!r}')
+    year, month, day = (int(part) for part in match.groups())
+    date = f'{year:04d}/{month:02d}/{day:02d}'
+    if jalali.to_ordinal(date) is None:
+        raise ValueError(f'تاریخ نامعتبر: {raw_date!r}')
+    return date
+
+
+def parse_row(row, user, categories):
+    """Unsaved Transaction for one CSV row; ValueError with a Persian message if invalid"""
+    title = (row.get('title') or '').strip() or 'Imported'
+    if len(title) > MAX_TITLE_LENGTH:
+        raise ValueError(f'عنوان بیشتر از {MAX_TITLE_LENGTH} نویسه است')
+
+    raw_amount = (row.get('amount') or '').replace(',', '').strip()
+    try:
+        amount = Decimal(raw_amount)
+    except InvalidOperation:
+        raise ValueError(f'مبلغ نامعتبر: {raw_amount!r}')
+    if not amount.is_finite() or amount < 0 or amount != amount.to_integral_value():
+        raise ValueError(f'مبلغ باید عددی صحیح و غیرمنفی باشد: {raw_amount!r}')
+    if amount.adjusted() >= MAX_AMOUNT_DIGITS:
+        raise ValueError(f'مبلغ بیش از {MAX_AMOUNT_DIGITS} رقم است')
+
+    raw_type = (row.get('type') or Transaction.EXPENSE).strip()
+    tx_type = TYPES.get(raw_type.upper(), TYPES.get(raw_type))
+    if tx_type is None:
+        raise ValueError(f'نوع تراکنش نامعتبر: {raw_type!r}')
+
+    date = normalize_date(row.get('date'))
+
+    category_name = (row.get('category') or '').strip().lower()
+    category_id = categories.get(category_name, categories.get(FALLBACK_CATEGORY))
+
+    return Transaction(
+        user=user,
+        title=title,
+        amount=amount.quantize(1),
+        type=tx_type,
+        date=date,
+        category_id=category_id,
+    )
+
+
+def batches(user, chunks, batch_size=None, skip=0):
+    """
+    Parse byte chunks (e.g. UploadedFile.chunks()) into Batches of batch_size
+    data rows, skipping the first skip rows (already imported by an earlier
+    run). Nothing is written; ImportFailed if the file as a whole is unreadable.
+    """
+    batch_size = batch_size or getattr(settings, 'IMPORT_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    categories = category_map(user)
+    reader = csv.DictReader(iter_lines(chunks))
+
+    try:
+        if 'amount' not in (reader.fieldnames or []):
+            raise ImportFailed('ستون amount در سطر اول فایل پیدا نشد')
+
+        batch = Batch()
+        for index, row in enumerate(reader):
+            if index < skip:
+                continue
+            batch.rows += 1
+            try:
+                batch.transactions.append(parse_row(row, user, categories))
+            except ValueError as e:
+                batch.errors.append((reader.line_num, str(e)))
+            if batch.rows >= batch_size:
+                yield batch
+                batch = Batch()
+        if batch.rows:
+            yield batch
+    except UnicodeDecodeError:
+        raise ImportFailed('فایل با کدگذاری UTF-8 ذخیره نشده است')
+    except csv.Error as e:
+        raise ImportFailed(f'ساختار CSV در سطر {reader.line_num} نامعتبر است: {e}')
+
+
+def import_csv(user, chunks, batch_size=None):
+    """
+    Import transactions for user from an iterable of byte chunks in one
+    database transaction; invalid rows end up in the report with their line
+    number. Large uploads go through import_jobs instead.
+    """
+    report = ImportReport()
+    with db_transaction.atomic():
+        for batch in batches(user, chunks, batch_size):
+            Transaction.objects.bulk_create(batch.transactions)
+            report.add(batch)
+    return report
@@ -0,0 +1,192 @@
+"""
+Jalali calendar for KifPool
+Dates are stored as Jalali strings ('1403/10/01') next to a day ordinal, the
+proleptic Gregorian ordinal of datetime.date.toordinal(), which sorts, indexes
+and subtracts like an integer. Conversion is a lookup in a precomputed table
+of Nowruz ordinals, so whole columns convert at once with NumPy.
+"""
+import datetime
+
+import numpy as np
+
+
+YEAR_MIN = 1200
+YEAR_MAX = 1600
+
+# Start of each month within the year (days), Farvardin..Esfand
+MONTH_OFFSETS = np.array([0, 31, 62, 93, 124, 155, 186, 216, 246, 276, 306, 336], dtype=np.int64)
+MONTH_NAMES = [
+    'فروردین', 'اردیبهشت', 'خرداد', 'تیر', 'مرداد', 'شهریور',
+    'مهر', 'آبان', 'آذر', 'دی', 'بهمن', 'اسفند',
+]
+
+# Leap-cycle break years of the astronomical calendar (Borkowski's algorithm)
+_BREAKS = [-61, 9, 38, 199, 426, 686, 756, 818, 1111, 1181, 1210, 1635, 2060, 2097, 2192, 2262, 2324, 2394, 2456, 3178]
+
+
+def _div(a, b):
+    return int(a / b)  # truncating, as in the reference implementation
+
+
+def _mod(a, b):
+    return a - _div(a, b) * b
+
+
+def _nowruz(year):
+    """Gregorian date of 1 Farvardin of a Jalali year"""
+    gy = year + 621
+    leap_j = -14
+    jp = _BREAKS[0]
+    jump = 0
+    for jm in _BREAKS[1:]:
+        jump = jm - jp
+        if year < jm:
+            break
+        leap_j += _div(jump, 33) * 8 + _div(_mod(jump, 33), 4)
+        jp = jm
+    n = year - jp
+    leap_j += _div(n, 33) * 8 + _div(_mod(n, 33) + 3, 4)
+    if _mod(jump, 33) == 4 and jump - n == 4:
+        leap_j += 1
+    leap_g = _div(gy, 4) - _div((_div(gy, 100) + 1) * 3, 4) - 150
+    return datetime.date(gy, 3, 20 + leap_j - leap_g)
+
+
+# NOWRUZ[i] = ordinal of 1 Farvardin of YEAR_MIN + i; one extra year closes the last
+NOWRUZ = np.array([_nowruz(y).toordinal() for y in range(YEAR_MIN, YEAR_MAX + 2)], dtype=np.int64)
+
+ORDINAL_MIN = int(NOWRUZ[0])
+ORDINAL_MAX = int(NOWRUZ[-1]) - 1
+
+# Persian and Arabic-Indic digits are accepted in date strings
+_DIGIT_BASES = (ord('0'), ord('۰'), ord('٠'))
+
+
+def is_leap(year):
+    return year_length(year) == 366
+
+
+def year_length(year):
+    i = year - YEAR_MIN
+    return int(NOWRUZ[i + 1] - NOWRUZ[i])
+
+
+def month_length(year, month):
+    if month < 12:
+        return 31 if month <= 6 else 30
+    return year_length(year) - 336
+
+
+def _valid(years, months, days):
+    ok = (years >= YEAR_MIN) & (years <= YEAR_MAX) & (months >= 1) & (months <= 12) & (days >= 1)
+    index = np.where(ok, years - YEAR_MIN, 0)
+    month_index = np.where(ok, months - 1, 0)
+    esfand = NOWRUZ[index + 1] - NOWRUZ[index] - 336
+    lengths = np.where(month_index < 6, 31, np.where(month_index < 11, 30, esfand))
+    return ok & (days <= lengths)
+
+
+def to_ordinals(years, months, days):
+    """Day ordinals for arrays of Jalali year/month/day; -1 where the date is invalid"""
+    years, months, days = (np.asarray(a, dtype=np.int64) for a in (years, months, days))
+    ok = _valid(years, months, days)
+    index = np.where(ok, years - YEAR_MIN, 0)
+    ordinals = NOWRUZ[index] + MONTH_OFFSETS[np.where(ok, months - 1, 0)] + days - 1
+    return np.where(ok, ordinals, -1)
+
+
+def from_ordinals(ordinals):
+    """(years, months, days) arrays for an array of day ordinals in the table's range"""
+    ordinals = np.asarray(ordinals, dtype=np.int64)
+    if ordinals.size and (ordinals.min() < ORDINAL_MIN or ordinals.max() > ORDINAL_MAX):
+        raise ValueError('ordinal outside the supported Jalali years')
+    index = np.searchsorted(NOWRUZ, ordinals, side='right') - 1
+    day_of_year = ordinals - NOWRUZ[index]
+    months = np.searchsorted(MONTH_OFFSETS, day_of_year, side='right')
+    days = day_of_year - MONTH_OFFSETS[months - 1] + 1
+    return index + YEAR_MIN, months, days
+
+
+def parse_many(values):
+    """
+    Day ordinals for a sequence of 'YYYY/MM/DD' strings (ASCII or Persian
+    digits); -1 for anything else, including empty strings.
+    """
+    # One extra column catches strings longer than ten characters
+    text = np.asarray(values, dtype='U11')
+    if text.size == 0:
+        return np.empty(0, dtype=np.int64)
+    # One row of UTF-32 code points per string, zero-padded
+    codes = np.ascontiguousarray(text).view(np.uint32).reshape(len(text), 11)
+    shape_ok = (codes[:, 4] == ord('/')) & (codes[:, 7] == ord('/')) & (codes[:, 10] == 0)
+
+    numbers = codes[:, [0, 1, 2, 3, 5, 6, 8, 9]].astype(np.int32)
+    digits = np.full(numbers.shape, -1, dtype=np.int32)
+    for base in _DIGIT_BASES:
+        value = numbers - base
+        np.copyto(digits, value, where=(value >= 0) & (value <= 9))
+    shape_ok &= (digits >= 0).all(axis=1)
+
+    years = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    months = digits[:, 4] * 10 + digits[:, 5]
+    days = digits[:, 6] * 10 + digits[:, 7]
+    return np.where(shape_ok, to_ordinals(years, months, days), -1)
+
+
+def format_many(ordinals):
+    """'YYYY/MM/DD' strings for an array of day ordinals"""
+    years, months, days = from_ordinals(ordinals)
+    return [f'{y:04d}/{m:02d}/{d:02d}' for y, m, d in zip(years.tolist(), months.tolist(), days.tolist())]
+
+
+def to_ordinal(value):
+    """Day ordinal of one 'YYYY/MM/DD' string, or None if it is not a valid Jalali date"""
+    ordinal = int(parse_many([(value or '').strip()])[0])
+    return ordinal if ordinal >= 0 else None
+
+
+def from_ordinal(ordinal):
+    """(year, month, day) of a day ordinal"""
+    years, months, days = from_ordinals([ordinal])
+    return int(years[0]), int(months[0]), int(days[0])
+
+
+def format_ordinal(ordinal):
+    return format_many([ordinal])[0]
+
+
+def to_gregorian(value):
+    """datetime.date of a Jalali date string, or None"""
+    ordinal = to_ordinal(value)
+    return datetime.date.fromordinal(ordinal) if ordinal is not None else None
+
+
+def from_gregorian(date):
+    """Jalali 'YYYY/MM/DD' string of a datetime.date"""
+    return format_ordinal(date.toordinal())
+
+
+def today():
+    return from_gregorian(datetime.date.today())
+
+
+def month_range(year, month):
+    """First and last day ordinal of a Jalali month"""
+    first = int(NOWRUZ[year - YEAR_MIN] + MONTH_OFFSETS[month - 1])
+    return first, first + month_length(year, month) - 1
+
+
+def year_range(year):
+    """First and last day ordinal of a Jalali year"""
+    return int(NOWRUZ[year - YEAR_MIN]), int(NOWRUZ[year - YEAR_MIN + 1]) - 1
+
+
+def week_start(ordinal):
+    """Ordinal of the Saturday starting the Jalali week that contains ordinal"""
+    # Ordinal 1 (0001-01-01) was a Monday; Saturday is two days before
+    return ordinal - (ordinal + 1) % 7
+
+
+def week_range(ordinal):
+    first = week_start(ordinal)
+    return first, first + 6
@@ -0,0 +1,206 @@
+"""
+Ledger rollups for KifPool
+Per-user income/expense totals by Jalali month and category, kept current
+from Transaction writes so read paths never rescan the raw ledger, and a
+per-user ledger version that changes with every write (for ETags).
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Substr
+from django.utils import timezone
+
+from ..models import LedgerRollup, Transaction, UserProfile
+
+
+_suspended = ContextVar('ledger_rollups_suspended', default=False)
+
+
+def month_of(date):
+    """Jalali month bucket ('1403/10') of a '1403/10/01' date string"""
+    return (date or '')[:7]
+
+
+@contextmanager
+def suspended():
+    """Skip per-instance signal bookkeeping while a bulk path does it in one go"""
+    token = _suspended.set(True)
+    try:
+        yield
+    finally:
+        _suspended.reset(token)
+
+
+def is_suspended():
+    return _suspended.get()
+
+
+def entry(tx):
+    """Rollup key and amount of a single transaction"""
+    key = (tx.user_id, month_of(tx.date), tx.category_id, tx.type)
+    return key, tx.amount or 0
+
+
+def add_delta(deltas, key, amount, count):
+    """Merge one (amount, count) change into a deltas dict"""
+    total, n = deltas.get(key, (0, 0))
+    deltas[key] = (total + amount, n + count)
+    return deltas
+
+
+def deltas_for(transactions, sign=1):
+    """Group an iterable of Transaction instances into rollup deltas"""
+    deltas = {}
+    for tx in transactions:
+        key, amount = entry(tx)
+        add_delta(deltas, key, sign * amount, sign)
+    return deltas
+
+
+def _grouped(queryset):
+    return (
+        queryset.order_by()
+        .annotate(month=Substr('date', 1, 7))
+        .values('user', 'month', 'category', 'type')
+        .annotate(total=Sum('amount'), n=Count('id'))
+    )
+
+
+def grouped_deltas(queryset, sign=1):
+    """Rollup deltas of a Transaction queryset, grouped in the database"""
+    deltas = {}
+    for row in _grouped(queryset):
+        key = (row['user'], row['month'] or '', row['category'], row['type'])
+        add_delta(deltas, key, sign * (row['total'] or 0), sign * row['n'])
+    return deltas
+
+
+def apply_deltas(deltas):
+    """Apply rollup deltas with in-place F() updates, creating or dropping rows as needed"""
+    with db_transaction.atomic():
+        for (user_id, month, category_id, tx_type), (amount, count) in deltas.items():
+            if not amount and not count:
+                continue
+            rows = LedgerRollup.objects.filter(user_id=user_id, month=month, category_id=category_id, type=tx_type)
+            updated = rows.update(total=F('total') + amount, count=F('count') + count)
+            if not updated and count > 0:
+                try:
+                    with db_transaction.atomic():
+                        LedgerRollup.objects.create(
+                            user_id=user_id, month=month, category_id=category_id,
+                            type=tx_type, total=amount, count=count,
+                        )
+                except IntegrityError:
+                    # Another writer created the bucket first
+                    rows.update(total=F('total') + amount, count=F('count') + count)
+            elif count < 0:
+                rows.filter(count__lte=0).delete()
+
+
+def _rebuild(rollups, transactions):
+    rollups.delete()
+    LedgerRollup.objects.bulk_create(
+        [
+            LedgerRollup(
+                user_id=row['user'], month=row['month'] or '', category_id=row['category'],
+                type=row['type'], total=row['total'] or 0, count=row['n'],
+            )
+            for row in _grouped(transactions)
+        ],
+        batch_size=1000,
+    )
+
+
+def rebuild(user_ids=None):
+    """Recompute rollups from raw transactions, for some users or for everyone"""
+    rollups = LedgerRollup.objects.all()
+    transactions = Transaction.objects.all()
+    if user_ids is not None:
+        rollups = rollups.filter(user_id__in=user_ids)
+        transactions = transactions.filter(user_id__in=user_ids)
+    with db_transaction.atomic():
+        _rebuild(rollups, transactions)
+
+
+def rebuild_uncategorised(user_ids):
+    """Recompute the category-less buckets, e.g. after a category was deleted"""
+    with db_transaction.atomic():
+        _rebuild(
+            LedgerRollup.objects.filter(user_id__in=user_ids, category__isnull=True),
+            Transaction.objects.filter(user_id__in=user_ids, category__isnull=True),
+        )
+
+
+def verify(user_ids=None):
+    """Compare stored rollups with raw transactions and return the mismatches"""
+    rollups = LedgerRollup.objects.all()
+    transactions = Transaction.objects.all()
+    if user_ids is not None:
+        rollups = rollups.filter(user_id__in=user_ids)
+        transactions = transactions.filter(user_id__in=user_ids)
+
+    expected = grouped_deltas(transactions)
+    actual = {}
+    for row in rollups.values('user', 'month', 'category', 'type', 'total', 'count'):
+        key = (row['user'], row['month'], row['category'], row['type'])
+        add_delta(actual, key, row['total'], row['count'])
+
+    mismatches = []
+    for key in sorted(set(expected) | set(actual), key=str):
+        if expected.get(key, (0, 0)) != actual.get(key, (0, 0)):
+            mismatches.append((key, expected.get(key, (0, 0)), actual.get(key, (0, 0))))
+    return mismatches
+
+
+def totals(user):
+    """Income, expense and transaction count of a user"""
+    result = LedgerRollup.objects.filter(user=user).aggregate(
+        income=Sum('total', filter=Q(type=Transaction.INCOME)),
+        expense=Sum('total', filter=Q(type=Transaction.EXPENSE)),
+        count=Sum('count'),
+    )
+    return {
+        'income': result['income'] or 0,
+        'expense': result['expense'] or 0,
+        'count': result['count'] or 0,
+    }
+
+
+def category_totals(user, tx_type=Transaction.EXPENSE, month=None):
+    """Per-category totals of one transaction type, optionally for a single month"""
+    rollups = LedgerRollup.objects.filter(user=user, type=tx_type)
+    if month is not None:
+        rollups = rollups.filter(month=month)
+    return (
+        rollups.order_by()
+        .values('category', 'category__name', 'category__name_fa')
+        .annotate(total=Sum('total'), count=Sum('count'))
+    )
+
+
+def month_totals(user):
+    """Per-month income and expense totals, oldest month first"""
+    return (
+        LedgerRollup.objects.filter(user=user)
+        .values('month', 'type')
+        .annotate(total=Sum('total'), count=Sum('count'))
+        .order_by('month')
+    )
+
+
+def bump_version(user_ids=None):
+    """Mark the ledgers of some users (or everyone's, for None) as changed"""
+    profiles = UserProfile.objects.all()
+    if user_ids is not None:
+        user_ids = {user_id for user_id in user_ids if user_id is not None}
+        if not user_ids:
+            return
+        profiles = profiles.filter(user_id__in=user_ids)
+    profiles.update(ledger_version=F('ledger_version') + 1, ledger_changed_at=timezone.now())
+
+
+def version(user):
+    """(ledger_version, ledger_changed_at) of a user, or None without a profile"""
+    return UserProfile.objects.filter(user=user).values_list('ledger_version', 'ledger_changed_at').first()
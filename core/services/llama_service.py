@@ -3,13 +3,16 @@ Llama AI Service for KifPool
 Local model running on localhost:8080
 """
 import requests
+import httpx
 import json
-import datetime
 from django.conf import settings
 
+from . import async_client, http_client, llm_cache
+from .ai_backends import ErrorText
 
-def call_llama_api(prompt):
-    """Call local Llama API with the given prompt"""
+
+def build_request(prompt):
+    """URL, headers and OpenAI-compatible payload for a prompt"""
     url = settings.LLAMA_API_URL
     
     headers = {
@@ -33,65 +36,197 @@ def call_llama_api(prompt):
         "temperature": 0.7
     }
     
+    return url, headers, data
+
+
+def extract_content(result):
+    """Text of an OpenAI-compatible chat completion, or None"""
+    if 'choices' in result and len(result['choices']) > 0:
+        choice = result['choices'][0]
+        if 'message' in choice and 'content' in choice['message']:
+            return choice['message']['content']
+    return None
+
+
+def call_llama_api(prompt):
+    """Call local Llama API with the given prompt"""
+    url, headers, data = build_request(prompt)
+    
+    cache = llm_cache.get_cache()
+    cache_key = cache.make_key('llama', url, data)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        response = requests.post(url, headers=headers, json=data, timeout=120)
+        response = http_client.post('llama', url, headers=headers, json=data)
         
         if response.status_code != 200:
-            return f"خطا در ارتباط با مدل (کد {response.status_code})"
-        
-        result = response.json()
+            return ErrorText(f"خطا در ارتباط با مدل (کد {response.status_code})")
         
-        # Extract text from OpenAI-compatible response
-        if 'choices' in result and len(result['choices']) > 0:
-            choice = result['choices'][0]
-            if 'message' in choice and 'content' in choice['message']:
-                return choice['message']['content']
+        text = extract_content(response.json())
+        if text is not None:
+            cache.set(cache_key, text)
+            return text
         
-        return "متاسفانه نتوانستم پاسخی تولید کنم."
+        return ErrorText("متاسفانه نتوانستم پاسخی تولید کنم.")
         
     except requests.exceptions.Timeout:
-        return "زمان انتظار برای پاسخ به پایان رسید. لطفا مجددا تلاش کنید."
+        return ErrorText("زمان انتظار برای پاسخ به پایان رسید. لطفا مجددا تلاش کنید.")
+    except http_client.BackendBusy:
+        return ErrorText("مدل در حال پاسخ به درخواست‌های دیگر است. لطفا چند لحظه دیگر تلاش کنید.")
     except requests.exceptions.RequestException as e:
-        return "خطا در ارتباط با هوش مصنوعی. لطفا مجددا تلاش کنید."
+        return ErrorText("خطا در ارتباط با هوش مصنوعی. لطفا مجددا تلاش کنید.")
     except Exception as e:
-        return f"خطای غیرمنتظره: {str(e)}"
+        return ErrorText(f"خطای غیرمنتظره: {str(e)}")
 
 
-def get_financial_advice(query, context):
-    """Get financial advice from Llama - simplified prompt"""
-    today = datetime.date.today().strftime("%Y/%m/%d")
+async def acall_llama_api(prompt):
+    """Async twin of call_llama_api for ASGI views"""
+    url, headers, data = build_request(prompt)
+    
+    cache = llm_cache.get_cache()
+    cache_key = cache.make_key('llama', url, data)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    try:
+        response = await async_client.post('llama', url, headers=headers, json=data)
+        
+        if response.status_code != 200:
+            return ErrorText(f"خطا در ارتباط با مدل (کد {response.status_code})")
+        
+        text = extract_content(response.json())
+        if text is not None:
+            cache.set(cache_key, text)
+            return text
+        
+        return ErrorText("متاسفانه نتوانستم پاسخی تولید کنم.")
+        
+    except httpx.TimeoutException:
+        return ErrorText("زمان انتظار برای پاسخ به پایان رسید. لطفا مجددا تلاش کنید.")
+    except http_client.BackendBusy:
+        return ErrorText("مدل در حال پاسخ به درخواست‌های دیگر است. لطفا چند لحظه دیگر تلاش کنید.")
+    except httpx.HTTPError as e:
+        return ErrorText("خطا در ارتباط با هوش مصنوعی. لطفا مجددا تلاش کنید.")
+    except Exception as e:
+        return ErrorText(f"خطای غیرمنتظره: {str(e)}")
+
+
+def stream_llama_api(prompt):
+    """
+    Yield the answer to prompt as it is generated, using the server's
+    OpenAI-compatible SSE output ("stream": true). Errors are yielded as text.
+    """
+    url, headers, data = build_request(prompt)
+    
+    # Shares cache entries with call_llama_api
+    cache = llm_cache.get_cache()
+    cache_key = cache.make_key('llama', url, data)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        yield cached
+        return
+    
+    parts = []
+    try:
+        with http_client.stream('llama', url, headers=headers, json={**data, "stream": True}) as response:
+            if response.status_code != 200:
+                yield f"خطا در ارتباط با مدل (کد {response.status_code})"
+                return
+            
+            for line in response.iter_lines(chunk_size=None):
+                # Event lines look like: data: {"choices": [{"delta": {"content": "..."}}]}
+                line = line.decode('utf-8').strip()
+                if not line.startswith('data:'):
+                    continue
+                payload = line[len('data:'):].strip()
+                if payload == '[DONE]':
+                    break
+                choices = json.loads(payload).get('choices') or []
+                token = choices[0].get('delta', {}).get('content') if choices else None
+                if token:
+                    parts.append(token)
+                    yield token
+        
+    except requests.exceptions.Timeout:
+        yield "زمان انتظار برای پاسخ به پایان رسید. لطفا مجددا تلاش کنید."
+        return
+    except http_client.BackendBusy:
+        yield "مدل در حال پاسخ به درخواست‌های دیگر است. لطفا چند لحظه دیگر تلاش کنید."
+        return
+    except requests.exceptions.RequestException as e:
+        yield "خطا در ارتباط با هوش مصنوعی. لطفا مجددا تلاش کنید."
+        return
+    except Exception as e:
+        yield f"خطای غیرمنتظره: {str(e)}"
+        return
     
+    if parts:
+        cache.set(cache_key, ''.join(parts))
+    else:
+        yield "متاسفانه نتوانستم پاسخی تولید کنم."
+
+
+def financial_advice_prompt(query, context):
     # Simplified prompt for less capable model
-    prompt = f"""اطلاعات مالی:
+    return f"""اطلاعات مالی:
 {context}
 
 سوال: {query}
 
 یک پاسخ کوتاه و مفید به فارسی بده."""
-    
-    return call_llama_api(prompt)
 
 
-def analyze_spending(transactions_text):
-    """Analyze spending patterns - simplified prompt"""
-    
+def get_financial_advice(query, context):
+    """Get financial advice from Llama - simplified prompt"""
+    return call_llama_api(financial_advice_prompt(query, context))
+
+
+async def aget_financial_advice(query, context):
+    return await acall_llama_api(financial_advice_prompt(query, context))
+
+
+def stream_financial_advice(query, context):
+    """Stream financial advice from Llama token by token"""
+    return stream_llama_api(financial_advice_prompt(query, context))
+
+
+def spending_prompt(context):
     # Simplified prompt
-    prompt = f"""این تراکنش‌ها را ببین:
-{transactions_text}
+    return f"""این خلاصه مالی را ببین:
+{context}
 
 یک خلاصه ۲ جمله‌ای از وضعیت مخارج به فارسی بنویس."""
-    
-    return call_llama_api(prompt)
 
 
-def get_goal_advice(goal_title, amount_needed, deadline, spending_context):
-    """Get advice for achieving a financial goal - simplified prompt"""
-    
-    # Simplified prompt
-    prompt = f"""هدف: {goal_title}
-مبلغ: {amount_needed:,} تومان
+def analyze_spending(context):
+    """Analyze spending patterns - simplified prompt"""
+    return call_llama_api(spending_prompt(context))
+
+
+async def aanalyze_spending(context):
+    return await acall_llama_api(spending_prompt(context))
+
+
+def goal_advice_prompt(goal_title, amount_needed, deadline, facts, context):
+    # The feasibility numbers come precomputed (services.goal_plan)
+    return f"""اطلاعات مالی:
+{context}
+
+هدف: {goal_title}
+مبلغ باقی‌مانده: {amount_needed:,.0f} تومان
 مهلت: {deadline}
+{facts}
 
 ۳ پیشنهاد ساده برای پس‌انداز بده به فارسی."""
-    
-    return call_llama_api(prompt)
+
+
+def get_goal_advice(goal_title, amount_needed, deadline, facts, context):
+    """Get advice for achieving a financial goal - simplified prompt"""
+    return call_llama_api(goal_advice_prompt(goal_title, amount_needed, deadline, facts, context))
+
+
+async def aget_goal_advice(goal_title, amount_needed, deadline, facts, context):
+    return await acall_llama_api(goal_advice_prompt(goal_title, amount_needed, deadline, facts, context))
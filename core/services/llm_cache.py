@@ -0,0 +1,130 @@
+"""
+Response cache for the AI services
+Identical prompts (same backend, model parameters and full prompt) are
+answered from cache instead of running inference again.
+
+Two tiers: a size-bounded in-process LRU with a TTL, backed by an optional
+Django cache alias (local-memory, file-based, ...) shared between processes.
+Shared keys carry a generation number stored in the alias, so clear() drops
+only this cache's entries even when the alias is shared with other data.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+GENERATION_KEY = 'llm:generation'
+
+
+class LLMResponseCache:
+    """Content-addressed LRU + TTL cache for model responses"""
+
+    def __init__(self, alias=None, ttl=3600, max_entries=512):
+        self.alias = alias
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(backend, *parts):
+        """Hash of the backend name and everything that shapes the answer"""
+        payload = json.dumps([backend, *parts], sort_keys=True, ensure_ascii=False, default=str)
+        return f"llm:{backend}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+    @property
+    def shared(self):
+        return caches[self.alias] if self.alias else None
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        # Shared entries keep their wall-clock expiry, so a local copy lives only as long
+        entry = self.shared.get(self._shared_key(key)) if self.shared is not None else None
+        ttl = entry[0] - time.time() if entry is not None else 0
+        with self._lock:
+            if ttl <= 0:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, entry[1], now, ttl)
+        return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._remember(key, value, time.monotonic(), self.ttl)
+        if self.shared is not None:
+            self.shared.set(self._shared_key(key), (time.time() + self.ttl, value), timeout=self.ttl)
+
+    def _shared_key(self, key):
+        generation = self.shared.get_or_set(GENERATION_KEY, 1, timeout=None)
+        return f'{key}:{generation}'
+
+    def _remember(self, key, value, now, ttl):
+        self._entries[key] = (now + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+        if self.shared is not None:
+            # Older generations are never read again and expire on their own
+            try:
+                self.shared.incr(GENERATION_KEY)
+            except ValueError:
+                pass  # nothing stored yet
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide response cache configured by settings.AI_CACHE"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            config = getattr(settings, 'AI_CACHE', {})
+            _cache = LLMResponseCache(
+                alias=config.get('ALIAS'),
+                ttl=config.get('TTL', 3600),
+                max_entries=config.get('MAX_ENTRIES', 512),
+            )
+        return _cache
+
+
+def reset():
+    """Drop the process-wide cache so the next call re-reads settings"""
+    global _cache
+    with _cache_lock:
+        _cache = None
@@ -0,0 +1,201 @@
+"""
+Single-flight coalescing for the AI services
+Concurrent calls with the same key (same backend, function and prompt) run
+once: the first caller does the work and the others wait for its result,
+so several tabs or retried requests use one inference slot instead of one
+each. Threads and event-loop tasks of a process coalesce in memory; with a
+Django cache alias set, processes coalesce too, through an in-flight marker
+and a short-lived copy of the result in that cache.
+"""
+import asyncio
+import hashlib
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls per key, with counters of how many were shared"""
+
+    def __init__(self, alias=None, lock_timeout=150, poll_interval=0.05):
+        self.alias = alias
+        self.lock_timeout = lock_timeout  # longest a call may hold the cross-process marker
+        self.poll_interval = poll_interval
+        self._calls = {}    # key -> _Call of a leader thread
+        self._tasks = {}    # key -> asyncio.Task running the call
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0         # waited on a call in this process
+        self.shared_followers = 0  # took the result of another process
+
+    @staticmethod
+    def make_key(*parts):
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return f"flight:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+    @property
+    def shared(self):
+        return caches[self.alias] if self.alias else None
+
+    def do(self, key, func, *args):
+        """func(*args), or the result of the identical call already in flight"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.followers += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run_shared(key, func, *args)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key, func, *args):
+        """Async twin of do() for coroutine functions, coalescing tasks of one event loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is None or task.get_loop() is not loop:
+                task = self._tasks[key] = loop.create_task(self._arun_shared(key, func, *args))
+                task.add_done_callback(lambda done: self._forget(key, done))
+                self.leaders += 1
+            else:
+                self.followers += 1
+        # The call is a task of its own: any caller, the first one included, can
+        # be cancelled without cancelling it for the others
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # retrieved, even if nobody was waiting
+
+    def _claim(self, key, waited):
+        """
+        (True, None) if this process may run the call, (False, result) once the
+        call another process was running has finished, or None while it runs.
+        """
+        shared = self.shared
+        if waited:
+            # Read before trying the marker: it is released right after the result is published
+            result = shared.get(f'{key}:result')
+            if result is not None:
+                return False, result
+        if shared.add(f'{key}:running', 1, self.lock_timeout):
+            shared.delete(f'{key}:result')  # left from an earlier call
+            return True, None
+        return None
+
+    def _publish(self, key, result):
+        shared = self.shared
+        # Kept just long enough for waiting processes to pick it up
+        shared.set(f'{key}:result', result, max(int(self.poll_interval * 20), 1))
+        shared.delete(f'{key}:running')
+
+    def _run_shared(self, key, func, *args):
+        if self.shared is None:
+            return func(*args)
+        claim = self._claim(key, waited=False)
+        while claim is None:
+            time.sleep(self.poll_interval)
+            claim = self._claim(key, waited=True)
+        run, result = claim
+        if not run:
+            with self._lock:
+                self.shared_followers += 1
+            return result
+        try:
+            result = func(*args)
+        except BaseException:
+            self.shared.delete(f'{key}:running')
+            raise
+        self._publish(key, result)
+        return result
+
+    async def _arun_shared(self, key, func, *args):
+        if self.shared is None:
+            return await func(*args)
+        claim = self._claim(key, waited=False)
+        while claim is None:
+            await asyncio.sleep(self.poll_interval)
+            claim = self._claim(key, waited=True)
+        run, result = claim
+        if not run:
+            with self._lock:
+                self.shared_followers += 1
+            return result
+        try:
+            result = await func(*args)
+        except BaseException:
+            self.shared.delete(f'{key}:running')
+            raise
+        self._publish(key, result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            calls = self.leaders + self.followers
+            coalesced = self.followers + self.shared_followers
+            return {
+                'leaders': self.leaders,
+                'followers': self.followers,
+                'shared_followers': self.shared_followers,
+                'coalesce_ratio': coalesced / calls if calls else 0.0,
+                'in_flight': len(self._calls) + len(self._tasks),
+            }
+
+
+_group = None
+_group_lock = threading.Lock()
+
+
+def enabled():
+    return getattr(settings, 'AI_SINGLE_FLIGHT', {}).get('ENABLED', True)
+
+
+def get_group():
+    """Process-wide group configured by settings.AI_SINGLE_FLIGHT"""
+    global _group
+    with _group_lock:
+        if _group is None:
+            config = getattr(settings, 'AI_SINGLE_FLIGHT', {})
+            _group = SingleFlight(
+                alias=config.get('ALIAS'),
+                lock_timeout=config.get('LOCK_TIMEOUT', 150),
+                poll_interval=config.get('POLL_INTERVAL', 0.05),
+            )
+        return _group
+
+
+def reset():
+    """Drop the process-wide group so the next call re-reads settings"""
+    global _group
+    with _group_lock:
+        _group = None
@@ -0,0 +1,148 @@
+"""
+Dashboard spending analysis for KifPool
+The LLM summary is computed in the background and stored per user, keyed by
+a fingerprint of the financial context it summarised. While the AI backend
+is unavailable a stale summary is replaced by a rule-based one at once. A
+failed call is not stored: its error is kept in memory and shown for
+RETRY_SECONDS, after which the next load tries the model again.
+"""
+import hashlib
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+
+from ..models import SpendingAnalysis
+from . import ai_backends, ai_fallback, background, financial_context
+from .ai_backends import ErrorText, Unavailable, aanalyze_spending, analyze_spending
+
+
+PLACEHOLDER = "در حال تحلیل..."
+EMPTY = "هنوز تراکنشی ثبت نشده است."
+RETRY_SECONDS = 60
+
+_failures = {}  # user id -> (fingerprint, error text, retry at)
+_lock = threading.Lock()
+
+
+def fingerprint(tx_text):
+    return hashlib.sha256(tx_text.encode('utf-8')).hexdigest()
+
+
+def job_key(user):
+    return ('spending-analysis', user.id)
+
+
+def store(user_id, tx_fingerprint, text):
+    SpendingAnalysis.objects.update_or_create(
+        user_id=user_id,
+        defaults={'fingerprint': tx_fingerprint, 'text': text},
+    )
+
+
+def failed(user_id, tx_fingerprint):
+    """Error text of the last failed refresh of this context, until it is due for a retry"""
+    with _lock:
+        failure = _failures.get(user_id)
+    if failure and failure[0] == tx_fingerprint and time.monotonic() < failure[2]:
+        return failure[1]
+    return None
+
+
+def _outcome(user_id, tx_fingerprint, text):
+    """True if text is an analysis worth storing; a failure is remembered instead"""
+    with _lock:
+        if isinstance(text, ErrorText):
+            _failures[user_id] = (tx_fingerprint, text, time.monotonic() + RETRY_SECONDS)
+            return False
+        _failures.pop(user_id, None)
+    return True
+
+
+def reset():
+    """Forget failed refreshes (tests)"""
+    with _lock:
+        _failures.clear()
+
+
+def refresh(user_id, tx_text, tx_fingerprint):
+    """Run the model and store its answer (background job)"""
+    try:
+        text = analyze_spending(tx_text)
+    except Unavailable:
+        return  # the dashboard shows the rule-based summary meanwhile
+    if _outcome(user_id, tx_fingerprint, text):
+        store(user_id, tx_fingerprint, text)
+
+
+async def arefresh(user_id, tx_text, tx_fingerprint):
+    """Async refresh, run as a task on the ASGI event loop"""
+    try:
+        text = await aanalyze_spending(tx_text)
+    except Unavailable:
+        return
+    if _outcome(user_id, tx_fingerprint, text):
+        await sync_to_async(store)(user_id, tx_fingerprint, text)
+
+
+def _lookup(user):
+    """(snapshot, context, its fingerprint, stored analysis), or None without transactions"""
+    data = financial_context.get_snapshot(user)
+    if not data['count']:
+        return None
+    tx_text = financial_context.render(data)
+    return data, tx_text, fingerprint(tx_text), SpendingAnalysis.objects.filter(user=user).first()
+
+
+def _after_submit(user, tx_fingerprint, stored):
+    if not background.is_pending(job_key(user)):
+        # Already finished (eager mode or a very fast model)
+        error = failed(user.id, tx_fingerprint)
+        if error is not None:
+            return error, True
+        stored = SpendingAnalysis.objects.filter(user=user).first()
+        if stored and stored.fingerprint == tx_fingerprint:
+            return stored.text, True
+    return (stored.text if stored else PLACEHOLDER), False
+
+
+def get_analysis(user):
+    """
+    Return (text, ready) for the dashboard without waiting on the model.
+    When the stored analysis is missing or stale a refresh is queued and the
+    last known text (or a placeholder) is returned.
+    """
+    found = _lookup(user)
+    if found is None:
+        return EMPTY, True
+
+    data, tx_text, tx_fingerprint, stored = found
+    if stored and stored.fingerprint == tx_fingerprint:
+        return stored.text, True
+    if not ai_backends.available():
+        return ai_fallback.spending_summary(data), True
+    error = failed(user.id, tx_fingerprint)
+    if error is not None:
+        return error, True  # shown until it is time to retry, instead of a call per poll
+
+    background.submit(job_key(user), refresh, user.id, tx_text, tx_fingerprint)
+    return _after_submit(user, tx_fingerprint, stored)
+
+
+async def aget_analysis(user):
+    """get_analysis for async views; the refresh runs on the event loop"""
+    found = await sync_to_async(_lookup)(user)
+    if found is None:
+        return EMPTY, True
+
+    data, tx_text, tx_fingerprint, stored = found
+    if stored and stored.fingerprint == tx_fingerprint:
+        return stored.text, True
+    if not ai_backends.available():
+        return ai_fallback.spending_summary(data), True
+    error = failed(user.id, tx_fingerprint)
+    if error is not None:
+        return error, True  # shown until it is time to retry, instead of a call per poll
+
+    await background.submit_async(job_key(user), arefresh, user.id, tx_text, tx_fingerprint)
+    return await sync_to_async(_after_submit)(user, tx_fingerprint, stored)
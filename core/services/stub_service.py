@@ -0,0 +1,111 @@
+"""
+Stub AI backend for KifPool
+Canned Persian answers with no model or network behind them, for load tests
+of the web tier and for simulating a slow or flaky model (settings.AI_STUB).
+The answer depends only on the prompt; errors are drawn from a seeded
+random generator, so a run can be repeated.
+"""
+import asyncio
+import hashlib
+import random
+import threading
+import time
+
+from django.conf import settings
+
+from . import circuit_breaker
+from .ai_backends import ErrorText
+
+
+DEFAULTS = {
+    'LATENCY_MS': 0,     # delay before each answer (or its first token)
+    'ERROR_RATE': 0.0,   # share of calls answered with an error, 0 to 1
+    'SEED': 0,
+}
+
+REPLIES = (
+    'هزینه‌های غیرضروری این ماه را یادداشت کنید و سقف مشخصی برایشان بگذارید.',
+    'بخشی از درآمد را در ابتدای ماه کنار بگذارید، نه آنچه در پایان ماه باقی می‌ماند.',
+    'بزرگ‌ترین دسته هزینه را بررسی کنید؛ کمی صرفه‌جویی در آن بیشترین اثر را دارد.',
+)
+ERROR_TEXT = ErrorText("خطا در ارتباط با هوش مصنوعی. لطفا مجددا تلاش کنید.")
+
+_random = None
+_lock = threading.Lock()
+
+
+def config(name):
+    return getattr(settings, 'AI_STUB', {}).get(name, DEFAULTS[name])
+
+
+def reset():
+    """Restart the error sequence from AI_STUB['SEED']"""
+    global _random
+    with _lock:
+        _random = None
+
+
+def failed():
+    global _random
+    rate = config('ERROR_RATE')
+    if rate <= 0:
+        return False
+    with _lock:
+        if _random is None:
+            _random = random.Random(config('SEED'))
+        return _random.random() < rate
+
+
+def reply(*parts):
+    """The canned answer for a prompt, or the error text"""
+    if failed():
+        return ERROR_TEXT
+    digest = hashlib.sha256('\n'.join(str(part) for part in parts).encode('utf-8')).digest()
+    return REPLIES[digest[0] % len(REPLIES)]
+
+
+def _record(text):
+    # Reported like a real backend, so the circuit breaker can be load-tested too
+    circuit_breaker.record('stub', not isinstance(text, ErrorText), config('LATENCY_MS') / 1000)
+    return text
+
+
+def answer(*parts):
+    time.sleep(config('LATENCY_MS') / 1000)
+    return _record(reply(*parts))
+
+
+async def aanswer(*parts):
+    await asyncio.sleep(config('LATENCY_MS') / 1000)
+    return _record(reply(*parts))
+
+
+def get_financial_advice(query, context):
+    return answer('advice', query, context)
+
+
+async def aget_financial_advice(query, context):
+    return await aanswer('advice', query, context)
+
+
+def stream_financial_advice(query, context):
+    """The canned answer word by word"""
+    words = answer('advice', query, context).split(' ')
+    for i, word in enumerate(words):
+        yield word if i == len(words) - 1 else word + ' '
+
+
+def analyze_spending(context):
+    return answer('spending', context)
+
+
+async def aanalyze_spending(context):
+    return await aanswer('spending', context)
+
+
+def get_goal_advice(goal_title, amount_needed, deadline, facts, context):
+    return answer('goal', goal_title, amount_needed, deadline, facts, context)
+
+
+async def aget_goal_advice(goal_title, amount_needed, deadline, facts, context):
+    return await aanswer('goal', goal_title, amount_needed, deadline, facts, context)
@@ -0,0 +1,99 @@
+"""
+Transaction list for KifPool
+Server-side filters plus keyset (cursor) pagination on (created_at, id): every
+page is one range scan of the (user, created_at) index for PAGE_SIZE + 1 rows,
+however deep the user has scrolled.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+from ..models import Transaction
+from . import category_tree, jalali
+
+
+PAGE_SIZE = 30
+
+
+def filtered(user, filters):
+    """
+    The user's transactions narrowed by cleaned TransactionFilterForm data:
+    type, category (with its subcategories), Jalali date range and amount range.
+    """
+    queryset = Transaction.objects.filter(user=user)
+    if filters.get('type'):
+        queryset = queryset.filter(type=filters['type'])
+    if filters.get('category'):
+        ids = category_tree.get(user).family_ids(filters['category'].id)
+        queryset = queryset.filter(category_id__in=ids)
+    if filters.get('date_from'):
+        queryset = queryset.filter(day_ordinal__gte=jalali.to_ordinal(filters['date_from']))
+    if filters.get('date_to'):
+        queryset = queryset.filter(day_ordinal__lte=jalali.to_ordinal(filters['date_to']))
+    if filters.get('min_amount') is not None:
+        queryset = queryset.filter(amount__gte=filters['min_amount'])
+    if filters.get('max_amount') is not None:
+        queryset = queryset.filter(amount__lte=filters['max_amount'])
+    return queryset
+
+
+def encode_cursor(transaction):
+    """Opaque token for the position just after transaction"""
+    raw = f'{transaction.created_at.isoformat()}|{transaction.id}'
+    return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """(created_at, id) of a cursor token; ValueError if it was tampered with"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode('ascii')
+        created_at, pk = raw.split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError('invalid cursor') from e
+
+
+def page(queryset, cursor=None, newest_first=True, size=PAGE_SIZE):
+    """
+    One page of queryset in (created_at, id) order starting after cursor.
+    Returns (transactions, next_cursor); next_cursor is None on the last page.
+    """
+    if newest_first:
+        queryset = queryset.order_by('-created_at', '-id')
+    else:
+        queryset = queryset.order_by('created_at', 'id')
+
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        # (created_at, id) past the cursor, written so the first condition is an index range
+        if newest_first:
+            queryset = queryset.filter(created_at__lte=created_at).filter(
+                Q(created_at__lt=created_at) | Q(id__lt=pk)
+            )
+        else:
+            queryset = queryset.filter(created_at__gte=created_at).filter(
+                Q(created_at__gt=created_at) | Q(id__gt=pk)
+            )
+
+    rows = list(queryset.select_related('category')[:size + 1])
+    if len(rows) > size:
+        return rows[:size], encode_cursor(rows[size - 1])
+    return rows, None
+
+
+def as_json(transaction):
+    category = transaction.category
+    return {
+        'id': transaction.id,
+        'title': transaction.title,
+        'amount': int(transaction.amount),
+        'type': transaction.type,
+        'date': transaction.date,
+        'category': {
+            'id': category.id,
+            'name': category.name,
+            'name_fa': category.name_fa,
+            'icon': category.icon,
+        } if category else None,
+    }
@@ -0,0 +1,90 @@
+"""
+Signal handlers that keep derived data in step with the ledger
+"""
+from django.db import transaction as db_transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Budget, Category, LedgerRollup, Transaction
+from .services import category_tree, default_categories, ledger
+
+
+@receiver(pre_save, sender=Transaction)
+def remember_ledger_entry(sender, instance, raw, **kwargs):
+    """Capture the stored state of an edited transaction before it changes"""
+    instance._ledger_previous = None
+    if raw or instance.pk is None:
+        return
+    previous = Transaction.objects.filter(pk=instance.pk).first()
+    if previous is not None:
+        instance._ledger_previous = ledger.entry(previous)
+
+
+@receiver(post_save, sender=Transaction)
+def update_rollups_on_save(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    deltas = {}
+    previous = getattr(instance, '_ledger_previous', None)
+    if previous is not None:
+        key, amount = previous
+        ledger.add_delta(deltas, key, -amount, -1)
+    key, amount = ledger.entry(instance)
+    ledger.add_delta(deltas, key, amount, 1)
+    ledger.apply_deltas(deltas)
+    ledger.bump_version({user_id for user_id, month, category_id, tx_type in deltas})
+
+
+@receiver(post_delete, sender=Transaction)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    if ledger.is_suspended():
+        return
+    ledger.apply_deltas(ledger.deltas_for([instance], sign=-1))
+    ledger.bump_version([instance.user_id])
+
+
+@receiver(pre_delete, sender=Category)
+def remember_rollup_users(sender, instance, **kwargs):
+    """Users whose buckets for this category are about to be cascaded away"""
+    instance._rollup_user_ids = list(
+        LedgerRollup.objects.filter(category=instance).values_list('user', flat=True).distinct()
+    )
+
+
+@receiver(post_delete, sender=Category)
+def rebuild_uncategorised_rollups(sender, instance, **kwargs):
+    # Transactions were moved to "no category" by SET_NULL without signals;
+    # recount those buckets once the surrounding delete has committed.
+    user_ids = getattr(instance, '_rollup_user_ids', None)
+    if user_ids:
+        db_transaction.on_commit(lambda: ledger.rebuild_uncategorised(user_ids))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_caches(sender, instance, **kwargs):
+    def invalidate():
+        category_tree.invalidate(instance)
+        if instance.is_default or instance.user_id is None:
+            default_categories.invalidate()
+
+    invalidate()
+    # Again once committed, in case another request reloaded the old rows meanwhile
+    db_transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_ledger_version_for_category(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Default categories show up in everyone's ledger
+    ledger.bump_version(None if instance.is_default or instance.user_id is None else [instance.user_id])
+
+
+@receiver(post_save, sender=Budget)
+@receiver(post_delete, sender=Budget)
+def bump_ledger_version_for_budget(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    ledger.bump_version([instance.user_id])
@@ -1,3 +1,1519 @@
-from django.test import TestCase
+import asyncio
+import datetime as dt
+import json
+import math
+import shutil
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
+
+import numpy as np
+import requests
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Budget, Category, Goal, ImportJob, LedgerRollup, SpendingAnalysis, Transaction
+from .forms import CategoryForm, GoalForm, TransactionFilterForm, TransactionForm
+from .services import ai_backends, ai_fallback, analytics, async_client, budgets, category_tree, circuit_breaker, default_categories, financial_context, forecast, goal_plan, http_client, import_jobs, importer, jalali, ledger, llm_cache, single_flight, spending_analysis
+from .services import stub_service
+from .services.llama_service import call_llama_api, stream_llama_api
+from .services.dashboard import build_dashboard
+
+
+class LedgerRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('ali', password='pass12345')
+        self.food = Category.objects.create(name='Food', name_fa='خوراکی', is_default=True)
+        self.salary = Category.objects.create(name='Salary', name_fa='حقوق', is_default=True)
+
+    def add(self, amount, tx_type=Transaction.EXPENSE, date='1403/10/01', category=None):
+        return Transaction.objects.create(
+            user=self.user, title='t', amount=amount, type=tx_type, date=date,
+            category=category or self.food,
+        )
+
+    def assertInSync(self):
+        self.assertEqual(ledger.verify([self.user.id]), [])
+
+    def test_save_and_delete_update_rollups(self):
+        self.add(1000)
+        self.add(500)
+        income = self.add(20000, Transaction.INCOME, category=self.salary)
+        self.assertEqual(ledger.totals(self.user), {'income': 20000, 'expense': 1500, 'count': 3})
+
+        income.delete()
+        self.assertEqual(ledger.totals(self.user), {'income': 0, 'expense': 1500, 'count': 2})
+        self.assertInSync()
+
+    def test_edit_moves_amount_between_buckets(self):
+        tx = self.add(1000)
+        tx.amount = Decimal(700)
+        tx.date = '1403/11/05'
+        tx.category = self.salary
+        tx.save()
+
+        rollup = LedgerRollup.objects.get(user=self.user)
+        self.assertEqual((rollup.month, rollup.category, rollup.total, rollup.count), ('1403/11', self.salary, 700, 1))
+        self.assertInSync()
+
+    def test_bulk_paths(self):
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, title='t', amount=100, type=Transaction.EXPENSE, date='1403/10/01', category=self.food)
+            for _ in range(10)
+        ])
+        self.assertEqual(ledger.totals(self.user)['expense'], 1000)
+
+        Transaction.objects.filter(user=self.user).update(amount=50)
+        self.assertEqual(ledger.totals(self.user)['expense'], 500)
+
+        Transaction.objects.filter(user=self.user).delete()
+        self.assertFalse(LedgerRollup.objects.filter(user=self.user).exists())
+
+    def test_deleting_category_moves_buckets_to_uncategorised(self):
+        coffee = Category.objects.create(name='Coffee', name_fa='قهوه', user=self.user)
+        self.add(300, category=coffee)
+        with self.captureOnCommitCallbacks(execute=True):
+            coffee.delete()
+
+        rollup = LedgerRollup.objects.get(user=self.user)
+        self.assertIsNone(rollup.category)
+        self.assertEqual(rollup.total, 300)
+        self.assertInSync()
+
+    def test_deleting_user_cascades_cleanly(self):
+        self.add(1000)
+        self.user.delete()
+        self.assertFalse(LedgerRollup.objects.exists())
+
+    def test_rebuild_repairs_drift(self):
+        self.add(1000)
+        LedgerRollup.objects.update(total=1)
+        self.assertEqual(len(ledger.verify()), 1)
+
+        ledger.rebuild()
+        self.assertInSync()
+
+
+@override_settings(BACKGROUND_EAGER=True)
+class DashboardTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('sara', password='pass12345')
+        self.client.force_login(self.user)
+        self.food = Category.objects.create(name='Food', name_fa='خوراکی', is_default=True)
+        patcher = mock.patch('core.services.spending_analysis.analyze_spending', return_value='تحلیل')
+        self.analyze_spending = patcher.start()
+        self.addCleanup(patcher.stop)
+        spending_analysis.reset()
+        self.addCleanup(spending_analysis.reset)
+
+    def seed(self, n):
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=self.user, title=f't{i}', amount=100 + i, date='1403/10/01', category=self.food,
+                type=Transaction.INCOME if i % 3 == 0 else Transaction.EXPENSE,
+            )
+            for i in range(n)
+        ])
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx)
+
+    def test_chart_matches_full_running_balance(self):
+        self.seed(25)
+        balance, expected = 0, []
+        for tx in Transaction.objects.order_by('created_at', 'id'):
+            balance += tx.amount if tx.type == Transaction.INCOME else -tx.amount
+            expected.append(float(balance))
+
+        data = build_dashboard(self.user)
+        self.assertEqual(data['chart_data'], expected[-10:])
+        self.assertEqual(data['balance'], balance)
+        self.assertEqual(data['top_category'], 'Food')
+
+    def test_query_count_does_not_grow_with_history(self):
+        self.seed(5)
+        self.count_queries()  # first hit caches the category tree and stores the analysis
+        small = self.count_queries()
+
+        self.seed(200)
+        self.count_queries()  # refreshes the stored analysis
+        self.assertEqual(self.count_queries(), small)
+
+    def test_analysis_is_stored_and_reused(self):
+        self.seed(3)
+        self.client.get(reverse('dashboard'))
+        self.client.get(reverse('dashboard'))
+        self.assertEqual(self.analyze_spending.call_count, 1)
+        self.assertEqual(SpendingAnalysis.objects.get(user=self.user).text, 'تحلیل')
+
+        response = self.client.get(reverse('dashboard_analysis'))
+        self.assertEqual(response.json(), {'analysis': 'تحلیل', 'ready': True})
+
+    def test_failed_calls_are_not_stored(self):
+        self.seed(3)
+        self.analyze_spending.return_value = stub_service.ERROR_TEXT
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual((response.context['analysis'], response.context['analysis_ready']), (stub_service.ERROR_TEXT, True))
+        self.assertFalse(SpendingAnalysis.objects.exists())
+
+        # Polls get the error without calling the model again until the retry is due
+        self.analyze_spending.return_value = 'تحلیل'
+        response = self.client.get(reverse('dashboard_analysis'))
+        self.assertEqual(response.json(), {'analysis': stub_service.ERROR_TEXT, 'ready': True})
+        self.assertEqual(self.analyze_spending.call_count, 1)
+
+        later = time.monotonic() + spending_analysis.RETRY_SECONDS
+        with mock.patch('core.services.spending_analysis.time.monotonic', return_value=later):
+            response = self.client.get(reverse('dashboard_analysis'))
+        self.assertEqual(response.json(), {'analysis': 'تحلیل', 'ready': True})
+        self.assertEqual(self.analyze_spending.call_count, 2)
+
+    @override_settings(BACKGROUND_EAGER=False)
+    def test_dashboard_does_not_wait_for_the_model(self):
+        self.seed(3)
+        with mock.patch('core.services.background.submit') as submit:
+            response = self.client.get(reverse('dashboard'))
+        submit.assert_called_once()
+        self.assertFalse(response.context['analysis_ready'])
+        self.analyze_spending.assert_not_called()
+
+
+class LLMCacheTests(TestCase):
+    def setUp(self):
+        llm_cache.reset()
+        self.addCleanup(llm_cache.reset)
+
+    def test_lru_eviction_and_counters(self):
+        cache = llm_cache.LLMResponseCache(max_entries=2)
+        cache.set('a', 'A')
+        cache.set('b', 'B')
+        cache.get('a')           # a is now most recently used
+        cache.set('c', 'C')      # evicts b
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 'C')
+        self.assertEqual(cache.stats()['hits'], 2)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_entries_expire(self):
+        cache = llm_cache.LLMResponseCache(ttl=10)
+        cache.set('a', 'A')
+        with mock.patch('core.services.llm_cache.time.monotonic', return_value=10 ** 9):
+            self.assertIsNone(cache.get('a'))
+
+    def test_clear_leaves_the_rest_of_the_alias(self):
+        cache.clear()
+        cache.set('other', 'kept')
+        first, second = llm_cache.LLMResponseCache(alias='default'), llm_cache.LLMResponseCache(alias='default')
+        first.set('a', 'A')
+        self.assertEqual(second.get('a'), 'A')
+        first.clear()
+        self.assertIsNone(llm_cache.LLMResponseCache(alias='default').get('a'))
+        self.assertEqual(cache.get('other'), 'kept')
+
+    def test_shared_hit_keeps_the_remaining_ttl(self):
+        cache.clear()
+        first, second = llm_cache.LLMResponseCache(alias='default', ttl=100), llm_cache.LLMResponseCache(alias='default', ttl=100)
+        with mock.patch('core.services.llm_cache.time.time', return_value=1000):
+            first.set('a', 'A')
+        with mock.patch('core.services.llm_cache.time.time', return_value=1090), \
+                mock.patch('core.services.llm_cache.time.monotonic', return_value=500):
+            self.assertEqual(second.get('a'), 'A')
+        with mock.patch('core.services.llm_cache.time.time', return_value=1101), \
+                mock.patch('core.services.llm_cache.time.monotonic', return_value=511):
+            # The local copy expires with the shared one, not a full TTL after it was read
+            self.assertIsNone(second.get('a'))
+
+    def test_key_depends_on_backend_and_prompt(self):
+        key = llm_cache.LLMResponseCache.make_key
+        self.assertEqual(key('llama', {'p': 1}), key('llama', {'p': 1}))
+        self.assertNotEqual(key('llama', {'p': 1}), key('gemini', {'p': 1}))
+        self.assertNotEqual(key('llama', {'p': 1}), key('llama', {'p': 2}))
+
+    @override_settings(AI_CACHE={'ALIAS': None})
+    def test_identical_prompt_skips_the_model(self):
+        reply = mock.Mock(status_code=200)
+        reply.json.return_value = {'choices': [{'message': {'content': 'پاسخ'}}]}
+        with mock.patch('core.services.http_client.post', return_value=reply) as post:
+            self.assertEqual(call_llama_api('سلام'), 'پاسخ')
+            self.assertEqual(call_llama_api('سلام'), 'پاسخ')
+        self.assertEqual(post.call_count, 1)
+
+    @override_settings(AI_CACHE={'ALIAS': None})
+    def test_errors_are_not_cached(self):
+        reply = mock.Mock(status_code=503)
+        with mock.patch('core.services.http_client.post', return_value=reply) as post:
+            call_llama_api('سلام')
+            call_llama_api('سلام')
+        self.assertEqual(post.call_count, 2)
+
+
+class HttpClientTests(TestCase):
+    def setUp(self):
+        http_client.reset()
+        self.addCleanup(http_client.reset)
+
+    @override_settings(AI_HTTP={'QUEUE_TIMEOUT': 0.01, 'BACKENDS': {'llama': {'MAX_CONCURRENCY': 1}}})
+    def test_in_flight_requests_are_capped(self):
+        with http_client.slot('llama'):
+            with self.assertRaises(http_client.BackendBusy):
+                with http_client.slot('llama'):
+                    pass
+        with http_client.slot('llama'):
+            pass  # slot released again
+
+    @override_settings(AI_HTTP={'QUEUE_TIMEOUT': 1, 'BACKENDS': {'llama': {'MAX_CONCURRENCY': 1}}})
+    def test_async_slots_are_taken_in_arrival_order(self):
+        order = []
+
+        async def request(i):
+            async with async_client.slot('llama'):
+                order.append(i)
+                await asyncio.sleep(0.01)
+
+        async def run():
+            tasks = []
+            for i in range(4):
+                tasks.append(asyncio.create_task(request(i)))
+                await asyncio.sleep(0.002)
+            await tasks[0]
+            # Asks again the moment it lets go, but the others were queued first
+            await request(0)
+            await asyncio.gather(*tasks)
+
+        asyncio.run(run())
+        self.assertEqual(order, [0, 1, 2, 3, 0])
+
+    @override_settings(AI_HTTP={'QUEUE_TIMEOUT': 0.01, 'BACKENDS': {'llama': {'MAX_CONCURRENCY': 1}}})
+    def test_async_queue_times_out(self):
+        async def run():
+            async with async_client.slot('llama'):
+                with self.assertRaises(http_client.BackendBusy):
+                    async with async_client.slot('llama'):
+                        pass
+            async with async_client.slot('llama'):
+                pass  # both queues released again
+
+        asyncio.run(run())
+
+    @override_settings(AI_HTTP={'CONNECT_TIMEOUT': 2, 'BACKENDS': {'llama': {'READ_TIMEOUT': 90}}})
+    def test_split_timeouts_and_shared_session(self):
+        self.assertEqual(http_client.timeout('llama'), (2, 90))
+        self.assertIs(http_client.get_session(), http_client.get_session())
+
+
+@override_settings(AI_CACHE={'ALIAS': None})
+class AdvisorStreamingTests(TestCase):
+    def setUp(self):
+        llm_cache.reset()
+        self.addCleanup(llm_cache.reset)
+        self.user = User.objects.create_user('reza', password='pass12345')
+        self.client.force_login(self.user)
+
+    def sse_reply(self, *tokens):
+        lines = [
+            b'data: ' + json.dumps({'choices': [{'delta': {'content': t}}]}).encode('utf-8')
+            for t in tokens
+        ]
+        reply = mock.MagicMock(status_code=200)
+        reply.iter_lines.return_value = [*lines, b'', b'data: [DONE]']
+        stream = mock.MagicMock()
+        stream.return_value.__enter__.return_value = reply
+        return mock.patch('core.services.http_client.stream', stream)
+
+    def test_tokens_are_yielded_and_cached(self):
+        with self.sse_reply('سلام', ' دنیا'):
+            self.assertEqual(list(stream_llama_api('پرسش')), ['سلام', ' دنیا'])
+        self.assertEqual(call_llama_api('پرسش'), 'سلام دنیا')
+
+    def test_advisor_relays_server_sent_events(self):
+        with self.sse_reply('پس‌انداز', ' کنید'):
+            response = self.client.post(
+                reverse('advisor_ask'), json.dumps({'query': 'چه کنم؟', 'stream': True}),
+                content_type='application/json',
+            )
+            body = b''.join(response.streaming_content).decode('utf-8')
+        self.assertEqual(response['Content-Type'], 'text/event-stream; charset=utf-8')
+        self.assertIn('"token": "پس‌انداز"', body)
+        self.assertTrue(body.endswith('data: [DONE]\n\n'))
+
+
+class AsyncAdvisorTests(TestCase):
+    def setUp(self):
+        llm_cache.reset()
+        self.addCleanup(llm_cache.reset)
+        self.user = User.objects.create_user('reza', password='pass12345')
+
+    async def test_asgi_request_uses_async_client(self):
+        client = AsyncClient()
+        await sync_to_async(client.force_login)(self.user)
+        reply = mock.MagicMock(status_code=200)
+        reply.json.return_value = {'choices': [{'message': {'content': 'کمتر خرج کنید'}}]}
+        with mock.patch('core.services.async_client.post', mock.AsyncMock(return_value=reply)) as post, \
+                mock.patch('core.services.http_client.post') as sync_post:
+            response = await client.post(
+                reverse('advisor_ask'), json.dumps({'query': 'چه کنم؟', 'stream': True}),
+                content_type='application/json',
+            )
+        self.assertEqual(json.loads(response.content), {'response': 'کمتر خرج کنید'})
+        post.assert_awaited_once()
+        sync_post.assert_not_called()
+
+
+@override_settings(AI_BACKEND='stub', AI_STUB={'LATENCY_MS': 0, 'ERROR_RATE': 0.0, 'SEED': 0})
+class AIBackendTests(TestCase):
+    def setUp(self):
+        stub_service.reset()
+        self.addCleanup(stub_service.reset)
+        circuit_breaker.reset()
+        self.addCleanup(circuit_breaker.reset)
+        self.user = User.objects.create_user('reza', password='pass12345')
+        self.client.force_login(self.user)
+
+    def ask(self, **data):
+        return self.client.post(
+            reverse('advisor_ask'), json.dumps({'query': 'چه کنم؟', **data}), content_type='application/json',
+        )
+
+    def test_every_backend_implements_the_interface(self):
+        for backend in ai_backends.BACKENDS:
+            self.assertTrue(ai_backends.load(backend))
+        with override_settings(AI_BACKEND='nope'), self.assertRaises(ImproperlyConfigured):
+            ai_backends.current()
+
+    def test_stub_answers_without_a_model(self):
+        with mock.patch('core.services.http_client.post') as post:
+            first = self.ask().json()['response']
+            self.assertEqual(self.ask().json()['response'], first)  # same prompt, same answer
+        self.assertIn(first, stub_service.REPLIES)
+        post.assert_not_called()
+
+        body = b''.join(self.ask(stream=True).streaming_content).decode('utf-8')
+        self.assertIn(json.dumps({'token': first.split(' ')[0] + ' '}, ensure_ascii=False), body)
+
+    def test_stub_errors_repeat_with_the_seed(self):
+        with override_settings(AI_STUB={'ERROR_RATE': 0.5, 'SEED': 7}):
+            runs = []
+            for _ in range(2):
+                stub_service.reset()
+                runs.append([stub_service.get_financial_advice('q', 'c') == stub_service.ERROR_TEXT for _ in range(20)])
+        self.assertEqual(runs[0], runs[1])
+        self.assertTrue(any(runs[0]) and not all(runs[0]))
+
+    def test_stub_latency(self):
+        with override_settings(AI_STUB={'LATENCY_MS': 30}):
+            start = time.perf_counter()
+            stub_service.get_goal_advice('سفر', 1000, '1404/01/01', '', '')
+        self.assertGreaterEqual(time.perf_counter() - start, 0.03)
+
+
+@override_settings(AI_BACKEND='stub', AI_SINGLE_FLIGHT={'ENABLED': True, 'ALIAS': None})
+class SingleFlightTests(TestCase):
+    ARGS = ('سفر', 1000.0, '1404/01/01', 'facts', 'context')
+
+    def setUp(self):
+        single_flight.reset()
+        self.addCleanup(single_flight.reset)
+        circuit_breaker.reset()
+        self.addCleanup(circuit_breaker.reset)
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def slow_answer(self, *args):
+        self.started.set()
+        self.release.wait(5)
+        return 'پاسخ'
+
+    def in_threads(self, n, func, *args):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(func(*args))) for _ in range(n)]
+        for thread in threads:
+            thread.start()
+        self.started.wait(5)
+        time.sleep(0.05)  # let the followers join
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+        return results
+
+    def test_identical_calls_share_one_answer(self):
+        with mock.patch('core.services.stub_service.get_goal_advice', side_effect=self.slow_answer) as advice:
+            results = self.in_threads(5, ai_backends.get_goal_advice, *self.ARGS)
+        self.assertEqual(results, ['پاسخ'] * 5)
+        self.assertEqual(advice.call_count, 1)
+        stats = single_flight.get_group().stats()
+        self.assertEqual((stats['leaders'], stats['followers'], stats['in_flight']), (1, 4, 0))
+        self.assertEqual(stats['coalesce_ratio'], 0.8)
+
+        # Finished calls are not reused, and different prompts never wait on each other
+        with mock.patch('core.services.stub_service.get_goal_advice', return_value='پاسخ') as advice:
+            ai_backends.get_goal_advice(*self.ARGS)
+            ai_backends.get_goal_advice('خانه', *self.ARGS[1:])
+        self.assertEqual(advice.call_count, 2)
+
+    def test_followers_get_the_error(self):
+        def fail(*args):
+            self.slow_answer()
+            raise ValueError('down')
+
+        outcomes = []
+
+        def call():
+            try:
+                ai_backends.analyze_spending('context')
+            except ValueError:
+                outcomes.append('error')
+
+        with mock.patch('core.services.stub_service.analyze_spending', side_effect=fail) as analyze:
+            self.in_threads(3, call)
+        self.assertEqual(outcomes, ['error'] * 3)
+        self.assertEqual(analyze.call_count, 1)
+
+    def test_async_calls_share_one_answer(self):
+        calls = []
+
+        async def answer(*args):
+            calls.append(args)
+            await asyncio.sleep(0.05)
+            return 'پاسخ'
+
+        async def run():
+            return await asyncio.gather(*(ai_backends.aget_goal_advice(*self.ARGS) for _ in range(4)))
+
+        with mock.patch('core.services.stub_service.aget_goal_advice', side_effect=answer):
+            self.assertEqual(asyncio.run(run()), ['پاسخ'] * 4)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(single_flight.get_group().stats()['followers'], 3)
+
+    def test_cancelled_caller_does_not_cancel_the_others(self):
+        async def answer(*args):
+            await asyncio.sleep(0.05)
+            return 'پاسخ'
+
+        async def run():
+            first = asyncio.ensure_future(ai_backends.aget_goal_advice(*self.ARGS))
+            await asyncio.sleep(0)
+            others = asyncio.gather(*(ai_backends.aget_goal_advice(*self.ARGS) for _ in range(2)))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            return await others
+
+        with mock.patch('core.services.stub_service.aget_goal_advice', side_effect=answer) as advice:
+            self.assertEqual(asyncio.run(run()), ['پاسخ'] * 2)
+        self.assertEqual(advice.call_count, 1)
+        self.assertEqual(single_flight.get_group().stats()['in_flight'], 0)
+
+    def test_processes_share_through_the_cache(self):
+        cache.clear()
+        first, second = single_flight.SingleFlight(alias='default'), single_flight.SingleFlight(alias='default')
+        key = first.make_key('stub', 'analyze_spending', 'context')
+        other = mock.Mock(return_value='دوباره')
+
+        # While the first "process" runs the call, the second waits for its result
+        leader = threading.Thread(target=first.do, args=(key, self.slow_answer))
+        leader.start()
+        self.started.wait(5)
+        follower = []
+        waiter = threading.Thread(target=lambda: follower.append(second.do(key, other)))
+        waiter.start()
+        time.sleep(0.1)
+        self.release.set()
+        leader.join(5)
+        waiter.join(5)
+        self.assertEqual(follower, ['پاسخ'])
+        other.assert_not_called()
+        self.assertEqual(second.stats()['shared_followers'], 1)
+
+    @override_settings(AI_SINGLE_FLIGHT={'ENABLED': False})
+    def test_disabled(self):
+        with mock.patch('core.services.stub_service.get_goal_advice', side_effect=self.slow_answer) as advice:
+            self.in_threads(3, ai_backends.get_goal_advice, *self.ARGS)
+        self.assertEqual(advice.call_count, 3)
+
+
+@override_settings(AI_BACKEND='llama', AI_CACHE={'ALIAS': None})
+class CircuitBreakerTests(TestCase):
+    def setUp(self):
+        circuit_breaker.reset()
+        self.addCleanup(circuit_breaker.reset)
+        llm_cache.reset()
+        self.addCleanup(llm_cache.reset)
+        self.user = User.objects.create_user('sara', password='pass12345')
+        food = Category.objects.create(name='Groceries', name_fa='خوراک', user=self.user)
+        today = jalali.today()
+        Transaction.objects.create(user=self.user, title='salary', amount=1000, date=today, type=Transaction.INCOME)
+        Transaction.objects.create(user=self.user, title='shop', amount=1500, date=today, category=food, type=Transaction.EXPENSE)
+        self.client.force_login(self.user)
+
+    def trip(self):
+        with mock.patch.object(http_client.get_session(), 'post', side_effect=requests.exceptions.ConnectionError):
+            for i in range(5):
+                call_llama_api(f'پرسش {i}')
+        self.assertEqual(circuit_breaker.get('llama').stats()['state'], circuit_breaker.OPEN)
+
+    def test_trips_probes_and_recovers(self):
+        breaker = circuit_breaker.CircuitBreaker(window=10, min_calls=4, failure_rate=0.5, slow_seconds=10, open_seconds=0.05)
+        for ok in (True, False, True, False):
+            self.assertTrue(breaker.allow())
+            breaker.record(ok, 0.1)
+        self.assertFalse(breaker.allow())
+        self.assertTrue(breaker.is_open())
+
+        time.sleep(0.06)
+        self.assertFalse(breaker.is_open())
+        self.assertTrue(breaker.allow())   # the probe
+        self.assertFalse(breaker.allow())  # only one at a time
+        breaker.record(False, 0.1)
+        self.assertEqual(breaker.state, circuit_breaker.OPEN)
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.record(True, 0.1)
+        self.assertEqual(breaker.stats()['state'], circuit_breaker.CLOSED)
+        self.assertEqual(breaker.stats()['trips'], 2)
+
+    def test_slow_calls_trip_it(self):
+        breaker = circuit_breaker.CircuitBreaker(min_calls=5, slow_seconds=10)
+        for seconds in (1, 2, 3, 12, 15):
+            breaker.record(True, seconds)
+        self.assertEqual(breaker.state, circuit_breaker.OPEN)
+        self.assertEqual(circuit_breaker.percentile([1, 2, 3, 12, 15], 50), 3)
+
+    def test_open_circuit_fails_fast(self):
+        self.trip()
+        with mock.patch('core.services.http_client.post') as post:
+            with self.assertRaises(ai_backends.Unavailable):
+                ai_backends.get_financial_advice('چه کنم؟', 'context')
+        post.assert_not_called()
+        self.assertFalse(ai_backends.available())
+
+    def test_views_answer_by_rules_while_open(self):
+        self.trip()
+        with mock.patch('core.services.http_client.post') as post, \
+                mock.patch('core.services.http_client.stream') as stream:
+            response = self.client.post(reverse('advisor_ask'), json.dumps({'query': 'چه کنم؟'}), content_type='application/json')
+            answer = response.json()['response']
+            streamed = self.client.post(
+                reverse('advisor_ask'), json.dumps({'query': 'چه کنم؟', 'stream': True}), content_type='application/json',
+            )
+            body = b''.join(streamed.streaming_content).decode('utf-8')
+
+            goal = Goal.objects.create(user=self.user, title='سفر', target_amount=5000, deadline='1499/01/01')
+            advice = self.client.get(reverse('goal_advice', args=[goal.pk])).json()['advice']
+            analysis = self.client.get(reverse('dashboard_analysis')).json()
+        post.assert_not_called()
+        stream.assert_not_called()
+
+        self.assertTrue(answer.startswith(ai_fallback.NOTICE))
+        self.assertIn('خوراک', answer)
+        self.assertIn(json.dumps({'token': answer}, ensure_ascii=False), body)
+        self.assertIn('پس‌انداز لازم در هر ماه', advice)
+        self.assertTrue(analysis['ready'])
+        self.assertIn('بیشترین هزینه در دسته «خوراک» بوده است (100٪).', analysis['analysis'])
+        self.assertFalse(SpendingAnalysis.objects.exists())
+
+    def test_rule_based_summary(self):
+        data = {
+            'count': 4, 'income': 0, 'expense': 0, 'month': '1403/07',
+            'categories': [('اجاره', 2000), ('خوراک', 500)],
+            'trend': [('1403/06', 3000, 2000), ('1403/07', 2000, 2500)],
+            'merchants': [('landlord', 2000, 1)],
+        }
+        self.assertEqual(
+            ai_fallback.spending_summary(data),
+            'در ماه 1403/07 2,500 تومان هزینه و 2,000 تومان درآمد ثبت شده است. '
+            'بیشترین هزینه در دسته «اجاره» بوده است (80٪). '
+            'هزینه‌ها نسبت به ماه قبل 25٪ بیشتر شده است.',
+        )
+        self.assertEqual(len(ai_fallback.tips(data)), 3)
+        self.assertIn('بودجه ماهانه', ai_fallback.tips(data)[1])
+
+
+class ImporterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reza', password='pass12345')
+        self.food = Category.objects.create(name='Food', name_fa='غذا', is_default=True)
+        self.other = Category.objects.create(name='Other', name_fa='سایر', is_default=True)
+
+    def chunks(self, text, size=7):
+        # Small chunks split multi-byte characters and lines across boundaries
+        data = text.encode('utf-8-sig')
+        return [data[i:i + size] for i in range(0, len(data), size)]
+
+    def test_valid_rows_are_imported_and_bad_rows_reported(self):
+        report = importer.import_csv(self.user, self.chunks(
+            'title,amount,type,date,category\r\n'
+            'نان,"12,000",EXPENSE,1403/10/01,غذا\r\n'
+            'حقوق,5000000,درآمد,1403-10-1,Gifts\r\n'
+            'خراب,abc,EXPENSE,1403/10/02,Food\r\n'
+            'بی‌تاریخ,1000,EXPENSE,,Food\r\n'
+        ))
+        self.assertEqual((report.created, report.failed), (2, 2))
+        self.assertEqual([line for line, message in report.errors], [4, 5])
+        bread, salary = Transaction.objects.order_by('id')
+        self.assertEqual((bread.amount, bread.category, bread.date), (12000, self.food, '1403/10/01'))
+        self.assertEqual((salary.type, salary.category, salary.date), ('INCOME', self.other, '1403/10/01'))
+        self.assertEqual(ledger.totals(self.user)['expense'], 12000)
+
+    def test_queries_do_not_grow_with_rows(self):
+        rows = ''.join(f'r{i},{i + 1},EXPENSE,1403/10/{i % 28 + 1:02d},Food\n' for i in range(300))
+        with CaptureQueriesContext(connection) as queries:
+            report = importer.import_csv(self.user, self.chunks('title,amount,type,date,category\n' + rows, 4096), batch_size=100)
+        self.assertEqual(report.created, 300)
+        self.assertLess(len(queries), 40)
+
+    def test_missing_amount_column_fails_the_file(self):
+        with self.assertRaises(importer.ImportFailed):
+            importer.import_csv(self.user, [b'title,date\nx,1403/10/01\n'])
+        self.assertFalse(Transaction.objects.exists())
+
+
+class DefaultCategoryTests(TestCase):
+    def setUp(self):
+        default_categories.invalidate()
+        self.addCleanup(default_categories.invalidate)
+        self.user = User.objects.create_user('reza', password='pass12345')
+
+    def test_defaults_are_seeded_by_migration(self):
+        names = set(Category.objects.filter(is_default=True).values_list('name', flat=True))
+        self.assertTrue({'Food', 'Salary', 'Other'} <= names)
+        other = Category.objects.get(name='Other', is_default=True)
+        self.assertEqual(default_categories.get_id('other'), other.id)
+        self.assertEqual(default_categories.get_id('سایر'), other.id)
+
+    def test_registry_loads_once(self):
+        default_categories.ids()
+        with self.assertNumQueries(0):
+            self.assertIsNotNone(default_categories.get_id('Food'))
+            self.assertIsNone(default_categories.get_id('Gifts'))
+
+    def test_writes_to_default_categories_invalidate_it(self):
+        self.assertIsNone(default_categories.get_id('Gifts'))
+        gifts = Category.objects.create(name='Gifts', name_fa='هدیه', is_default=True)
+        self.assertEqual(default_categories.get_id('هدیه'), gifts.id)
+        gifts.name_fa = 'کادو'
+        gifts.save()
+        self.assertIsNone(default_categories.get_id('هدیه'))
+        gifts.delete()
+        self.assertIsNone(default_categories.get_id('Gifts'))
+
+    def test_user_categories_are_not_defaults(self):
+        Category.objects.create(name='Pets', user=self.user)
+        self.assertIsNone(default_categories.get_id('Pets'))
+
+    def test_importer_resolves_defaults_without_queries(self):
+        default_categories.ids()
+        with self.assertNumQueries(1):  # the user's own categories
+            categories = importer.category_map(self.user)
+        self.assertEqual(categories['other'], default_categories.get_id('Other'))
+
+    @override_settings(BACKGROUND_EAGER=True)
+    def test_dashboard_does_not_touch_categories(self):
+        self.client.force_login(self.user)
+        with mock.patch('core.services.spending_analysis.analyze_spending', return_value='تحلیل'), \
+                CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('dashboard'))
+        self.assertFalse([q['sql'] for q in queries if 'INSERT INTO "core_category"' in q['sql']])
+        # No get_or_create lookups by name (the add-transaction form still lists categories)
+        self.assertFalse([q['sql'] for q in queries if '"core_category"."name" =' in q['sql']])
+
+
+class CategoryTreeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user('reza', password='pass12345')
+        self.other_user = User.objects.create_user('ali', password='pass12345')
+        self.food = Category.objects.create(name='Food', name_fa='خوراکی', is_default=True)
+        self.bread = Category.objects.create(name='Bread', name_fa='نان', user=self.user, parent=self.food)
+        self.secret = Category.objects.create(name='Secret', name_fa='محرمانه', user=self.other_user)
+
+    def test_built_once_with_parents_attached(self):
+        with self.assertNumQueries(1):
+            tree = category_tree.get(self.user)
+        with self.assertNumQueries(0):
+            tree = category_tree.get(self.user)
+            self.assertEqual(str(tree.get(self.bread.id)), 'خوراکی » نان')
+        self.assertIn(self.food, tree.defaults)
+        self.assertEqual(tree.owned, [self.bread])
+        self.assertNotIn(self.secret.id, tree.by_id)
+        self.assertEqual(tree.family_ids(self.food.id), [self.food.id, self.bread.id])
+
+    def test_category_writes_invalidate_only_affected_trees(self):
+        category_tree.get(self.user)
+        category_tree.get(self.other_user)
+        pets = Category.objects.create(name='Pets', name_fa='حیوانات', user=self.user)
+        self.assertIn(pets.id, category_tree.get(self.user).by_id)
+        with self.assertNumQueries(0):
+            category_tree.get(self.other_user)
+
+        self.food.name_fa = 'غذا'
+        self.food.save()
+        self.assertEqual(str(category_tree.get(self.other_user).get(self.food.id)), 'غذا')
+        self.assertEqual(str(category_tree.get(self.user).get(self.bread.id)), 'غذا » نان')
+
+        pets.delete()
+        self.assertNotIn(pets.id, category_tree.get(self.user).by_id)
+
+    def test_forms_use_the_tree(self):
+        category_tree.get(self.user)
+        with self.assertNumQueries(0):
+            form = CategoryForm(self.user, {'name_fa': 'نان سنگک', 'parent': self.food.id, 'icon': 'bi-tag', 'color': '#000000'})
+            choices = form.fields['parent'].choices
+            self.assertIn((self.food.id, 'خوراکی'), choices)
+            self.assertNotIn(self.bread.id, dict(choices))
+        self.assertTrue(form.is_valid())  # the model's own FK check still reads the parent
+        self.assertEqual(form.cleaned_data['parent'], self.food)
+        self.assertFalse(CategoryForm(self.user, {'name_fa': 'x', 'parent': self.secret.id, 'color': '#000000'}).is_valid())
+        self.assertFalse(TransactionFilterForm(self.user, {'category': self.secret.id}).is_valid())
+
+    def test_pages_read_categories_from_the_cache(self):
+        self.client.force_login(self.user)
+        urls = [reverse('dashboard'), reverse('transactions'), reverse('budget'), reverse('categories'),
+                reverse('add_category'), f"{reverse('transactions')}?category={self.food.id}"]
+        for url in urls:
+            self.client.get(url)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertFalse([q['sql'] for q in queries if 'FROM "core_category"' in q['sql']], url)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reza', password='pass12345')
+        self.client.force_login(self.user)
+        food = Category.objects.create(name='Food', name_fa='غذا', is_default=True)
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, title=f't{i}', amount=1000 + i, type='EXPENSE',
+                        date=f'1403/{i % 12 + 1:02d}/01', category=food)
+            for i in range(30)
+        ] + [Transaction(user=self.user, title='حقوق', amount=9000, type='INCOME', date='1403/05/10')])
+
+    def export(self, **params):
+        response = self.client.get(reverse('export_transactions'), params)
+        return response, b''.join(response.streaming_content).decode('utf-8')
+
+    def test_streams_every_row_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response, body = self.export()
+        lines = body.splitlines()
+        self.assertTrue(body.startswith('\ufeffid,title,amount,type,date,category'))
+        self.assertEqual(len(lines), 32)
+        self.assertIn(',Food', lines[1])
+        # session + user, then a single joined SELECT for the rows
+        self.assertEqual(sum('core_transaction' in q['sql'] for q in queries.captured_queries), 1)
+
+    def test_filters_by_date_range_and_type(self):
+        response, body = self.export(date_from='1403/5/1', date_to='1403/05/31', type='EXPENSE')
+        rows = body.splitlines()[1:]
+        self.assertTrue(rows)
+        self.assertTrue(all(',EXPENSE,1403/05/' in row for row in rows))
+
+    def test_round_trips_through_the_importer(self):
+        response, body = self.export()
+        other = User.objects.create_user('sara', password='pass12345')
+        report = importer.import_csv(other, [body.encode('utf-8')])
+        self.assertEqual((report.created, report.failed), (31, 0))
+        self.assertEqual(ledger.totals(other), ledger.totals(self.user))
+
+    def test_bad_filter_redirects_with_message(self):
+        response = self.client.get(reverse('export_transactions'), {'date_from': 'دیروز'})
+        self.assertRedirects(response, reverse('transactions'))
+
+
+@override_settings(BACKGROUND_EAGER=True, IMPORT_BATCH_SIZE=2)
+class ImportJobTests(TestCase):
+    CSV = (
+        'title,amount,type,date,category\n'
+        'a,100,EXPENSE,1403/10/01,\n'
+        'b,200,EXPENSE,1403/10/02,\n'
+        'c,oops,EXPENSE,1403/10/03,\n'
+        'd,400,INCOME,1403/10/04,\n'
+        'e,500,EXPENSE,1403/10/05,\n'
+    )
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        media_settings = override_settings(MEDIA_ROOT=media)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.user = User.objects.create_user('reza', password='pass12345')
+        self.client.force_login(self.user)
+
+    def upload(self):
+        return SimpleUploadedFile('bank.csv', self.CSV.encode('utf-8'), content_type='text/csv')
+
+    def test_upload_is_imported_in_the_background(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('import_transactions'), {'csv_file': self.upload()})
+        job = ImportJob.objects.get()
+        self.assertEqual(
+            (job.status, job.total_rows, job.rows_done, job.rows_created, job.rows_failed),
+            (ImportJob.DONE, 5, 5, 4, 1),
+        )
+        self.assertEqual(job.errors, [[4, "مبلغ نامعتبر: 'oops'"]])
+        status = self.client.get(reverse('import_status', args=[job.pk])).json()
+        self.assertEqual((status['percent'], status['finished']), (100, True))
+
+    def test_interrupted_job_resumes_after_last_committed_batch(self):
+        job = ImportJob.objects.create(user=self.user, file=self.upload(), name='bank.csv')
+        # First batch (a, b) committed, then the worker died
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, title=t, amount=a, type='EXPENSE', date='1403/10/01')
+            for t, a in (('a', 100), ('b', 200))
+        ])
+        ImportJob.objects.filter(pk=job.pk).update(
+            status=ImportJob.RUNNING, claim='dead', rows_done=2, rows_created=2,
+            updated_at=timezone.now() - import_jobs.STALE_AFTER * 2,
+        )
+        self.client.get(reverse('import_status', args=[job.pk]))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_done, job.rows_created), (ImportJob.DONE, 5, 4))
+        self.assertEqual(
+            sorted(Transaction.objects.values_list('title', flat=True)), ['a', 'b', 'd', 'e'],
+        )
+
+    def test_live_job_is_not_taken_over(self):
+        job = ImportJob.objects.create(user=self.user, file=self.upload(), name='bank.csv',
+                                       status=ImportJob.RUNNING, claim='alive')
+        import_jobs.run(job.pk)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_batch_is_rolled_back_when_claim_is_lost(self):
+        job = import_jobs.claim(ImportJob.objects.create(user=self.user, file=self.upload(), name='bank.csv').pk)
+        ImportJob.objects.filter(pk=job.pk).update(claim='other')
+        batch = next(importer.batches(self.user, [self.CSV.encode('utf-8')]))
+        with self.assertRaises(import_jobs.LostClaim):
+            import_jobs._record(job, batch)
+        self.assertFalse(Transaction.objects.exists())
+
+
+class JalaliTests(TestCase):
+    def test_known_dates(self):
+        self.assertEqual(jalali.to_gregorian('1403/01/01'), dt.date(2024, 3, 20))
+        self.assertEqual(jalali.to_gregorian('۱۴۰۳/۱۲/۳۰'), dt.date(2025, 3, 20))
+        self.assertEqual(jalali.from_gregorian(dt.date(2025, 3, 21)), '1404/01/01')
+        self.assertEqual(jalali.from_gregorian(dt.date(2021, 3, 20)), '1399/12/30')
+        self.assertEqual([jalali.is_leap(y) for y in (1399, 1402, 1403, 1404, 1408)], [True, False, True, False, True])
+
+    def test_invalid_dates(self):
+        for value in ('', '1403/1/01', '1403/07/31', '1404/12/30', '1403/13/01', '1403/10/011', 'x'):
+            self.assertIsNone(jalali.to_ordinal(value), value)
+
+    def test_whole_table_round_trips(self):
+        ordinals = list(range(jalali.ORDINAL_MIN, jalali.ORDINAL_MAX + 1))
+        self.assertEqual(jalali.parse_many(jalali.format_many(ordinals)).tolist(), ordinals)
+
+    def test_ranges(self):
+        first, last = jalali.month_range(1403, 12)
+        self.assertEqual((jalali.format_ordinal(first), jalali.format_ordinal(last)), ('1403/12/01', '1403/12/30'))
+        start, end = jalali.week_range(jalali.to_ordinal('1403/10/05'))
+        self.assertEqual(dt.date.fromordinal(start).strftime('%A'), 'Saturday')
+        self.assertTrue(start <= jalali.to_ordinal('1403/10/05') <= end)
+
+
+class DayOrdinalTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reza', password='pass12345')
+
+    def test_kept_in_step_with_date(self):
+        tx = Transaction.objects.create(user=self.user, title='a', amount=1, type='EXPENSE', date='1403/10/01')
+        self.assertEqual(tx.day_ordinal, jalali.to_ordinal('1403/10/01'))
+        tx.date = '1403/10/02'
+        tx.save(update_fields=['date'])
+        Transaction.objects.bulk_create([Transaction(user=self.user, title='b', amount=1, type='EXPENSE', date='bad')])
+        Transaction.objects.filter(title='b').update(date='1403/11/01')
+        self.assertEqual(
+            dict(Transaction.objects.values_list('title', 'day_ordinal')),
+            {'a': jalali.to_ordinal('1403/10/02'), 'b': jalali.to_ordinal('1403/11/01')},
+        )
+        first, last = jalali.month_range(1403, 10)
+        self.assertEqual(list(Transaction.objects.between(first, last).values_list('title', flat=True)), ['a'])
+
+    def test_forms_store_canonical_dates(self):
+        food = Category.objects.create(name='Food', name_fa='خوراکی', is_default=True)
+        form = TransactionForm({'title': 'a', 'amount': 1, 'type': 'EXPENSE', 'category': food.pk, 'date': '1403-7-5'})
+        self.assertTrue(form.is_valid(), form.errors)
+        tx = form.save(commit=False)
+        tx.user = self.user
+        tx.save()
+        self.assertEqual((tx.date, tx.day_ordinal), ('1403/07/05', jalali.to_ordinal('1403/07/05')))
+
+        form = GoalForm({'title': 'g', 'target_amount': 100, 'deadline': '1403/12/1'})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['deadline'], '1403/12/01')
+        form = TransactionForm({'title': 'a', 'amount': 1, 'type': 'EXPENSE', 'category': food.pk, 'date': '1403/13/01'})
+        self.assertEqual(list(form.errors), ['date'])
+
+
+class QueryPlanTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reza', password='pass12345')
+
+    def test_hot_queries_use_composite_indexes(self):
+        transactions = Transaction.objects.filter(user=self.user)
+        first, last = jalali.month_range(1403, 10)
+        self.assertIn('core_tx_user_created', transactions[:10].explain())
+        self.assertIn('core_tx_user_type_day', transactions.filter(type='EXPENSE').between(first, last).explain())
+
+
+class TransactionListTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reza', password='pass12345')
+        self.client.force_login(self.user)
+        self.food = Category.objects.create(name='Food', name_fa='غذا', is_default=True)
+        self.bread = Category.objects.create(name='Bread', name_fa='نان', parent=self.food, user=self.user)
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, title=f't{i}', amount=(i + 1) * 1000, type='EXPENSE',
+                        date=f'1403/{i % 12 + 1:02d}/01', category=self.bread if i % 3 == 0 else None)
+            for i in range(70)
+        ])
+
+    def pages(self, **params):
+        url = reverse('transactions') + '?' + '&'.join(f'{k}={v}' for k, v in {**params, 'format': 'json'}.items())
+        titles = []
+        while url:
+            data = self.client.get(url).json()
+            titles.extend(row['title'] for row in data['results'])
+            url = data['next'] and reverse('transactions') + data['next']
+        return titles
+
+    def test_json_pages_cover_every_row_once_in_order(self):
+        titles = self.pages()
+        self.assertEqual(titles, [f't{i}' for i in reversed(range(70))])
+        self.assertEqual(self.pages(sort='oldest'), list(reversed(titles)))
+
+    def test_filters(self):
+        self.assertEqual(len(self.pages(category=self.food.id)), 24)  # includes the subcategory
+        self.assertEqual(self.pages(min_amount=5000, max_amount=6000), ['t5', 't4'])
+        self.assertEqual(len(self.pages(date_from='1403/02/01', date_to='1403/02/31')), 6)
+
+    def test_deep_pages_cost_the_same(self):
+        first = self.client.get(reverse('transactions'), {'format': 'json'}).json()
+        with CaptureQueriesContext(connection) as shallow:
+            self.client.get(reverse('transactions'), {'format': 'json'})
+        deep_cursor = first['next'].split('cursor=')[1].split('&')[0]
+        with CaptureQueriesContext(connection) as deep:
+            self.client.get(reverse('transactions'), {'format': 'json', 'cursor': deep_cursor})
+        self.assertEqual(len(shallow), len(deep))
+
+    def test_html_page_and_bad_cursor(self):
+        response = self.client.get(reverse('transactions'))
+        self.assertEqual(len(response.context['transactions']), 30)
+        self.assertContains(response, 'id="loadMore"')
+        self.assertEqual(self.client.get(reverse('transactions'), {'format': 'json', 'cursor': '!!'}).status_code, 400)
+        # An old bookmark of the page itself falls back to the first page
+        response = self.client.get(reverse('transactions'), {'cursor': '!!'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['transactions'][0].title, 't69')
+
+
+class BudgetTests(TestCase):
+    """Budgets count only the spending of their own Jalali month or week"""
+
+    TODAY = dt.date(2024, 10, 2)  # Wednesday 1403/07/11; its week is 1403/07/07..1403/07/13
+
+    def setUp(self):
+        self.user = User.objects.create_user('sara', password='pass12345')
+        self.food = Category.objects.create(name='Food', is_default=True)
+        self.fun = Category.objects.create(name='Fun', is_default=True)
+        for date, amount, category in [
+            ('1403/06/31', 1000, self.food),  # last month
+            ('1403/07/01', 200, self.food),
+            ('1403/07/10', 300, self.food),
+            ('1403/07/06', 40, self.fun),  # Friday of last week
+            ('1403/07/07', 50, self.fun),
+            ('1403/07/13', 60, self.fun),
+            ('1403/08/01', 7000, self.fun),  # next month
+        ]:
+            Transaction.objects.create(
+                user=self.user, title='t', amount=amount, date=date, category=category, type=Transaction.EXPENSE,
+            )
+        Transaction.objects.create(
+            user=self.user, title='salary', amount=9000, date='1403/07/10',
+            category=self.food, type=Transaction.INCOME,
+        )
+        other = User.objects.create_user('ali')
+        Transaction.objects.create(
+            user=other, title='t', amount=5000, date='1403/07/10', category=self.food, type=Transaction.EXPENSE,
+        )
+
+    def evaluate(self):
+        rows = budgets.evaluate(self.user, [self.food, self.fun], today=self.TODAY)
+        return {row['category']: row for row in rows}
+
+    def test_monthly_and_weekly_periods(self):
+        Budget.objects.create(user=self.user, category=self.food, limit=1000, period=Budget.MONTHLY)
+        Budget.objects.create(user=self.user, category=self.fun, limit=100, period=Budget.WEEKLY)
+        rows = self.evaluate()
+        self.assertEqual(rows[self.food]['spent'], 500)
+        self.assertEqual(rows[self.food]['percent'], 50)
+        self.assertEqual(rows[self.food]['period_label'], 'مهر 1403')
+        self.assertEqual(rows[self.fun]['spent'], 110)
+        self.assertTrue(rows[self.fun]['over_budget'])
+        self.assertEqual(rows[self.fun]['period_label'], '1403/07/07 تا 1403/07/13')
+
+    def test_category_without_budget(self):
+        rows = self.evaluate()
+        self.assertIsNone(rows[self.fun]['budget'])
+        self.assertEqual(rows[self.fun]['spent'], 150)
+        self.assertEqual(rows[self.fun]['percent'], 0)
+
+    def test_two_queries_for_any_number_of_categories(self):
+        categories = [Category.objects.create(name=f'c{i}', is_default=True) for i in range(20)]
+        Budget.objects.bulk_create(Budget(user=self.user, category=c, limit=100) for c in categories)
+        with self.assertNumQueries(2):
+            budgets.evaluate(self.user, categories, today=self.TODAY)
+
+    def test_save_budget_period(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('save_budget'), {'category_id': self.fun.id, 'limit': '500', 'period': 'WEEKLY'})
+        self.assertEqual(Budget.objects.get(user=self.user, category=self.fun).period, Budget.WEEKLY)
+        self.client.post(reverse('save_budget'), {'category_id': self.fun.id, 'limit': '500', 'period': 'DAILY'})
+        self.assertEqual(Budget.objects.get(user=self.user, category=self.fun).period, Budget.WEEKLY)
+
+
+class ForecastTests(TestCase):
+    TODAY = dt.date(2025, 3, 10)  # 1403/12/20, the last month of seed()
+
+    def setUp(self):
+        self.user = User.objects.create_user('sara', password='pass12345')
+
+    def seed(self):
+        """Two years (1402-1403): salary 1000 a month, spending 500 except 1100 every Esfand"""
+        transactions = []
+        for year in (1402, 1403):
+            for month in range(1, 13):
+                transactions.append(Transaction(
+                    user=self.user, title='salary', amount=1000, type=Transaction.INCOME, date=f'{year}/{month:02d}/01',
+                ))
+                transactions.append(Transaction(
+                    user=self.user, title='rent', amount=1100 if month == 12 else 500,
+                    type=Transaction.EXPENSE, date=f'{year}/{month:02d}/15',
+                ))
+        transactions.append(Transaction(user=self.user, title='cash', amount=300, type=Transaction.INCOME, date='?'))
+        Transaction.objects.bulk_create(transactions)
+
+    def test_rolling_mean(self):
+        self.assertEqual(forecast.rolling_mean(np.array([3.0, 6, 9, 12]), 3).tolist(), [3, 4.5, 6, 9])
+
+    def test_history_seasonality_and_projection(self):
+        self.seed()
+        with self.assertNumQueries(1):
+            data = forecast.build(self.user, today=self.TODAY)
+
+        history = data['history']
+        self.assertEqual(history['months'][0], '1402/01')
+        self.assertEqual(history['months'][-1], '1403/12')
+        self.assertEqual(history['net'][:2], [500, 500])
+        self.assertEqual(history['net'][-1], -100)
+        self.assertEqual(history['net_avg_3'][-1], 300)
+        self.assertEqual(history['net_avg_12'][-1], 450)
+        self.assertEqual(history['balance'][-1], 24 * 1000 - 22 * 500 - 2 * 1100 + 300)  # undated income included
+
+        expense_profile = data['seasonality']['expense']
+        self.assertEqual(data['seasonality']['income'], [1.0] * 12)
+        self.assertEqual(expense_profile[0], 0.909)  # 500 of an average 550
+        self.assertEqual(expense_profile[11], 2.0)  # 1100 of 550
+
+        projection = data['projection']
+        self.assertEqual(projection['months'][0], '1404/01')
+        self.assertEqual(len(projection['months']), forecast.HORIZON)
+        self.assertEqual(projection['expense'][0], 500)
+        self.assertEqual(projection['expense'][11], 1100)
+        self.assertEqual(projection['balance'][-1], history['balance'][-1] + 12 * 1000 - 11 * 500 - 1100)
+
+    def test_no_history(self):
+        self.assertIsNone(forecast.build(self.user)['projection'])
+
+    def test_projection_starts_after_the_current_month(self):
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, title='salary', amount=1100, type=Transaction.INCOME, date=f'1403/{month:02d}/01')
+            for month in range(1, 7)
+        ] + [
+            # Scheduled for later: not part of the history and does not move the window
+            Transaction(user=self.user, title='rent', amount=5000, type=Transaction.EXPENSE, date='1404/05/01'),
+        ])
+        data = forecast.build(self.user, today=dt.date(2025, 1, 25))  # 1403/11/06
+
+        history = data['history']
+        self.assertEqual(history['months'][-1], '1403/11')
+        self.assertEqual(history['income'][-5:], [0] * 5)
+        self.assertEqual(history['balance'][-1], 6600)
+        projection = data['projection']
+        self.assertEqual(projection['months'][:2], ['1403/12', '1404/01'])
+        self.assertEqual(projection['income'][0], 600)  # the empty months count toward the average
+        self.assertEqual(projection['expense'][0], 0)
+
+    def test_view(self):
+        self.seed()
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('forecast_data'))
+        self.assertEqual(response.json()['projection']['months'][0], forecast.month_label(forecast.current_month() + 1))
+        self.assertFalse(response.has_header('Last-Modified'))
+        # The same ledger forecasts differently once the month turns
+        with mock.patch('core.services.forecast.current_month', return_value=forecast.current_month() + 1):
+            later = self.client.get(reverse('forecast_data'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(later.status_code, 200)
+
+
+class FinancialContextTests(TestCase):
+    TODAY = dt.date(2024, 10, 2)  # 1403/07/11
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('sara', password='pass12345')
+        self.food = Category.objects.create(name='Groceries', name_fa='خوراک', user=self.user)
+        self.rent = Category.objects.create(name='Rent', name_fa='اجاره', user=self.user)
+
+        def tx(title, amount, date, category=None, tx_type=Transaction.EXPENSE):
+            return Transaction(user=self.user, title=title, amount=amount, date=date, category=category, type=tx_type)
+
+        Transaction.objects.bulk_create([
+            tx('salary', 5000, '1403/05/01', tx_type=Transaction.INCOME),
+            tx('salary', 5000, '1403/07/01', tx_type=Transaction.INCOME),
+            tx('old', 999, '1402/01/01'),
+            tx('shop', 300, '1403/06/10', self.food),
+            tx('shop', 200, '1403/07/05', self.food),
+            tx('landlord', 2000, '1403/07/02', self.rent),
+            tx('cafe', 50, '1403/07/03'),
+        ])
+
+    def test_snapshot(self):
+        with self.assertNumQueries(3):
+            data = financial_context.snapshot(self.user, today=self.TODAY)
+        self.assertEqual((data['count'], data['income'], data['expense']), (7, 10000, 3549))
+        self.assertEqual(data['month'], '1403/07')
+        self.assertEqual(data['categories'], [('اجاره', 2000), ('خوراک', 200), (financial_context.OTHER, 50)])
+        self.assertEqual(data['trend'], [('1403/05', 5000, 0), ('1403/06', 0, 300), ('1403/07', 5000, 2250)])
+        self.assertEqual(data['merchants'][:2], [('landlord', 2000, 1), ('shop', 500, 2)])
+        self.assertNotIn('old', [title for title, _, _ in data['merchants']])
+
+    def test_unpadded_dates_are_left_out_of_the_trend(self):
+        Transaction.objects.create(user=self.user, title='odd', amount=70, date='1402/9/10', type=Transaction.EXPENSE)
+        data = financial_context.snapshot(self.user, today=dt.date(2024, 4, 3))  # 1403/01/15
+        self.assertEqual([month for month, _, _ in data['trend']], ['1402/11', '1402/12', '1403/01'])
+
+    def test_render_keeps_to_the_budget(self):
+        data = financial_context.snapshot(self.user, today=self.TODAY)
+        full = financial_context.render(data, max_tokens=1000)
+        self.assertIn('landlord', full)
+        self.assertIn('اجاره: 2,000', full)
+
+        short = financial_context.render(data, max_tokens=40)
+        self.assertLessEqual(financial_context.estimate_tokens(short), 40)
+        self.assertTrue(short.startswith('تعداد تراکنش‌ها: 7'))
+        self.assertNotIn('landlord', short)
+
+    def test_cached_until_the_ledger_changes(self):
+        first = financial_context.for_user(self.user, today=self.TODAY)
+        with self.assertNumQueries(1):  # the ledger version
+            self.assertEqual(financial_context.for_user(self.user, today=self.TODAY), first)
+
+        Transaction.objects.create(user=self.user, title='gift', amount=700, date='1403/07/06', type=Transaction.EXPENSE)
+        self.assertIn('gift', financial_context.for_user(self.user, today=self.TODAY))
+
+    def test_prompts_share_the_context(self):
+        self.client.force_login(self.user)
+        expected = financial_context.for_user(self.user)
+        with mock.patch('core.views.get_financial_advice', return_value='پاسخ') as advice:
+            self.client.post(reverse('advisor_ask'), json.dumps({'query': 'چه کنم؟'}), content_type='application/json')
+        self.assertEqual(advice.call_args.args, ('چه کنم؟', expected))
+
+        with mock.patch('core.services.spending_analysis.analyze_spending', return_value='تحلیل') as analyze, \
+                override_settings(BACKGROUND_EAGER=True):
+            self.client.get(reverse('dashboard_analysis'))
+        analyze.assert_called_once_with(expected)
+
+
+class GoalPlanTests(TestCase):
+    TODAY = dt.date(2024, 10, 2)  # 1403/07/11
+
+    def setUp(self):
+        self.user = User.objects.create_user('sara', password='pass12345')
+        transactions = []
+        for month in (4, 5, 6):  # saves 300 a month
+            transactions.append(Transaction(user=self.user, title='in', amount=1000, type=Transaction.INCOME, date=f'1403/{month:02d}/01'))
+            transactions.append(Transaction(user=self.user, title='out', amount=700, type=Transaction.EXPENSE, date=f'1403/{month:02d}/20'))
+        # The current month is incomplete and does not count
+        transactions.append(Transaction(user=self.user, title='out', amount=5000, type=Transaction.EXPENSE, date='1403/07/01'))
+        Transaction.objects.bulk_create(transactions)
+
+    def goal(self, target, current, deadline):
+        return Goal.objects.create(user=self.user, title='g', target_amount=target, current_amount=current, deadline=deadline)
+
+    def test_statuses(self):
+        on_track = self.goal(1000, 100, '1403/12/29')
+        too_soon = self.goal(3000, 0, '1403/08/11')
+        overdue = self.goal(500, 0, '1403/01/01')
+        done = self.goal(500, 500, '1403/01/01')
+        goals = list(Goal.objects.filter(user=self.user).order_by('id'))
+        with self.assertNumQueries(1):
+            statuses, summary = goal_plan.plan(self.user, goals, today=self.TODAY)
+        by_goal = {status['goal']: status for status in statuses}
+
+        self.assertEqual(summary['savings_rate'], 300)
+        status = by_goal[on_track]
+        self.assertEqual(status['projected_date'], '1403/10/13')  # 900 at 300 a month: 92 days
+        self.assertTrue(status['feasible'])
+        self.assertEqual(status['required_monthly'], math.ceil(900 / (status['days_left'] / goal_plan.DAYS_PER_MONTH)))
+
+        status = by_goal[too_soon]
+        self.assertFalse(status['feasible'])
+        self.assertEqual(status['required_monthly'], 3000)  # due within a month: all of it now
+
+        self.assertTrue(by_goal[overdue]['overdue'])
+        self.assertFalse(by_goal[overdue]['feasible'])
+        self.assertTrue(by_goal[done]['feasible'])
+        self.assertEqual(by_goal[done]['required_monthly'], 0)
+
+        self.assertEqual(summary['total_required'], by_goal[on_track]['required_monthly'] + 3000)
+        self.assertFalse(summary['feasible'])
+
+    def test_no_savings(self):
+        goal = self.goal(1000, 0, '1404/12/29')
+        statuses, summary = goal_plan.plan(self.user, [goal], today=dt.date(2025, 10, 2))
+        self.assertEqual(summary['savings_rate'], 0)
+        self.assertIsNone(statuses[0]['projected_date'])
+        self.assertFalse(statuses[0]['feasible'])
+
+    def test_advice_prompt_gets_the_numbers(self):
+        goal = self.goal(1000, 100, '1403/12/29')
+        self.client.force_login(self.user)
+        with mock.patch('core.views.get_goal_advice', return_value='پیشنهاد') as advice:
+            self.assertEqual(self.client.get(reverse('goal_advice', args=[goal.pk])).json(), {'advice': 'پیشنهاد'})
+        title, remaining, deadline, facts, context = advice.call_args.args
+        self.assertEqual((remaining, deadline), (900, '1403/12/29'))
+        self.assertIn('پس‌انداز لازم در هر ماه', facts)
+
+    def test_goals_page(self):
+        self.goal(1000, 100, '1403/12/29')
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse('goals')), 'ماهانه')
+
+
+class ConditionalGetTests(TestCase):
+    """JSON and CSV endpoints revalidate against the user's ledger version"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('sara', password='pass12345')
+        self.client.force_login(self.user)
+        self.food = Category.objects.create(name='Food', name_fa='خوراکی', user=self.user)
+        self.add(100)
+
+    def add(self, amount, user=None):
+        return Transaction.objects.create(
+            user=user or self.user, title='t', amount=amount, date='1403/07/07',
+            type=Transaction.EXPENSE, category=self.food,
+        )
+
+    def get(self, url, etag=None, **params):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        response = self.client.get(url, params, **headers)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def assertRevalidates(self, url, **params):
+        """Returns the ETag once a repeat request has been answered with 304"""
+        response = self.get(url, **params)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertTrue(response.has_header('Last-Modified'))
+        etag = response['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get(url, etag, **params).status_code, 304)
+        self.assertFalse([q['sql'] for q in queries if 'core_transaction' in q['sql'] or 'core_ledgerrollup' in q['sql']])
+        return etag
+
+    def test_not_modified_until_the_ledger_changes(self):
+        for url, params in [
+            (reverse('analytics_data'), {'period': 'weekly'}),
+            (reverse('export_transactions'), {}),
+            (reverse('transactions'), {'format': 'json'}),
+        ]:
+            etag = self.assertRevalidates(url, **params)
+            self.add(50)
+            self.assertEqual(self.get(url, etag, **params).status_code, 200, url)
+
+    def test_etag_depends_on_the_query(self):
+        url = reverse('analytics_data')
+        self.assertNotEqual(self.get(url, period='daily')['ETag'], self.get(url, period='monthly')['ETag'])
+
+    def test_every_kind_of_write_changes_it(self):
+        url = reverse('export_transactions')
+        writes = [
+            lambda: self.add(1),
+            lambda: Transaction.objects.filter(user=self.user).update(title='renamed'),
+            lambda: Transaction.objects.bulk_create([Transaction(user=self.user, title='b', amount=1, date='1403/07/08')]),
+            lambda: Transaction.objects.filter(title='b').delete(),
+            lambda: Category.objects.filter(pk=self.food.pk).first().save(),
+            lambda: Budget.objects.create(user=self.user, category=self.food, limit=1000),
+            lambda: Category.objects.create(name='Gifts', is_default=True),
+        ]
+        etag = self.assertRevalidates(url)
+        for write in writes:
+            write()
+            response = self.get(url, etag)
+            self.assertEqual(response.status_code, 200)
+            etag = response['ETag']
+
+    def test_other_users_writes_do_not_change_it(self):
+        url = reverse('analytics_data')
+        etag = self.assertRevalidates(url)
+        self.add(70, user=User.objects.create_user('ali'))
+        self.assertEqual(self.get(url, etag).status_code, 304)
+
+    def test_html_pages_are_not_conditional(self):
+        self.assertFalse(self.get(reverse('transactions')).has_header('ETag'))
+
+
+class AnalyticsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('sara', password='pass12345')
+        food = Category.objects.create(name='Food', name_fa='خوراکی', is_default=True)
+        for date, amount, tx_type in [
+            ('1403/07/13', 60, Transaction.EXPENSE),  # Friday
+            ('1403/07/06', 40, Transaction.EXPENSE),  # Friday of the week before
+            ('1403/07/07', 50, Transaction.EXPENSE),  # Saturday
+            ('1403/07/07', 500, Transaction.INCOME),
+            ('1403/08/01', 70, Transaction.EXPENSE),
+            ('1402/12/29', 1000, Transaction.INCOME),
+        ]:
+            Transaction.objects.create(user=self.user, title='t', amount=amount, date=date, type=tx_type, category=food)
+
+    def totals(self, period):
+        return [(row['period'], row['income'], row['expense']) for row in analytics.period_totals(self.user, period)]
+
+    def test_daily_covers_the_last_days_up_to_the_latest_transaction(self):
+        self.assertEqual(self.totals('daily'), [
+            ('1403/07/06', 0, 40), ('1403/07/07', 500, 50), ('1403/07/13', 0, 60), ('1403/08/01', 0, 70),
+        ])
+        self.client.force_login(self.user)
+        data = self.client.get(reverse('analytics_data'), {'period': 'daily'}).json()
+        # The income of 1402 is before the window but still part of the net worth
+        self.assertEqual([point['value'] for point in data['netWorth']], [960, 1410, 1350, 1280])
+        self.assertEqual(data['totals'], {'income': 1500, 'expense': 220, 'balance': 1280})
+
+    def test_no_transactions(self):
+        self.assertEqual(analytics.period_totals(User.objects.create_user('ali'), 'weekly'), [])
+
+    def test_weeks_start_on_saturday(self):
+        self.assertEqual(self.totals('weekly'), [
+            ('1402/12/26', 1000, 0), ('1403/06/31', 0, 40), ('1403/07/07', 500, 110), ('1403/07/28', 0, 70),
+        ])
+
+    def test_monthly_and_yearly(self):
+        self.assertEqual(self.totals('monthly'), [('1402/12', 1000, 0), ('1403/07', 500, 150), ('1403/08', 0, 70)])
+        self.assertEqual(self.totals('yearly'), [('1402', 1000, 0), ('1403', 500, 220)])
+
+    def test_view(self):
+        self.client.force_login(self.user)
+        data = self.client.get(reverse('analytics_data'), {'period': 'weekly'}).json()
+        self.assertEqual(data['totals'], {'income': 1500, 'expense': 220, 'balance': 1280})
+        self.assertEqual([point['value'] for point in data['netWorth']], [1000, 960, 1350, 1280])
+        self.assertEqual(data['categories'], [{'name': 'خوراکی', 'value': 220}])
+
+
+@override_settings(BACKGROUND_EAGER=True)
+class ViewQueryCountTests(TestCase):
+    """Every page must cost a fixed number of queries however much data the user has"""
+
+    maxDiff = None
+
+    def setUp(self):
+        llm_cache.reset()
+        self.addCleanup(llm_cache.reset)
+        self.user = User.objects.create_user('sara', password='pass12345')
+        self.client.force_login(self.user)
+        self.food = Category.objects.create(name='Food', name_fa='خوراکی', is_default=True)
+        self.rounds = 0
+        for target in ('core.views.get_financial_advice', 'core.views.get_goal_advice'):
+            patcher = mock.patch(target, return_value='پاسخ')
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch('core.services.spending_analysis.analyze_spending', return_value='تحلیل')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def seed(self, n):
+        """n more transactions, plus categories (with parents), budgets and goals in proportion"""
+        self.rounds += 1
+        parents = [
+            Category.objects.create(name=f'p{self.rounds}-{i}', name_fa=f'والد {i}', user=self.user)
+            for i in range(max(n // 10, 1))
+        ]
+        children = [
+            Category.objects.create(name=f'c{self.rounds}-{i}', name_fa=f'زیر {i}', user=self.user, parent=parent)
+            for i, parent in enumerate(parents)
+        ]
+        Budget.objects.bulk_create(Budget(user=self.user, category=c, limit=1000) for c in parents + children)
+        for i in range(max(n // 10, 1)):
+            Goal.objects.create(user=self.user, title=f'g{i}', target_amount=1000, deadline='1404/01/01')
+        categories = [self.food] + children
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=self.user, title=f't{i}', amount=100 + i, date=f'1403/{i % 12 + 1:02d}/01',
+                category=categories[i % len(categories)],
+                type=Transaction.INCOME if i % 3 == 0 else Transaction.EXPENSE,
+            )
+            for i in range(n)
+        ])
+
+    def queries(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as ctx:
+            if method == 'post':
+                response = self.client.post(url, json.dumps(data or {}), content_type='application/json')
+            else:
+                response = self.client.get(url, data)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400, url)
+        return len(ctx)
+
+    def requests(self):
+        goal = Goal.objects.filter(user=self.user).order_by('id').first()
+        return [
+            ('get', reverse('dashboard'), None),
+            ('get', reverse('dashboard_analysis'), None),
+            ('get', reverse('transactions'), None),
+            ('get', reverse('transactions'), {'format': 'json', 'category': self.food.id}),
+            ('get', reverse('export_transactions'), None),
+            ('get', reverse('analytics_data'), {'period': 'daily'}),
+            ('get', reverse('analytics_data'), {'period': 'monthly'}),
+            ('get', reverse('budget'), None),
+            ('get', reverse('goals'), None),
+            ('get', reverse('categories'), None),
+            ('get', reverse('add_category'), None),
+            ('get', reverse('advisor'), None),
+            ('post', reverse('advisor_ask'), {'query': 'چه کنم؟'}),
+            ('get', reverse('goal_advice', args=[goal.pk]), None),
+        ]
+
+    def counts(self):
+        counts = {}
+        for method, url, data in self.requests():
+            self.queries(method, url, data)  # warm up: default categories, stored analysis
+            counts[(method, url, str(data))] = self.queries(method, url, data)
+        return counts
+
+    def test_query_counts_do_not_grow_with_data(self):
+        self.seed(10)
+        small = self.counts()
+        self.seed(200)
+        self.assertEqual(self.counts(), small)
 
-# Create your tests here.
@@ -5,16 +5,19 @@ from . import views
 urlpatterns = [
     # Dashboard
     path('', views.dashboard, name='dashboard'),
+    path('dashboard/analysis/', views.dashboard_analysis, name='dashboard_analysis'),
     
     # Transactions
     path('transactions/', views.transactions, name='transactions'),
     path('transactions/add/', views.add_transaction, name='add_transaction'),
     path('transactions/export/', views.export_transactions, name='export_transactions'),
     path('transactions/import/', views.import_transactions, name='import_transactions'),
+    path('transactions/import/<int:pk>/status/', views.import_status, name='import_status'),
     
     # Analytics
     path('analytics/', views.analytics, name='analytics'),
     path('api/analytics-data/', views.analytics_data, name='analytics_data'),
+    path('api/forecast/', views.forecast_data, name='forecast_data'),
     
     # Categories
     path('categories/', views.categories, name='categories'),
@@ -1,40 +1,111 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login
-from django.http import JsonResponse, HttpResponse
-from django.db.models import Sum, Q
+from django.contrib.auth.views import redirect_to_login
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.db.models import Q
 from django.contrib import messages
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
 from decimal import Decimal
-import csv
+from functools import wraps
+import hashlib
 import json
-from datetime import datetime
-
-from .models import Transaction, Category, Budget, Goal, UserProfile
-from .forms import UserRegisterForm, TransactionForm, BudgetForm, GoalForm, ProfileForm, CategoryForm
-from .services.llama_service import get_financial_advice, analyze_spending, get_goal_advice
-
-
-def get_or_create_default_categories():
-    """Create default categories if they don't exist"""
-    defaults = [
-        ('Food', 'خوراکی', 'bi-cup-hot'),
-        ('Transport', 'حمل و نقل', 'bi-car-front'),
-        ('Shopping', 'خرید', 'bi-bag'),
-        ('Housing', 'مسکن', 'bi-house'),
-        ('Salary', 'حقوق', 'bi-briefcase'),
-        ('Health', 'سلامت', 'bi-heart-pulse'),
-        ('Income', 'درآمد', 'bi-wallet2'),
-        ('Other', 'سایر', 'bi-three-dots'),
-    ]
-    
-    for name, name_fa, icon in defaults:
-        Category.objects.get_or_create(
-            name=name, 
-            is_default=True,
-            defaults={'name_fa': name_fa, 'icon': icon}
-        )
-    
-    return Category.objects.filter(is_default=True)
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+
+from .models import Category, Budget, Goal, UserProfile, ImportJob
+from .forms import (
+    UserRegisterForm, TransactionForm, GoalForm, CategoryForm, TransactionFilterForm,
+)
+from .services.ai_backends import (
+    Unavailable, get_financial_advice, aget_financial_advice, stream_financial_advice, get_goal_advice, aget_goal_advice,
+)
+from .services import ai_fallback, budgets, category_tree, exporter, financial_context, forecast, goal_plan, import_jobs, ledger, transaction_list
+from .services.analytics import chart_data
+from .services.dashboard import build_dashboard
+from .services.spending_analysis import get_analysis, aget_analysis
+
+
+IMPORT_JOBS_SHOWN_FOR = timedelta(minutes=10)  # finished imports stay on the transactions page this long
+
+
+def async_login_required(view):
+    """login_required for async views (Django's decorator only wraps sync views)"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        # Resolving request.user reads the session and user tables
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if not is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def _ledger_version(request):
+    """(version, changed_at) of the user's ledger, read once per request"""
+    if not hasattr(request, '_ledger_version'):
+        request._ledger_version = ledger.version(request.user)
+    return request._ledger_version
+
+
+def _ledger_etag(request, *args, **kwargs):
+    state = _ledger_version(request)
+    if state is None:
+        return None
+    raw = f'{request.user.pk}:{state[0]}:{request.get_full_path()}:{getattr(request, "_ledger_vary", "")}'
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+
+def _ledger_last_modified(request, *args, **kwargs):
+    state = _ledger_version(request)
+    return state[1] if state else None
+
+
+def ledger_conditional(applies=None, vary=None):
+    """
+    Conditional GET keyed on the user's ledger version: a repeat request with
+    If-None-Match / If-Modified-Since gets a 304 before the view does any work.
+    applies(request) limits it to some variants of a view (e.g. its JSON).
+    vary(request) is anything else the response depends on; it goes into the
+    ETag, and the ledger's Last-Modified is no longer a valid validator then.
+    """
+    def decorator(view):
+        conditional_view = condition(
+            etag_func=_ledger_etag, last_modified_func=_ledger_last_modified if vary is None else None,
+        )(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if applies is not None and not applies(request):
+                return view(request, *args, **kwargs)
+            if vary is not None:
+                request._ledger_vary = vary(request)
+            response = conditional_view(request, *args, **kwargs)
+            # Per user, and always revalidated
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def is_json_request(request):
+    return request.GET.get('format') == 'json'
+
+
+async def ask_model(request, async_func, sync_func, *args):
+    """
+    Await an AI service call. Under ASGI it uses the async client on the
+    server's event loop; under WSGI every request gets a throwaway loop, so
+    the pooled blocking client runs in a worker thread instead.
+    """
+    if isinstance(request, ASGIRequest):
+        return await async_func(*args)
+    return await sync_to_async(sync_func, thread_sensitive=False)(*args)
 
 
 def register(request):
@@ -58,79 +129,104 @@ def register(request):
 @login_required
 def dashboard(request):
     """Main dashboard view"""
-    get_or_create_default_categories()
-    
-    transactions = Transaction.objects.filter(user=request.user)
-    
-    # Calculate totals
-    total_income = transactions.filter(type=Transaction.INCOME).aggregate(Sum('amount'))['amount__sum'] or 0
-    total_expense = transactions.filter(type=Transaction.EXPENSE).aggregate(Sum('amount'))['amount__sum'] or 0
-    balance = total_income - total_expense
+    data = build_dashboard(request.user)
     
-    # Recent transactions
-    recent_transactions = transactions[:5]
-    
-    # AI Analysis
-    analysis = "در حال تحلیل..."
-    if transactions.exists():
-        tx_text = ', '.join([f"{t.title}: {t.amount}" for t in transactions[:5]])
-        analysis = analyze_spending(tx_text)
-    else:
-        analysis = "هنوز تراکنشی ثبت نشده است."
+    # AI Analysis (computed in the background, polled by the page)
+    analysis, analysis_ready = get_analysis(request.user)
     
     # Targeted Ad based on top spending category
     targeted_ad = None
-    expenses = transactions.filter(type=Transaction.EXPENSE)
-    if expenses.exists():
-        category_totals = {}
-        for t in expenses:
-            cat_name = t.category.name if t.category else 'Other'
-            category_totals[cat_name] = category_totals.get(cat_name, 0) + float(t.amount)
-        
-        if category_totals:
-            top_category = max(category_totals, key=category_totals.get)
-            ads = {
-                'Food': {'title': 'تخفیف ویژه سفارش غذا', 'desc': 'چون اهل دل هستی! ۳۰٪ تخفیف روی سفارش بعدی.', 'icon': '🍔', 'gradient': 'from-orange-400 to-red-500'},
-                'Transport': {'title': 'بیمه بدنه خودرو', 'desc': 'هزینه‌های ماشینت زیاده؟ با بیمه خیال خودت رو راحت کن.', 'icon': '🚗', 'gradient': 'from-blue-400 to-indigo-600'},
-                'Shopping': {'title': 'حراج فصل دیجی‌کالا', 'desc': 'لباس‌های جدید با ۵۰٪ تخفیف!', 'icon': '🛍️', 'gradient': 'from-pink-400 to-rose-600'},
-                'Housing': {'title': 'وام تعمیرات مسکن', 'desc': 'با سود ۴٪ برای تعمیرات خانه وام بگیر.', 'icon': '🏠', 'gradient': 'from-emerald-400 to-teal-600'},
-                'Health': {'title': 'بیمه تکمیلی سلامت', 'desc': 'هزینه‌های درمان بالاست. بیمه تکمیلی رو جدی بگیر.', 'icon': '💊', 'gradient': 'from-cyan-400 to-blue-500'},
-            }
-            targeted_ad = ads.get(top_category, {'title': 'سرمایه‌گذاری در بورس', 'desc': 'پول‌هات رو بیکار نذار!', 'icon': '📈', 'gradient': 'from-violet-400 to-purple-600'})
-    
-    # Chart data
-    chart_data = []
-    running_balance = 0
-    for t in transactions.order_by('created_at'):
-        if t.type == Transaction.INCOME:
-            running_balance += float(t.amount)
-        else:
-            running_balance -= float(t.amount)
-        chart_data.append(running_balance)
+    if data['top_category']:
+        ads = {
+            'Food': {'title': 'تخفیف ویژه سفارش غذا', 'desc': 'چون اهل دل هستی! ۳۰٪ تخفیف روی سفارش بعدی.', 'icon': '🍔', 'gradient': 'from-orange-400 to-red-500'},
+            'Transport': {'title': 'بیمه بدنه خودرو', 'desc': 'هزینه‌های ماشینت زیاده؟ با بیمه خیال خودت رو راحت کن.', 'icon': '🚗', 'gradient': 'from-blue-400 to-indigo-600'},
+            'Shopping': {'title': 'حراج فصل دیجی‌کالا', 'desc': 'لباس‌های جدید با ۵۰٪ تخفیف!', 'icon': '🛍️', 'gradient': 'from-pink-400 to-rose-600'},
+            'Housing': {'title': 'وام تعمیرات مسکن', 'desc': 'با سود ۴٪ برای تعمیرات خانه وام بگیر.', 'icon': '🏠', 'gradient': 'from-emerald-400 to-teal-600'},
+            'Health': {'title': 'بیمه تکمیلی سلامت', 'desc': 'هزینه‌های درمان بالاست. بیمه تکمیلی رو جدی بگیر.', 'icon': '💊', 'gradient': 'from-cyan-400 to-blue-500'},
+        }
+        targeted_ad = ads.get(data['top_category'], {'title': 'سرمایه‌گذاری در بورس', 'desc': 'پول‌هات رو بیکار نذار!', 'icon': '📈', 'gradient': 'from-violet-400 to-purple-600'})
     
     context = {
-        'balance': balance,
-        'total_income': total_income,
-        'total_expense': total_expense,
-        'recent_transactions': recent_transactions,
+        'balance': data['balance'],
+        'total_income': data['total_income'],
+        'total_expense': data['total_expense'],
+        'recent_transactions': data['recent_transactions'],
         'analysis': analysis,
+        'analysis_ready': analysis_ready,
         'targeted_ad': targeted_ad,
-        'chart_data': json.dumps(chart_data[-10:] if chart_data else []),
-        'categories': Category.objects.filter(Q(is_default=True) | Q(user=request.user)),
+        'chart_data': json.dumps(data['chart_data']),
+        'categories': category_tree.get(request.user).categories,
     }
     
     return render(request, 'core/dashboard.html', context)
 
 
+@async_login_required
+async def dashboard_analysis(request):
+    """API endpoint polled by the dashboard for the AI spending analysis"""
+    if isinstance(request, ASGIRequest):
+        analysis, ready = await aget_analysis(request.user)
+    else:
+        analysis, ready = await sync_to_async(get_analysis)(request.user)
+    return JsonResponse({'analysis': analysis, 'ready': ready})
+
+
 @login_required
+@ledger_conditional(applies=is_json_request)
 def transactions(request):
-    """Transactions list view"""
-    transactions = Transaction.objects.filter(user=request.user)
-    categories = Category.objects.filter(Q(is_default=True) | Q(user=request.user))
+    """Transactions list view: filtered, one keyset page at a time (?format=json for infinite scroll)"""
+    form = TransactionFilterForm(request.user, request.GET)
+    wants_json = request.GET.get('format') == 'json'
+    
+    if form.is_valid():
+        filters = form.cleaned_data
+    else:
+        if wants_json:
+            return JsonResponse({'errors': form.errors}, status=400)
+        filters = {}
+    
+    transactions_qs = transaction_list.filtered(request.user, filters)
+    newest_first = filters.get('sort') != 'oldest'
+    try:
+        page, next_cursor = transaction_list.page(
+            transactions_qs,
+            cursor=request.GET.get('cursor'),
+            newest_first=newest_first,
+        )
+    except ValueError:
+        if wants_json:
+            return JsonResponse({'errors': {'cursor': ['نامعتبر']}}, status=400)
+        # A stale bookmark or edited link: show the first page
+        page, next_cursor = transaction_list.page(transactions_qs, newest_first=newest_first)
+    
+    # Query string of the current filters, for the next page and the export link
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    params.pop('format', None)
+    next_params = params.copy()
+    if next_cursor:
+        next_params['cursor'] = next_cursor
+    
+    if wants_json:
+        return JsonResponse({
+            'results': [transaction_list.as_json(t) for t in page],
+            'html': render_to_string('core/transaction_rows.html', {'transactions': page}, request),
+            'next': f'?{next_params.urlencode()}&format=json' if next_cursor else None,
+        })
+    
+    jobs = list(ImportJob.objects.filter(
+        Q(status__in=[ImportJob.PENDING, ImportJob.RUNNING]) | Q(updated_at__gte=timezone.now() - IMPORT_JOBS_SHOWN_FOR),
+        user=request.user,
+    ))
+    import_jobs.resume_stale(jobs)
     
     context = {
-        'transactions': transactions,
-        'categories': categories,
+        'transactions': page,
+        'filter_form': form,
+        'filtered': any(filters.get(name) not in (None, '') for name in form.fields if name != 'sort'),
+        'query': params.urlencode(),
+        'next_query': next_params.urlencode() if next_cursor else '',
+        'import_jobs': jobs,
     }
     return render(request, 'core/transactions.html', context)
 
@@ -157,57 +253,40 @@ def add_transaction(request):
 
 
 @login_required
+@ledger_conditional()
 def export_transactions(request):
-    """Export transactions as CSV"""
-    response = HttpResponse(content_type='text/csv; charset=utf-8-sig')
+    """Export transactions as CSV, with the same filters as the transaction list"""
+    form = TransactionFilterForm(request.user, request.GET)
+    if not form.is_valid():
+        errors = ' '.join(message for messages_ in form.errors.values() for message in messages_)
+        messages.error(request, f'خطا در فیلتر خروجی: {errors}')
+        return redirect('transactions')
+    
+    transactions = transaction_list.filtered(request.user, form.cleaned_data)
+    response = StreamingHttpResponse(exporter.csv_rows(transactions), content_type='text/csv; charset=utf-8')
     response['Content-Disposition'] = 'attachment; filename="kifpool-transactions.csv"'
-    
-    # Add BOM for Excel compatibility
-    response.write('\ufeff')
-    
-    writer = csv.writer(response)
-    writer.writerow(['id', 'title', 'amount', 'type', 'date', 'category'])
-    
-    transactions = Transaction.objects.filter(user=request.user)
-    for t in transactions:
-        writer.writerow([t.id, t.title, t.amount, t.type, t.date, t.category.name if t.category else 'Other'])
-    
     return response
 
 
 @login_required
 def import_transactions(request):
-    """Import transactions from CSV"""
+    """Queue a CSV upload for import in the background"""
     if request.method == 'POST' and request.FILES.get('csv_file'):
-        csv_file = request.FILES['csv_file']
-        
-        try:
-            decoded_file = csv_file.read().decode('utf-8-sig').splitlines()
-            reader = csv.DictReader(decoded_file)
-            
-            count = 0
-            for row in reader:
-                category = Category.objects.filter(name=row.get('category', 'Other')).first()
-                if not category:
-                    category = Category.objects.get(name='Other')
-                
-                Transaction.objects.create(
-                    user=request.user,
-                    title=row.get('title', 'Imported'),
-                    amount=Decimal(row.get('amount', 0)),
-                    type=row.get('type', Transaction.EXPENSE),
-                    date=row.get('date', ''),
-                    category=category
-                )
-                count += 1
-            
-            messages.success(request, f'{count} تراکنش با موفقیت وارد شد.')
-        except Exception as e:
-            messages.error(request, f'خطا در خواندن فایل: {str(e)}')
+        job = import_jobs.start(request.user, request.FILES['csv_file'])
+        messages.info(request, f'فایل «{job.name}» در صف ورود قرار گرفت.')
     
     return redirect('transactions')
 
 
+@login_required
+def import_status(request, pk):
+    """Progress of an import job as JSON (polled by the transactions page)"""
+    job = get_object_or_404(ImportJob, pk=pk, user=request.user)
+    import_jobs.resume_stale([job])
+    job.refresh_from_db()
+    return JsonResponse(import_jobs.status(job))
+
+
 @login_required
 def analytics(request):
     """Analytics view with charts"""
@@ -215,95 +294,28 @@ def analytics(request):
 
 
 @login_required
+@ledger_conditional()
 def analytics_data(request):
     """API endpoint for chart data with period filtering"""
     period = request.GET.get('period', 'monthly')  # daily, weekly, monthly, yearly
-    transactions = Transaction.objects.filter(user=request.user)
-    
-    # Group by period
-    period_data = {}
-    for t in transactions:
-        if not t.date:
-            key = 'Unknown'
-        elif period == 'daily':
-            key = t.date  # Full date
-        elif period == 'weekly':
-            # Group by week (first 7 chars + week indicator)
-            key = t.date[:7] + '-W'  # Simplified week grouping
-        elif period == 'yearly':
-            key = t.date[:4] if len(t.date) >= 4 else 'Unknown'  # Just year
-        else:  # monthly (default)
-            key = t.date[:7] if len(t.date) >= 7 else 'Unknown'  # Year/Month
-        
-        if key not in period_data:
-            period_data[key] = {'period': key, 'income': 0, 'expense': 0}
-        
-        if t.type == Transaction.INCOME:
-            period_data[key]['income'] += float(t.amount)
-        else:
-            period_data[key]['expense'] += float(t.amount)
-    
-    # Category breakdown
-    category_data = {}
-    for t in transactions.filter(type=Transaction.EXPENSE):
-        cat_name = t.category.name_fa if t.category else 'سایر'
-        category_data[cat_name] = category_data.get(cat_name, 0) + float(t.amount)
-    
-    # Net worth over time
-    net_worth_data = []
-    cumulative = 0
-    sorted_periods = sorted(period_data.keys())
-    for p in sorted_periods:
-        data = period_data[p]
-        cumulative += data['income'] - data['expense']
-        net_worth_data.append({'period': p, 'value': cumulative})
-    
-    # Calculate totals
-    total_income = sum(d['income'] for d in period_data.values())
-    total_expense = sum(d['expense'] for d in period_data.values())
-    
-    return JsonResponse({
-        'period_data': list(period_data.values()),
-        'categories': [{'name': k, 'value': v} for k, v in category_data.items()],
-        'netWorth': net_worth_data,
-        'totals': {
-            'income': total_income,
-            'expense': total_expense,
-            'balance': total_income - total_expense
-        }
-    })
+    return JsonResponse(chart_data(request.user, period))
+
+
+@login_required
+@ledger_conditional(vary=lambda request: forecast.current_month())  # the projection starts next month
+def forecast_data(request):
+    """API endpoint for the cash-flow forecast: monthly history, seasonality and 12-month projection"""
+    return JsonResponse(forecast.build(request.user))
 
 
 @login_required
 def budget(request):
     """Budget tracker view"""
-    categories = Category.objects.filter(Q(is_default=True) | Q(user=request.user))
-    budgets = Budget.objects.filter(user=request.user)
-    
-    # Calculate spending for current month
-    current_month = datetime.now().strftime('%Y/%m')  # Will need to convert to Jalali
-    transactions = Transaction.objects.filter(user=request.user, type=Transaction.EXPENSE)
-    
-    budget_data = []
-    for category in categories:
-        budget = budgets.filter(category=category).first()
-        spent = transactions.filter(category=category).aggregate(Sum('amount'))['amount__sum'] or 0
-        limit = budget.limit if budget else 0
-        percent = int((spent / limit * 100)) if limit > 0 else 0
-        
-        budget_data.append({
-            'category': category,
-            'budget': budget,
-            'spent': spent,
-            'limit': limit,
-            'percent': min(percent, 100),
-            'over_budget': percent >= 100,
-            'near_budget': 80 <= percent < 100,
-        })
-    
+    categories = category_tree.get(request.user).categories
     context = {
-        'budget_data': budget_data,
+        'budget_data': budgets.evaluate(request.user, categories),
         'categories': categories,
+        'period_choices': Budget.PERIOD_CHOICES,
     }
     return render(request, 'core/budget.html', context)
 
@@ -314,13 +326,17 @@ def save_budget(request):
     if request.method == 'POST':
         category_id = request.POST.get('category_id')
         limit = request.POST.get('limit')
+        period = request.POST.get('period') or Budget.MONTHLY
+        if period not in dict(Budget.PERIOD_CHOICES):
+            messages.error(request, 'دوره بودجه نامعتبر است.')
+            return redirect('budget')
         
         category = get_object_or_404(Category, id=category_id)
         
         budget, created = Budget.objects.update_or_create(
             user=request.user,
             category=category,
-            defaults={'limit': Decimal(limit), 'period': Budget.MONTHLY}
+            defaults={'limit': Decimal(limit), 'period': period}
         )
         
         messages.success(request, 'بودجه با موفقیت ذخیره شد!')
@@ -343,13 +359,13 @@ def goals(request):
     goals = Goal.objects.filter(user=request.user)
     
     # Calculate total savings based on actual balance (Income - Expense)
-    transactions = Transaction.objects.filter(user=request.user)
-    total_income = transactions.filter(type=Transaction.INCOME).aggregate(Sum('amount'))['amount__sum'] or 0
-    total_expense = transactions.filter(type=Transaction.EXPENSE).aggregate(Sum('amount'))['amount__sum'] or 0
-    total_saved = total_income - total_expense
+    totals = ledger.totals(request.user)
+    total_saved = totals['income'] - totals['expense']
+    statuses, summary = goal_plan.plan(request.user, goals)
     
     context = {
-        'goals': goals,
+        'goals': statuses,
+        'plan': summary,
         'total_saved': total_saved,
     }
     return render(request, 'core/goals.html', context)
@@ -393,16 +409,28 @@ def delete_goal(request, pk):
     return redirect('goals')
 
 
-@login_required
-def goal_advice(request, pk):
+def goal_facts(goal):
+    """(goal plan facts, financial context) for the goal advice prompt"""
+    statuses, summary = goal_plan.plan(goal.user, [goal])
+    return goal_plan.facts(statuses[0], summary['savings_rate']), financial_context.for_user(goal.user)
+
+
+@async_login_required
+async def goal_advice(request, pk):
     """Get AI advice for goal"""
-    goal = get_object_or_404(Goal, pk=pk, user=request.user)
+    goal = await sync_to_async(get_object_or_404)(Goal.objects.select_related('user'), pk=pk, user=request.user)
     
-    # Get spending context
-    transactions = Transaction.objects.filter(user=request.user, type=Transaction.EXPENSE)[:10]
-    spending_context = ', '.join([f"{t.amount} برای {t.category.name_fa if t.category else 'سایر'}" for t in transactions])
+    # The numbers are worked out here; the model only turns them into advice
+    facts, context = await sync_to_async(goal_facts)(goal)
     
-    advice = get_goal_advice(goal.title, float(goal.remaining), goal.deadline, spending_context)
+    try:
+        advice = await ask_model(
+            request, aget_goal_advice, get_goal_advice,
+            goal.title, float(goal.remaining), goal.deadline, facts, context,
+        )
+    except Unavailable:
+        data = await sync_to_async(financial_context.get_snapshot)(request.user)
+        advice = ai_fallback.goal_advice(data, facts)
     
     return JsonResponse({'advice': advice})
 
@@ -413,27 +441,43 @@ def advisor(request):
     return render(request, 'core/advisor.html')
 
 
-@login_required
-def advisor_ask(request):
+def fallback_advice(user):
+    """Rule-based advisor answer while the AI backend is unavailable"""
+    return ai_fallback.financial_advice(financial_context.get_snapshot(user))
+
+
+@async_login_required
+async def advisor_ask(request):
     """Ask AI advisor"""
     if request.method == 'POST':
         data = json.loads(request.body)
         query = data.get('query', '')
         
-        # Build context from user's financial data
-        transactions = Transaction.objects.filter(user=request.user)
-        total_income = transactions.filter(type=Transaction.INCOME).aggregate(Sum('amount'))['amount__sum'] or 0
-        total_expense = transactions.filter(type=Transaction.EXPENSE).aggregate(Sum('amount'))['amount__sum'] or 0
+        context = await sync_to_async(financial_context.for_user)(request.user)
         
-        context = f"""
-        تعداد تراکنش‌ها: {transactions.count()}
-        کل درآمد: {total_income:,} تومان
-        کل هزینه: {total_expense:,} تومان
-        موجودی: {(total_income - total_expense):,} تومان
-        تراکنش‌های اخیر: {', '.join([f"{t.type} {t.amount} for {t.category.name if t.category else 'Other'}" for t in transactions[:10]])}
-        """
+        # Django 3.2's ASGI handler drains streaming bodies synchronously on
+        # the event loop, so token streaming is only offered under WSGI.
+        if data.get('stream') and not isinstance(request, ASGIRequest):
+            try:
+                tokens = stream_financial_advice(query, context)
+            except Unavailable:
+                tokens = [await sync_to_async(fallback_advice)(request.user)]
+            
+            # Relay tokens as server-sent events while the model generates
+            def events():
+                for token in tokens:
+                    yield f"data: {json.dumps({'token': token}, ensure_ascii=False)}\n\n"
+                yield "data: [DONE]\n\n"
+            
+            response = StreamingHttpResponse(events(), content_type='text/event-stream; charset=utf-8')
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'  # don't let nginx buffer the stream
+            return response
         
-        response = get_financial_advice(query, context)
+        try:
+            response = await ask_model(request, aget_financial_advice, get_financial_advice, query, context)
+        except Unavailable:
+            response = await sync_to_async(fallback_advice)(request.user)
         return JsonResponse({'response': response})
     
     return JsonResponse({'error': 'Invalid request'}, status=400)
@@ -478,12 +522,11 @@ def update_profile(request):
 @login_required
 def categories(request):
     """Categories management view"""
-    user_categories = Category.objects.filter(user=request.user)
-    default_categories = Category.objects.filter(is_default=True)
+    tree = category_tree.get(request.user)
     
     context = {
-        'user_categories': user_categories,
-        'default_categories': default_categories,
+        'user_categories': tree.owned,
+        'default_categories': tree.defaults,
     }
     return render(request, 'core/categories.html', context)
 
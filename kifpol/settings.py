@@ -85,9 +85,89 @@ LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/login/'
 LOGIN_URL = '/login/'
 
+CACHES = {
+    # Also holds the per-user category trees (core.services.category_tree); with
+    # several worker processes use a shared backend so invalidations reach them all.
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Shared tier of the AI response cache. Swap for FileBasedCache
+    # (LOCATION = BASE_DIR / 'cache' / 'ai') to share it between processes.
+    'ai': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'kifpol-ai',
+        'TIMEOUT': 3600,
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
+
+# AI backend used by the advisor, dashboard analysis and goal advice:
+# 'llama' (local llama.cpp server), 'gemini', or 'stub' (canned answers, no model)
+AI_BACKEND = 'llama'
+
+# Stub backend: simulate a slow or unreliable model in load tests
+AI_STUB = {
+    'LATENCY_MS': 0,
+    'ERROR_RATE': 0.0,   # 0 to 1
+    'SEED': 0,           # same seed, same sequence of errors
+}
+
 # Local Llama AI Settings
 LLAMA_API_URL = 'http://localhost:8080/v1/chat/completions'
 LLAMA_API_SECRET = 'kifpool-secret'
 
+# Gemini (AI_BACKEND = 'gemini')
+GEMINI_API_URL = 'https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent'
+GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
+
+# Shared HTTP client for the AI backends
+AI_HTTP = {
+    'POOL_SIZE': 16,        # keep-alive connections per host
+    'CONNECT_TIMEOUT': 3,   # seconds
+    'QUEUE_TIMEOUT': 30,    # max wait for a free request slot
+    'BACKENDS': {
+        # MAX_CONCURRENCY should match the llama.cpp server's --parallel slots
+        'llama': {'MAX_CONCURRENCY': 1, 'READ_TIMEOUT': 120},
+        'gemini': {'MAX_CONCURRENCY': 8, 'READ_TIMEOUT': 60},
+    },
+}
+
+# AI response cache (identical prompts are not sent twice)
+AI_CACHE = {
+    'ALIAS': 'ai',        # Django cache alias for the shared tier, None for in-process only
+    'TTL': 3600,          # seconds
+    'MAX_ENTRIES': 512,   # in-process LRU size
+}
+
+# Circuit breaker per AI backend: fail fast with a rule-based answer while it is down or slow
+AI_CIRCUIT = {
+    'ENABLED': True,
+    'WINDOW': 20,          # recent calls considered
+    'MIN_CALLS': 5,
+    'FAILURE_RATE': 0.5,   # trips when half of them fail
+    'SLOW_SECONDS': 30,    # or when their p95 latency reaches this
+    'OPEN_SECONDS': 30,    # then refuses calls this long before probing again
+}
+
+# Identical AI calls in flight at the same time share one answer
+AI_SINGLE_FLIGHT = {
+    'ENABLED': True,
+    'ALIAS': None,         # Django cache alias to coalesce across processes too (shared backend only)
+    'LOCK_TIMEOUT': 150,   # seconds; longer than the slowest model call
+    'POLL_INTERVAL': 0.05, # seconds between checks on another process's call
+}
+
+# Financial summary given to every AI prompt (core.services.financial_context)
+AI_CONTEXT = {
+    'MAX_TOKENS': 250,     # bounds prompt prefill time on the llama.cpp server
+    'TREND_MONTHS': 3,
+    'TOP_MERCHANTS': 5,
+    'MERCHANT_DAYS': 90,
+}
 
+# Background worker (in-process thread pool, no broker)
+BACKGROUND_WORKERS = 4
+BACKGROUND_EAGER = False  # run jobs inline instead (tests)
 
+# CSV import: transactions written per bulk INSERT
+IMPORT_BATCH_SIZE = 1000